@@ -1,10 +1,14 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
 from backend.state import AgentState
+from backend.llm import get_model, model_cache_id
+from backend.scheduler import invoke_llm
+from backend.review_cache import get_review_cache, review_key
+from backend.config import INCREMENTAL_REVIEW, CRITIC_EARLY_EXIT
+from backend.sections import split_sections, section_hash, plan_rereview, summarize_sections, sections_text
+from backend.partial_json import FieldStream
+from pydantic import BaseModel, ConfigDict, Field
 import json
-import re
-
-critic_model = ChatOpenAI(model="gpt-4o-mini", max_tokens=1000)  # Increased for detailed feedback
 
 SYSTEM_PROMPT = """You are a Clinical Quality Reviewer for CBT protocols with HIGH STANDARDS.
 Evaluate the protocol on these criteria (score each 0.0 to 1.0):
@@ -39,22 +43,92 @@ Evaluate the protocol on these criteria (score each 0.0 to 1.0):
 - A protocol with even minor gaps should score 0.80-0.88
 - Missing examples or vague steps = significant deductions
 
-RESPOND IN THIS EXACT JSON FORMAT:
+RESPOND IN THIS EXACT JSON FORMAT (decide the overall score and any safety concern first):
 {
+  "overall_score": 0.X,
+  "safety_concern": "If you have safety concerns that need Safety agent consultation, describe here. Otherwise leave empty.",
   "empathy_score": 0.X,
   "clarity_score": 0.X,
   "technique_score": 0.X,
   "completeness_score": 0.X,
   "safety_score": 0.X,
-  "overall_score": 0.X,
-  "feedback": "Specific constructive feedback explaining what needs improvement or what was excellent",
-  "safety_concern": "If you have safety concerns that need Safety agent consultation, describe here. Otherwise leave empty."
+  "feedback": "Specific constructive feedback explaining what needs improvement or what was excellent"
 }
 
 Be demanding. Most first drafts should score 0.80-0.88 and need revision.
 """
 
-def critic_node(state: AgentState):
+REREVIEW_REQUEST = """You reviewed an earlier version of this CBT protocol. Your review was:
+{previous}
+
+These sections have been revised since then:
+
+{changed}
+
+The other sections are unchanged (summarized below) and keep the assessment in your earlier review:
+{unchanged}
+
+Re-score the WHOLE protocol on every criterion, combining your earlier assessment of the unchanged
+sections with the revised ones, in the same JSON format."""
+
+# Scores at or above this approve the draft
+APPROVAL_THRESHOLD = 0.9
+
+class CriticReview(BaseModel):
+    """The Critic's reply. Field order is generation order: the routing fields come first."""
+    model_config = ConfigDict(extra="forbid")
+
+    overall_score: float = Field(description="Overall quality, 0.0-1.0")
+    safety_concern: str = Field(description="Concern for the Safety agent, or empty")
+    empathy_score: float
+    clarity_score: float
+    technique_score: float
+    completeness_score: float
+    safety_score: float
+    feedback: str
+
+# Schema-constrained output (OpenAI structured outputs); other providers ignore it and follow the prompt
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "critic_review", "strict": True, "schema": CriticReview.model_json_schema()},
+}
+
+def parse_critic_review(result: str) -> dict:
+    """
+    Scores, feedback and safety concern from the Critic's JSON reply, which
+    may have been cut off once the route was known. "scores" is empty when
+    the reply has no overall score.
+    """
+    fields = FieldStream()
+    fields.feed(result)
+    scores = fields.fields
+    if not isinstance(scores.get("overall_score"), (int, float)):
+        return {"scores": {}, "overall_score": None, "feedback": result, "safety_concern": "", "complete": False}
+    return {
+        "scores": scores,
+        "overall_score": float(scores["overall_score"]),
+        "feedback": str(scores.get("feedback", "")),
+        "safety_concern": str(scores.get("safety_concern", "")),
+        "complete": fields.done,
+    }
+
+def needs_feedback(fields: dict, critic_drafter_iterations: int, critic_safety_iterations: int) -> bool:
+    """Whether the route taken on these scores goes back to the Drafter with the feedback text."""
+    if fields.get("safety_concern") and critic_safety_iterations < 2:
+        return False  # Safety consultation
+    return fields["overall_score"] < APPROVAL_THRESHOLD and critic_drafter_iterations < 2
+
+def route_known(critic_drafter_iterations: int, critic_safety_iterations: int):
+    """until() for a streamed review: stop once the scores settle the route and the rest is unused."""
+    stream = FieldStream()
+    def until(text: str) -> bool:
+        fields = stream.feed(text[len(stream.buffer):])
+        if not isinstance(fields.get("overall_score"), (int, float)) or "safety_concern" not in fields:
+            return False
+        return not needs_feedback(fields, critic_drafter_iterations, critic_safety_iterations)
+    return until
+
+async def critic_node(state: AgentState, config: RunnableConfig):
     artifact = state.get("artifact", "No protocol provided")
     revision_count = state.get("revision_count", 0)
     critic_drafter_iterations = state.get("critic_drafter_iterations", 0)
@@ -77,31 +151,61 @@ def critic_node(state: AgentState):
             }
         }
     
-    # Normal quality review
-    response = critic_model.invoke([
-        SystemMessage(content=SYSTEM_PROMPT),
-        HumanMessage(content=f"Review this CBT protocol:\n\n{artifact}")
-    ])
+    # Normal quality review. A revision only needs its changed sections scored
+    # against the last review; the rest reads the whole draft.
+    sections = split_sections(artifact)
+    previous = state.get("critic_sections") or {}
+    incremental = (config.get("configurable", {}).get("incremental_review") or INCREMENTAL_REVIEW) == "on"
+    plan = plan_rereview(sections, previous.get("sections")) if incremental else None
+    if plan:
+        changed, unchanged = plan
+        request = REREVIEW_REQUEST.format(
+            previous=json.dumps({**previous["review"]["scores"], "feedback": previous["review"]["feedback"]}),
+            changed=sections_text(sections, changed),
+            unchanged=summarize_sections(sections, unchanged)
+        )
+    else:
+        request = f"Review this CBT protocol:\n\n{artifact}"
+    
+    # The same request already answered by this prompt and model reuses its scores
+    cache = get_review_cache()
+    key = review_key(SYSTEM_PROMPT, model_cache_id(get_model("critic")), artifact if plan is None else request)
+    review = await cache.get(key, "critic")
+    if review is None:
+        early_exit = (config.get("configurable", {}).get("critic_early_exit") or CRITIC_EARLY_EXIT) == "on"
+        for attempt in range(2):  # An unparseable reply is asked for again once
+            response = await invoke_llm(get_model("critic"), [
+                SystemMessage(content=SYSTEM_PROMPT),
+                HumanMessage(content=request)
+            ], stage="review", response_format=RESPONSE_FORMAT,
+               until=route_known(critic_drafter_iterations, critic_safety_iterations) if early_exit else None)
+            review = parse_critic_review(response.content)
+            if review["scores"]:
+                break
+        # Cache whole reviews, and cut-off ones whose score approves the draft in any state
+        if review["complete"] or (review["scores"] and review["overall_score"] >= APPROVAL_THRESHOLD):
+            await cache.put(key, "critic", review)
     
-    result = response.content
+    if not review["scores"]:
+        # Still no score: rather than guess one (and maybe loop the Drafter), leave it to the human reviewer
+        return {
+            "status": "Quality Review Unavailable",
+            "scratchpad": {
+                "Critic": f"The quality review could not be read:\n{review['feedback']}",
+                "CriticApproved": True,
+                "CriticScore": None
+            },
+            "critic_sections": {"review": review, "sections": {}}
+        }
     
-    # Try to parse JSON response
-    try:
-        # Extract JSON from response
-        json_match = re.search(r'\{[^{}]+\}', result, re.DOTALL)
-        if json_match:
-            scores = json.loads(json_match.group())
-            overall_score = scores.get("overall_score", 0.5)
-            feedback = scores.get("feedback", result)
-            safety_concern = scores.get("safety_concern", "")
-        else:
-            overall_score = 0.7  # Default if parsing fails
-            feedback = result
-            safety_concern = ""
-    except:
-        overall_score = 0.7
-        feedback = result
-        safety_concern = ""
+    overall_score = review["overall_score"]
+    feedback = review["feedback"]
+    safety_concern = review["safety_concern"]
+    # Sections this review covers, scored at the overall score (only parsed reviews can be built on)
+    critic_sections = {
+        "review": review,
+        "sections": {section_hash(s): overall_score for s in sections} if review["scores"] else {}
+    }
     
     # Check if Critic wants to consult Safety
     if safety_concern and critic_safety_iterations < 2:
@@ -111,16 +215,16 @@ def critic_node(state: AgentState):
                 "CriticRequestsSafetyConsult": True,
                 "CriticSafetyConcern": safety_concern
             },
-            "critic_safety_iterations": critic_safety_iterations + 1
+            "critic_safety_iterations": critic_safety_iterations + 1,
+            "critic_sections": critic_sections
         }
     
-    # Threshold: 0.9+ means approved
-    is_approved = overall_score >= 0.9
+    is_approved = overall_score >= APPROVAL_THRESHOLD
     
     # Check if we should iterate with Drafter
     needs_improvement = not is_approved and critic_drafter_iterations < 2
     
-    display_result = f"Score: {overall_score:.2f}/1.0\n{feedback}"
+    display_result = f"Score: {overall_score:.2f}/1.0\n{feedback}".rstrip()
     
     if needs_improvement:
         # Request Drafter revision
@@ -132,7 +236,8 @@ def critic_node(state: AgentState):
                 "CriticScore": overall_score,
                 "CriticFeedback": feedback
             },
-            "critic_drafter_iterations": critic_drafter_iterations + 1
+            "critic_drafter_iterations": critic_drafter_iterations + 1,
+            "critic_sections": critic_sections
         }
     else:
         # Approve (either score >= 0.9 or max iterations reached)
@@ -142,6 +247,7 @@ def critic_node(state: AgentState):
                 "Critic": display_result,
                 "CriticApproved": True,
                 "CriticScore": overall_score
-            }
+            },
+            "critic_sections": critic_sections
         }
 
@@ -1,8 +1,11 @@
-from langchain_openai import ChatOpenAI
+import asyncio
 from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
 from backend.state import AgentState
-
-drafter_model = ChatOpenAI(model="gpt-4o-mini", max_tokens=4000)  # Increased for longer protocols
+from backend.llm import get_model
+from backend.scheduler import invoke_llm
+from backend.config import REVISION_MODE
+from backend.sections import split_sections, join_sections, plan_revision, splice_section
 
 INITIAL_PROMPT = """You are a CBT Protocol Drafter. Create a high-quality, empathetic Cognitive Behavioral Therapy exercise.
 
@@ -61,7 +64,53 @@ Create an IMPROVED version that specifically addresses the feedback while:
 Output the COMPLETE revised protocol in Markdown.
 """
 
-def drafter_node(state: AgentState):
+SECTION_REVISION_PROMPT = """You are revising ONE section of a CBT Protocol based on reviewer feedback.
+
+FULL PROTOCOL (context only - do not rewrite it):
+{artifact}
+
+SECTION TO REVISE:
+{section}
+
+FEEDBACK TO ADDRESS:
+{feedback}
+
+Output ONLY the revised section in Markdown, starting with its heading line exactly as it is:
+{heading}
+Address the feedback where it applies to this section, keep the same structure and the warm,
+supportive tone, and do not repeat any other section.
+"""
+
+async def revise_sections(artifact: str, feedbacks: list, feedback: str):
+    """
+    Regenerate only the sections the feedback is about and splice them back in.
+    Returns (revised artifact, revised section names), or None if the whole
+    protocol should be rewritten instead.
+    """
+    sections = split_sections(artifact)
+    targets = plan_revision(feedbacks, sections)
+    if targets is None:
+        return None
+    responses = await asyncio.gather(*[
+        invoke_llm(get_model("drafter"), [
+            SystemMessage(content="You are revising one section of a CBT protocol based on feedback."),
+            HumanMessage(content=SECTION_REVISION_PROMPT.format(
+                artifact=artifact,
+                section=sections[i].text.strip(),
+                feedback=feedback,
+                heading=sections[i].text.splitlines()[0],
+            ))
+        ], stage="revision")
+        for i in targets
+    ])
+    for i, response in zip(targets, responses):
+        revised = splice_section(sections[i], response.content)
+        if revised is None:
+            return None  # Not a clean rewrite of the section - fall back to a full revision
+        sections[i].text = revised
+    return join_sections(sections), [sections[i].name for i in targets]
+
+async def drafter_node(state: AgentState, config: RunnableConfig):
     messages = state["messages"]
     scratchpad = state.get("scratchpad", {})
     artifact = state.get("artifact", "")
@@ -80,28 +129,45 @@ def drafter_node(state: AgentState):
     if artifact and (needs_safety_revision or needs_critic_revision):
         # Combine feedback sources
         feedback = ""
+        feedbacks = []
         if needs_safety_revision:
             feedback += f"Safety Review: {safety_feedback}\n"
+            feedbacks.append(safety_feedback)
         if needs_critic_revision:
             # Use specific feedback if available, otherwise use full critic result
             if critic_specific_feedback:
                 feedback += f"Quality Review: {critic_specific_feedback}\n"
+                feedbacks.append(critic_specific_feedback)
             else:
                 feedback += f"Quality Review: {critic_feedback}\n"
+                feedbacks.append(critic_feedback)
+        
+        new_revision_count = revision_count + 1
+        
+        # Feedback about particular sections only regenerates those sections
+        mode = config.get("configurable", {}).get("revision_mode") or REVISION_MODE
+        revised = await revise_sections(artifact, feedbacks, feedback) if mode == "sections" else None
+        if revised:
+            artifact, section_names = revised
+            return {
+                "artifact": artifact,
+                "revision_count": new_revision_count,
+                "status": f"Revision {new_revision_count} Complete ({', '.join(section_names)})",
+                "scratchpad": {}  # Clear scratchpad for fresh reviews
+            }
         
         revision_prompt = REVISION_PROMPT.format(
             artifact=artifact,
             feedback=feedback
         )
-        response = drafter_model.invoke([
+        response = await invoke_llm(get_model("drafter"), [
             SystemMessage(content="You are revising a CBT protocol based on feedback."),
             HumanMessage(content=revision_prompt)
-        ])
-        new_revision_count = revision_count + 1
+        ], stage="revision")
         status = f"Revision {new_revision_count} Complete"
     else:
         # Initial draft
-        response = drafter_model.invoke([
+        response = await invoke_llm(get_model("drafter"), [
             SystemMessage(content=INITIAL_PROMPT),
             *messages
         ])
@@ -1,8 +1,10 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
 from backend.state import AgentState
-
-filter_agent = ChatOpenAI(model="gpt-4o-mini", max_tokens=300)  # Increased for better classification
+from backend.llm import get_model
+from backend.scheduler import invoke_llm
+from backend.pii import scan_pii
+from backend.relevance import get_relevance_classifier
+from backend.config import PII_SCREEN
 
 RELEVANCE_PROMPT = """You are the Cerina Foundry Filter.
 Your job is to classify incoming user queries into one of two categories:
@@ -24,7 +26,7 @@ Respond in ONE of these formats:
 - "PII_FOUND: [brief description of what PII was detected]"
 """
 
-def filter_node(state: AgentState):
+async def filter_node(state: AgentState):
     messages = state["messages"]
     scratchpad = state.get("scratchpad", {})
     filter_safety_iterations = state.get("filter_safety_iterations", 0)
@@ -36,12 +38,18 @@ def filter_node(state: AgentState):
         # Safety requested PII check - perform deep analysis
         user_message = messages[-1].content if messages else ""
         
-        response = filter_agent.invoke([
-            SystemMessage(content=PII_DETECTION_PROMPT),
-            HumanMessage(content=f"Check this message for PII:\n\n{user_message}")
-        ])
-        
-        result = response.content.strip()
+        # Local pre-screen first - definite PII needs no LLM round trip. Safety asked
+        # for this recheck, so anything else (free-text names, relatives...) still goes to the LLM
+        screen = scan_pii(user_message) if PII_SCREEN == "local" else None
+        if screen and screen["verdict"] == "PII_FOUND":
+            result = screen["summary"]
+        else:
+            response = await invoke_llm(get_model("filter"), [
+                SystemMessage(content=PII_DETECTION_PROMPT),
+                HumanMessage(content=f"Check this message for PII:\n\n{user_message}")
+            ], stage="review")
+            
+            result = response.content.strip()
         
         if "PII_FOUND" in result.upper():
             # PII detected - inform Safety and continue loop
@@ -67,12 +75,16 @@ def filter_node(state: AgentState):
             }
     else:
         # Normal flow - check relevance only
-        response = filter_agent.invoke([
-            SystemMessage(content=RELEVANCE_PROMPT),
-            *messages
-        ])
-        
-        classification = response.content.strip().lower()
+        # Clear-cut queries are answered by the local classifier, the rest by the LLM
+        query = messages[-1].content if messages else ""
+        classification = get_relevance_classifier().classify(query)
+        if classification is None:
+            response = await invoke_llm(get_model("filter"), [
+                SystemMessage(content=RELEVANCE_PROMPT),
+                *messages
+            ])
+            
+            classification = response.content.strip().lower()
         
         if "irrelevant" in classification:
             return {"next": "Rejection", "status": "Query Irrelevant"}
@@ -1,8 +1,11 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
 from backend.state import AgentState
-
-safety_model = ChatOpenAI(model="gpt-4o-mini", max_tokens=800)  # Increased for thorough safety reviews
+from backend.llm import get_model, model_cache_id
+from backend.scheduler import invoke_llm
+from backend.review_cache import get_review_cache, review_key
+from backend.config import INCREMENTAL_REVIEW
+from backend.sections import split_sections, section_hash, target_sections, plan_rereview, summarize_sections, sections_text
 
 PROTOCOL_SAFETY_PROMPT = """You are a Safety Reviewer for CBT protocols.
 Review the protocol for safety concerns:
@@ -38,7 +41,40 @@ Review the protocol and Critic's concern, then respond:
 - "SAFETY_CONCERN: [specific safety issue to address]"
 """
 
-def safety_node(state: AgentState):
+REREVIEW_REQUEST = """You reviewed an earlier version of this CBT protocol. Your verdict was:
+{previous}
+
+These sections have changed since then:
+
+{changed}
+
+The other sections are unchanged and already passed your review (summarized):
+{unchanged}
+
+Review the changed sections for safety, in the context of the whole protocol."""
+
+def parse_safety_review(result: str) -> dict:
+    """Verdict (SAFE / REVISE / STOP / RECHECK_INPUT) of a protocol safety review."""
+    upper = result.upper()
+    for verdict in ("RECHECK_INPUT", "REVISE", "STOP"):
+        if upper.startswith(verdict):
+            return {"verdict": verdict, "result": result}
+    return {"verdict": "SAFE", "result": result}
+
+def passed_sections(sections: list, review: dict) -> dict:
+    """Hashes of the sections a review passed: all of them if SAFE, all but the ones
+    a REVISE names (none if it can't be tied to sections or for other verdicts)."""
+    if review["verdict"] == "SAFE":
+        flagged = []
+    elif review["verdict"] == "REVISE":
+        flagged = target_sections(review["result"], sections)
+        if not flagged:
+            return {}
+    else:
+        return {}
+    return {section_hash(s): "SAFE" for i, s in enumerate(sections) if i not in flagged}
+
+async def safety_node(state: AgentState, config: RunnableConfig):
     artifact = state.get("artifact", "No protocol provided")
     scratchpad = state.get("scratchpad", {})
     filter_safety_iterations = state.get("filter_safety_iterations", 0)
@@ -80,10 +116,10 @@ def safety_node(state: AgentState):
         # Critic requested safety consultation
         critic_concern = scratchpad.get("CriticSafetyConcern", "")
         
-        response = safety_model.invoke([
+        response = await invoke_llm(get_model("safety"), [
             SystemMessage(content=CRITIC_CONSULTATION_PROMPT),
             HumanMessage(content=f"Protocol:\n{artifact}\n\nCritic's Concern:\n{critic_concern}")
-        ])
+        ], stage="review")
         
         result = response.content.strip()
         
@@ -97,26 +133,51 @@ def safety_node(state: AgentState):
         }
     
     else:
-        # Normal protocol safety review
-        response = safety_model.invoke([
-            SystemMessage(content=PROTOCOL_SAFETY_PROMPT),
-            HumanMessage(content=f"Review this CBT protocol for safety:\n\n{artifact}")
-        ])
+        # Normal protocol safety review. A revision only needs its changed sections
+        # checked against the last verdict; the rest reads the whole draft.
+        sections = split_sections(artifact)
+        previous = state.get("safety_sections") or {}
+        incremental = (config.get("configurable", {}).get("incremental_review") or INCREMENTAL_REVIEW) == "on"
+        plan = plan_rereview(sections, previous.get("sections")) if incremental else None
+        if plan:
+            changed, unchanged = plan
+            request = REREVIEW_REQUEST.format(
+                previous=previous["result"],
+                changed=sections_text(sections, changed),
+                unchanged=summarize_sections(sections, unchanged)
+            )
+        else:
+            request = f"Review this CBT protocol for safety:\n\n{artifact}"
         
-        result = response.content.strip()
+        # The same request already answered by this prompt and model reuses its verdict
+        cache = get_review_cache()
+        key = review_key(PROTOCOL_SAFETY_PROMPT, model_cache_id(get_model("safety")), artifact if plan is None else request)
+        review = await cache.get(key, "safety")
+        if review is None:
+            response = await invoke_llm(get_model("safety"), [
+                SystemMessage(content=PROTOCOL_SAFETY_PROMPT),
+                HumanMessage(content=request)
+            ], stage="review")
+            review = parse_safety_review(response.content.strip())
+            await cache.put(key, "safety", review)
+        
+        result = review["result"]
+        verdict = review["verdict"]
+        safety_sections = {"result": result, "sections": passed_sections(sections, review)}
         
         # Check if Safety wants to request Filter recheck
-        if result.upper().startswith("RECHECK_INPUT") and filter_safety_iterations < 2:
+        if verdict == "RECHECK_INPUT" and filter_safety_iterations < 2:
             return {
                 "status": "Requesting Input Validation",
                 "scratchpad": {
                     "SafetyRequestsFilterRecheck": True,
                     "SafetyReason": result
                 },
-                "filter_safety_iterations": filter_safety_iterations + 1
+                "filter_safety_iterations": filter_safety_iterations + 1,
+                "safety_sections": safety_sections
             }
         # Determine routing based on response
-        elif result.upper().startswith("REVISE"):
+        elif verdict == "REVISE":
             return {
                 "status": "Safety Review - Needs Revision",
                 "scratchpad": {
@@ -124,9 +185,10 @@ def safety_node(state: AgentState):
                     "SafetyPassed": False,
                     "SafetyNeedsRevision": True,
                     "SafetyDangerous": False
-                }
+                },
+                "safety_sections": safety_sections
             }
-        elif result.upper().startswith("STOP"):
+        elif verdict == "STOP":
             return {
                 "status": "Safety Review - Flagged",
                 "scratchpad": {
@@ -134,7 +196,8 @@ def safety_node(state: AgentState):
                     "SafetyPassed": False,
                     "SafetyNeedsRevision": False,
                     "SafetyDangerous": True
-                }
+                },
+                "safety_sections": safety_sections
             }
         else:  # SAFE
             return {
@@ -144,6 +207,7 @@ def safety_node(state: AgentState):
                     "SafetyPassed": True,
                     "SafetyNeedsRevision": False,
                     "SafetyDangerous": False
-                }
+                },
+                "safety_sections": safety_sections
             }
 
@@ -1,14 +1,13 @@
 from typing import Literal
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from backend.state import AgentState
+from backend.llm import get_model
 from pydantic import BaseModel
 
 class Route(BaseModel):
     next: Literal["Drafter", "Critic", "Safety", "Interrupt"]
 
-supervisor_model = ChatOpenAI(model="gpt-5-mini", max_tokens=100)
 
 SYSTEM_PROMPT = """You are the Supervisor of the Cerina Foundry.
 Your goal is to manage a team of agents to create a high-quality CBT protocol.
@@ -27,7 +26,7 @@ Rules:
 Assess the current scratchpad and decide the next step.
 """
 
-def supervisor_node(state: AgentState):
+async def supervisor_node(state: AgentState):
     messages = state["messages"]
     scratchpad = state.get("scratchpad", {})
     artifact = state.get("artifact", "")
@@ -64,9 +63,9 @@ def supervisor_node(state: AgentState):
         ("system", "Current Scratchpad:\n{scratchpad}"),
         ("system", "Current Artifact exists: {has_artifact}"),
         MessagesPlaceholder(variable_name="messages"),
-    ]) | supervisor_model.with_structured_output(Route)
+    ]) | get_model("supervisor").with_structured_output(Route)
     
-    response = chain.invoke({
+    response = await chain.ainvoke({
         "messages": messages, 
         "scratchpad": scratchpad_text,
         "has_artifact": "Yes" if artifact else "No"
@@ -0,0 +1,233 @@
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from backend.config import PROTOCOL_CACHE_DIR, PROTOCOL_INDEX_PATH, PROTOCOL_LIBRARY_DB, ARTIFACT_WRITER_THREADS
+from backend.protocol_cache import get_protocol_index, protocol_fields
+from backend.protocol_library import ProtocolLibrary
+
+# Approved protocols on disk: CBT_Downloaded/<Title>_<timestamp>.md plus an
+# index.jsonl with one line per approval (file, sha256, title, thread_id,
+# query, score, approved_at). Files are written by a small thread pool -
+# temp file, fsync, rename - so an approval never blocks the event loop
+# and a crash never leaves half a protocol in the library. A protocol
+# approved again (same text) is recorded but not written twice. Saved
+# protocols are catalogued in a ProtocolLibrary for the /protocols endpoints.
+
+def protocol_sha(artifact: str) -> str:
+    return hashlib.sha256(artifact.encode("utf-8")).hexdigest()
+
+def _file_stem(title: Optional[str]) -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    safe_title = re.sub(r"[^\w\s-]", "", title or "").strip().replace(" ", "_")[:50]
+    return f"{safe_title or 'protocol'}_{timestamp}"
+
+def _write_atomic(path: str, data: bytes):
+    """Write `data` to `path` through a temp file in the same folder, so readers see all of it or nothing."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+class ArtifactStore:
+    """
+    Writes approved protocols to `save_dir` and records them in the index
+    at `index_path`, on a pool of `workers` threads. `await save(...)`
+    returns the approval's index record and the protocol's library id; the
+    similarity index is updated on the event loop once the file is in place.
+    """
+
+    def __init__(self, save_dir: str = PROTOCOL_CACHE_DIR, index_path: Optional[str] = PROTOCOL_INDEX_PATH,
+                 workers: int = ARTIFACT_WRITER_THREADS, library_db: Optional[str] = PROTOCOL_LIBRARY_DB):
+        self.save_dir = save_dir
+        self.index_path = index_path or os.path.join(save_dir, "index.jsonl")
+        self.library = ProtocolLibrary(library_db, save_dir)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="artifact-writer")
+        self.lock = threading.Lock()  # Guards files, taken and the index file
+        self.files: Dict[str, str] = {}  # sha256 -> file name in save_dir
+        self.taken = set()  # File names in use or being written
+        self.loaded = False
+        self.saved = 0
+        self.duplicates = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.write_seconds = 0.0
+
+    def _load(self):
+        """Learn the library's files: those in the index, then any .md written before it existed."""
+        with self.lock:
+            if self.loaded:
+                return
+            os.makedirs(self.save_dir, exist_ok=True)
+            first_records = {}  # file -> its first approval
+            if os.path.exists(self.index_path):
+                with open(self.index_path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            record = json.loads(line)
+                            self.files.setdefault(record["sha256"], record["file"])
+                            first_records.setdefault(record["file"], record)
+            known = set(self.files.values())
+            for filepath in sorted(glob.glob(os.path.join(self.save_dir, "*.md"))):
+                name = os.path.basename(filepath)
+                self.taken.add(name)
+                if name not in known:
+                    with open(filepath, encoding="utf-8") as f:
+                        self.files.setdefault(protocol_sha(f.read()), name)
+            self.library.sync(first_records)
+            self.loaded = True
+
+    async def load(self):
+        await asyncio.get_running_loop().run_in_executor(self.executor, self._load)
+
+    def _save(self, artifact: str, thread_id: Optional[str], query: Optional[str], score: Optional[float]) -> dict:
+        self._load()
+        started = time.perf_counter()
+        sha = protocol_sha(artifact)
+        title = protocol_fields(artifact).get("title")
+        with self.lock:
+            filename = self.files.get(sha)
+            duplicate = filename is not None
+            if not duplicate:
+                # Several approvals of one title in the same second (batch runs) each get a file
+                stem = _file_stem(title)
+                filename, n = f"{stem}.md", 1
+                while filename in self.taken or os.path.exists(os.path.join(self.save_dir, filename)):
+                    n += 1
+                    filename = f"{stem}_{n}.md"
+                self.taken.add(filename)
+                self.files[sha] = filename
+        if not duplicate:
+            try:
+                _write_atomic(os.path.join(self.save_dir, filename), artifact.encode("utf-8"))
+            except BaseException:
+                with self.lock:
+                    self.files.pop(sha, None)
+                    self.taken.discard(filename)
+                raise
+        record = {
+            "file": filename,
+            "sha256": sha,
+            "title": title,
+            "thread_id": thread_id,
+            "query": query,
+            "score": score,
+            "chars": len(artifact),
+            "duplicate": duplicate,
+            "approved_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        with self.lock:
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+            if duplicate:
+                self.duplicates += 1
+            else:
+                self.saved += 1
+        record["protocol_id"] = self.library.add(filename, artifact, record)
+        with self.lock:
+            self.write_seconds += time.perf_counter() - started
+        return {**record, "path": os.path.join(self.save_dir, filename)}
+
+    async def save(self, artifact: str, thread_id: Optional[str] = None, query: Optional[str] = None,
+                   score: Optional[float] = None) -> dict:
+        """Write an approved protocol (unless the same text is already saved), index it and add it to the library."""
+        self.in_flight += 1
+        try:
+            record = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._save, artifact, thread_id, query, score)
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        # The similarity index isn't thread-safe; it's only touched on the event loop
+        get_protocol_index().add(artifact, query=query, source=record["file"])
+        return record
+
+    def _records(self) -> List[dict]:
+        self._load()
+        with self.lock:
+            if not os.path.exists(self.index_path):
+                return []
+            with open(self.index_path, encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+
+    async def records(self) -> List[dict]:
+        """Every approval in the index, oldest first."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._records)
+
+    def _export(self, destination: str, fmt: str, since: Optional[str]) -> int:
+        records = [r for r in self._records() if not r.get("duplicate") and (since is None or r["approved_at"] >= since)]
+        exported = 0
+        if fmt == "zip":
+            with zipfile.ZipFile(destination, "w", zipfile.ZIP_DEFLATED) as archive:
+                for record in records:
+                    filepath = os.path.join(self.save_dir, record["file"])
+                    if os.path.exists(filepath):
+                        archive.write(filepath, record["file"])
+                        exported += 1
+                archive.writestr("index.jsonl", "".join(json.dumps(r) + "\n" for r in records))
+        elif fmt == "jsonl":
+            with open(destination, "w", encoding="utf-8") as out:
+                for record in records:
+                    filepath = os.path.join(self.save_dir, record["file"])
+                    if os.path.exists(filepath):
+                        with open(filepath, encoding="utf-8") as f:
+                            out.write(json.dumps({**record, "artifact": f.read()}) + "\n")
+                        exported += 1
+        else:
+            raise ValueError(f"Unknown export format: {fmt!r} (expected zip or jsonl)")
+        return exported
+
+    async def export(self, destination: str, fmt: str = "zip", since: Optional[str] = None) -> int:
+        """
+        Write every saved protocol (approved at or after `since`, an ISO
+        timestamp) to `destination`: a zip of the Markdown files plus their
+        index lines, or JSONL records with the text inline. Returns how many.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._export, destination, fmt, since)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.library.close()
+
+    def stats(self) -> dict:
+        return {
+            "saved": self.saved,
+            "duplicates": self.duplicates,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "write_seconds": round(self.write_seconds, 6),
+        }
+
+# Process-wide store, created on first use
+_artifact_store = None
+
+def get_artifact_store() -> ArtifactStore:
+    global _artifact_store
+    if _artifact_store is None:
+        _artifact_store = ArtifactStore()
+    return _artifact_store
+
+def close_artifact_store():
+    """Finish pending writes and stop the writer threads (call on shutdown)."""
+    global _artifact_store
+    if _artifact_store is not None:
+        _artifact_store.close()
+    _artifact_store = None
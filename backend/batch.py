@@ -0,0 +1,157 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import AsyncIterator, Iterable, List, Optional
+
+from langchain_core.messages import HumanMessage
+
+from backend.config import BATCH_CONCURRENCY, BATCH_CONCURRENCY_MAX
+from backend.graph import get_graph, run_metrics
+from backend.artifact_store import get_artifact_store
+
+# Batch protocol generation: many queries run as separate graph threads,
+# at most `concurrency` at a time, at the scheduler's "batch" priority so
+# interactive /start runs keep going ahead of them. Used by POST /batch and
+# `run_client.py --batch`.
+#
+# run_batch() yields events as dicts (one JSON line each on the wire):
+#   {"type": "progress", "index", "id", "node", "status"}  - a node finished
+#   {"type": "result", "index", "id", "query", "thread_id", "outcome", "status",
+#    "artifact", "saved_to", "seconds", "tokens", "cost_usd", "error"}
+#   {"type": "summary", "items", "outcomes", "seconds", "protocols_per_minute", "latency", "tokens", "cost_usd"}
+#
+# Outcomes: "approved" (auto-approved and saved to the library),
+# "awaiting_approval" (reached human review - approve with /approve and the
+# thread_id), "needs_review" (skipped by auto-approval because Safety flagged
+# it or the Critic didn't pass it - also awaiting /approve), "rejected" (not
+# a CBT topic) or "failed".
+
+def parse_items(lines: Iterable[str]) -> List[dict]:
+    """Batch items from JSONL: {"query": ..., "id"?, "bypass_protocol_cache"?, "protocol_cache_threshold"?} or a bare JSON string."""
+    items = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        item = json.loads(line)
+        if isinstance(item, str):
+            item = {"query": item}
+        if not isinstance(item, dict) or not str(item.get("query", "")).strip():
+            raise ValueError(f"line {number}: expected a JSON object with a \"query\" or a JSON string")
+        items.append(item)
+    return items
+
+def _approvable(values: dict) -> bool:
+    """Safe to approve without a human: not flagged by Safety, and passed by the Critic or served from the library."""
+    scratchpad = values.get("scratchpad", {})
+    if scratchpad.get("SafetyDangerous"):
+        return False
+    if "LibraryScore" in scratchpad:
+        return True
+    return scratchpad.get("CriticApproved") is True and scratchpad.get("CriticScore") is not None
+
+async def run_item(index: int, item: dict, auto_approve: bool, events: asyncio.Queue) -> dict:
+    """Run one query to human review (and past it, if auto-approving). Progress goes to `events`."""
+    item_id = item.get("id", index)
+    thread_id = str(uuid.uuid4())
+    config = {
+        "configurable": {
+            "thread_id": thread_id,
+            "protocol_cache_threshold": item.get("protocol_cache_threshold"),
+            "protocol_cache_bypass": bool(item.get("bypass_protocol_cache")),
+        },
+        "metadata": {"priority": "batch"},
+    }
+    result = {"type": "result", "index": index, "id": item_id, "query": item["query"], "thread_id": thread_id,
+              "outcome": "failed", "status": None, "artifact": None, "saved_to": None}
+    started = time.perf_counter()
+    try:
+        graph = await get_graph()
+        async for update in graph.astream({"messages": [HumanMessage(content=item["query"])]}, config, stream_mode="updates"):
+            for node, values in update.items():
+                status = values.get("status") if isinstance(values, dict) else None
+                await events.put({"type": "progress", "index": index, "id": item_id, "node": node, "status": status})
+
+        snapshot = await graph.aget_state(config)
+        values = snapshot.values
+        result["status"] = values.get("status")
+        result["artifact"] = values.get("artifact")
+        if not snapshot.next:
+            result["outcome"] = "rejected"  # Only the Rejection path ends before human review
+        elif not auto_approve:
+            result["outcome"] = "awaiting_approval"
+        elif not _approvable(values):
+            result["outcome"] = "needs_review"
+        else:
+            # What /approve does: save to the library, then let the run finish
+            saved = await get_artifact_store().save(values["artifact"], thread_id=thread_id, query=item["query"],
+                                                    score=values.get("scratchpad", {}).get("CriticScore"))
+            result["saved_to"] = saved["path"]
+            async for _ in graph.astream(None, config, stream_mode="updates"):
+                pass
+            result["outcome"] = "approved"
+            result["status"] = (await graph.aget_state(config)).values.get("status")
+    except Exception as e:
+        result["error"] = str(e)
+    total = run_metrics.thread_summary(thread_id)["total"]
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    result["tokens"] = total["prompt_tokens"] + total["completion_tokens"]
+    result["cost_usd"] = total["cost_usd"]
+    return result
+
+def _percentile(values: List[float], share: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+def summarize(results: List[dict], seconds: float) -> dict:
+    """Aggregate throughput and per-item latency of a finished batch."""
+    outcomes = {}
+    for result in results:
+        outcomes[result["outcome"]] = outcomes.get(result["outcome"], 0) + 1
+    produced = sum(n for outcome, n in outcomes.items() if outcome in ("approved", "awaiting_approval", "needs_review"))
+    latencies = [result["seconds"] for result in results]
+    return {
+        "type": "summary",
+        "items": len(results),
+        "outcomes": outcomes,
+        "seconds": round(seconds, 3),
+        "protocols_per_minute": round(produced / seconds * 60, 2) if seconds else None,
+        "latency": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "p50": _percentile(latencies, 0.5),
+            "p95": _percentile(latencies, 0.95),
+            "max": max(latencies, default=None),
+        },
+        "tokens": sum(result["tokens"] for result in results),
+        "cost_usd": round(sum(result["cost_usd"] for result in results), 6),
+    }
+
+async def run_batch(items: List[dict], concurrency: int = BATCH_CONCURRENCY, auto_approve: bool = False) -> AsyncIterator[dict]:
+    """
+    Run every item, at most `concurrency` (capped at BATCH_CONCURRENCY_MAX) at
+    once; yields progress and results as they happen, then a summary.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+    slots = asyncio.Semaphore(min(max(1, concurrency), BATCH_CONCURRENCY_MAX))
+    started = time.perf_counter()
+
+    async def worker(index: int, item: dict):
+        async with slots:
+            await events.put(await run_item(index, item, auto_approve, events))
+
+    tasks = [asyncio.create_task(worker(index, item)) for index, item in enumerate(items)]
+    results = []
+    try:
+        while len(results) < len(items):
+            event = await events.get()
+            if event["type"] == "result":
+                results.append(event)
+            yield event
+    finally:
+        # Stopped early (e.g. the /batch client disconnected): don't leave runs going
+        for task in tasks:
+            task.cancel()
+    yield summarize(results, time.perf_counter() - started)
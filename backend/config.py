@@ -0,0 +1,100 @@
+import os
+
+# Runtime settings, read from the environment.
+# Entry points (server.py, mcp_server.py, run_client.py) load backend/.env before importing this.
+
+# Checkpointing: "sqlite" (durable, pruned) or "memory" (in-process, unbounded - dev only)
+CHECKPOINTER_BACKEND = os.getenv("CHECKPOINTER_BACKEND", "sqlite")
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", os.path.join(os.path.dirname(__file__), "checkpoints.db"))
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "10"))  # Checkpoints kept per thread
+CHECKPOINT_TTL_SECONDS = int(os.getenv("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600)))  # Idle threads expire after this
+CHECKPOINT_SWEEP_SECONDS = int(os.getenv("CHECKPOINT_SWEEP_SECONDS", "300"))  # How often to look for expired threads
+# Long strings in checkpointed state (drafts, messages, feedback) are stored once as content-addressed blobs
+CHECKPOINT_COMPACT = os.getenv("CHECKPOINT_COMPACT", "on")  # "off" = store every checkpoint in full
+CHECKPOINT_BLOB_MIN_CHARS = int(os.getenv("CHECKPOINT_BLOB_MIN_CHARS", "512"))  # Shorter strings stay inline
+CHECKPOINT_BLOB_COMPRESSION = os.getenv("CHECKPOINT_BLOB_COMPRESSION", "zlib")  # or "off"
+CHECKPOINT_BLOB_CACHE = int(os.getenv("CHECKPOINT_BLOB_CACHE", "512"))  # Blob texts kept in memory for loads
+
+# SSE stream sessions (one bounded queue per subscriber)
+STREAM_MAX_SESSIONS = int(os.getenv("STREAM_MAX_SESSIONS", "1000"))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "256"))  # Events buffered per subscriber
+STREAM_IDLE_TTL_SECONDS = float(os.getenv("STREAM_IDLE_TTL_SECONDS", "1800"))  # Idle sessions are evicted after this
+STREAM_PUT_TIMEOUT_SECONDS = float(os.getenv("STREAM_PUT_TIMEOUT_SECONDS", "1.0"))  # Max wait on a slow subscriber
+STREAM_LOG_SIZE = int(os.getenv("STREAM_LOG_SIZE", "512"))  # Events kept per session for Last-Event-ID replay
+STREAM_FRAME_MS = int(os.getenv("STREAM_FRAME_MS", "50"))  # Live mode: flush coalesced tokens at least this often
+STREAM_FRAME_MAX_CHARS = int(os.getenv("STREAM_FRAME_MAX_CHARS", "256"))  # Live mode: or once a frame gets this big
+
+# Review flow after each draft: "sequential" (Safety then Critic), "parallel" (both at once, then merged)
+# or "speculative" (both at once, the Critic cancelled as soon as Safety's verdict doesn't need it)
+REVIEW_MODE = os.getenv("REVIEW_MODE", "sequential")
+
+# Drafter revisions: "sections" (regenerate only the sections the feedback is about, when it can
+# tell) or "full" (always rewrite the whole protocol). Per run: configurable["revision_mode"]
+REVISION_MODE = os.getenv("REVISION_MODE", "sections")
+
+# Safety/Critic re-reviews of a revised draft: "on" sends only the changed sections plus a summary
+# of the rest and the previous verdict, "off" always sends the whole draft. Per run: configurable["incremental_review"]
+INCREMENTAL_REVIEW = os.getenv("INCREMENTAL_REVIEW", "on")
+
+# Critic reviews are streamed and cut off once the overall score and safety concern settle the route
+# and the feedback text would go unused (e.g. an approval): "on" or "off". Per run: configurable["critic_early_exit"]
+CRITIC_EARLY_EXIT = os.getenv("CRITIC_EARLY_EXIT", "on")
+
+# Filter's PII check: "local" (regex pre-screen, LLM only for ambiguous input) or "llm" (always ask the LLM)
+PII_SCREEN = os.getenv("PII_SCREEN", "local")
+
+# Filter's relevance check: the local classifier answers when P(relevant) >= this or <= 1 - this,
+# anything in between goes to the LLM (1.0 = always ask the LLM)
+RELEVANCE_CONFIDENCE = float(os.getenv("RELEVANCE_CONFIDENCE", "0.85"))
+
+# Safety/Critic verdict cache, keyed by prompt, model and artifact (0 entries = off)
+REVIEW_CACHE_SIZE = int(os.getenv("REVIEW_CACHE_SIZE", "1024"))
+REVIEW_CACHE_DB = os.getenv("REVIEW_CACHE_DB")  # Optional SQLite file for a persistent, shared tier
+REVIEW_CACHE_DB_SIZE = int(os.getenv("REVIEW_CACHE_DB_SIZE", "100000"))  # Verdicts kept in it, oldest dropped first
+
+# Protocol library cache: queries similar enough to an approved protocol are served it directly.
+# Off by default - a served protocol skips drafting, Safety and the Critic and goes straight to human review
+PROTOCOL_CACHE = os.getenv("PROTOCOL_CACHE", "off")  # or "on"
+PROTOCOL_CACHE_DIR = os.getenv("PROTOCOL_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "CBT_Downloaded"))
+PROTOCOL_CACHE_THRESHOLD = float(os.getenv("PROTOCOL_CACHE_THRESHOLD", "0.45"))  # TF-IDF cosine similarity, 0-1
+# Approved protocols are written to PROTOCOL_CACHE_DIR by a thread pool and listed in an index
+PROTOCOL_INDEX_PATH = os.getenv("PROTOCOL_INDEX_PATH")  # JSONL, one line per approval (default: <PROTOCOL_CACHE_DIR>/index.jsonl)
+ARTIFACT_WRITER_THREADS = int(os.getenv("ARTIFACT_WRITER_THREADS", "2"))
+# SQLite catalogue + full-text index of saved protocols behind /protocols (default: <PROTOCOL_CACHE_DIR>/library.db)
+PROTOCOL_LIBRARY_DB = os.getenv("PROTOCOL_LIBRARY_DB")
+
+# /start requests identical to one still running join its thread instead of starting a new run
+# ("off" = every request runs; per request: isolated=true)
+START_COALESCING = os.getenv("START_COALESCING", "on")
+
+# Runs still going after this many seconds are cancelled (0 = no deadline; per /start: deadline_seconds)
+RUN_DEADLINE_SECONDS = float(os.getenv("RUN_DEADLINE_SECONDS", "0"))
+# Runs whose every SSE client left are cancelled unless one reconnects within this many seconds (0 = never)
+RUN_ABANDON_SECONDS = float(os.getenv("RUN_ABANDON_SECONDS", "60"))
+
+# /batch and run_client.py --batch: graph runs in flight at once per batch (per request: concurrency)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_CONCURRENCY_MAX = int(os.getenv("BATCH_CONCURRENCY_MAX", "32"))  # Highest concurrency a batch may ask for
+
+# LLM call scheduler shared by all agents (0 = no limit). Set the rate limits to your provider tier's.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))  # Calls in flight at once
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+LLM_RATE_BURST_SECONDS = float(os.getenv("LLM_RATE_BURST_SECONDS", "1"))  # Budget that may be spent at once
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))  # Retries of rate-limited / transient provider errors
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1.0"))  # Backoff doubles from this, with jitter
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "30"))
+
+# HTTP connection pool shared by every OpenAI model
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "auto")  # "auto" (HTTP/2 if the h2 package is installed), "on" or "off"
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+LLM_HTTP_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_HTTP_KEEPALIVE_CONNECTIONS", "20"))  # Idle connections kept open
+LLM_HTTP_KEEPALIVE_SECONDS = float(os.getenv("LLM_HTTP_KEEPALIVE_SECONDS", "60"))
+LLM_HTTP_TIMEOUT_SECONDS = float(os.getenv("LLM_HTTP_TIMEOUT_SECONDS", "120"))
+
+# Model provider: "openai" or "fake" (offline scripted model for load tests and benchmarks)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.2"))  # Seconds before the first token
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "200"))  # 0 = whole reply at once
+FAKE_LLM_SCENARIO = os.getenv("FAKE_LLM_SCENARIO", "approve")  # Default script (see backend/llm.py)
+FAKE_LLM_SCRIPT = os.getenv("FAKE_LLM_SCRIPT")  # Optional JSON file with extra scenarios
@@ -1,11 +1,325 @@
+import time
 from langgraph.checkpoint.memory import MemorySaver
+from backend.config import (
+    CHECKPOINTER_BACKEND,
+    CHECKPOINT_DB_PATH,
+    CHECKPOINT_KEEP_LAST,
+    CHECKPOINT_TTL_SECONDS,
+    CHECKPOINT_SWEEP_SECONDS,
+)
+from backend.state_blobs import StateBlobs, expand_tuple, tuple_refs
 
 # Global checkpointer instance
 _checkpointer = None
 
+class CompactMemorySaver(MemorySaver):
+    """MemorySaver that keeps long strings of the state once, as blobs (see state_blobs)."""
+
+    def __init__(self, blobs: StateBlobs = None, serde=None):
+        super().__init__(serde=serde)
+        self.state_blobs = blobs or StateBlobs()
+        self.blob_data = {}  # sha -> (data, compressed)
+
+    def _save_blobs(self, found: dict):
+        for sha, text in found.items():
+            if sha not in self.blob_data:
+                self.blob_data[sha] = self.state_blobs.pack(text)
+
+    def _expand(self, saved):
+        texts = {}
+        for sha in tuple_refs(self.state_blobs, saved):
+            text = self.state_blobs.cached(sha)
+            if text is None and sha in self.blob_data:
+                text = self.state_blobs.unpack(*self.blob_data[sha])
+                self.state_blobs.remember(sha, text)
+            if text is not None:
+                texts[sha] = text
+        return expand_tuple(self.state_blobs, saved, texts)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        found = {}
+        checkpoint = {**checkpoint, "channel_values": self.state_blobs.compact(checkpoint["channel_values"], found)}
+        self._save_blobs(found)
+        return super().put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        found = {}
+        writes = [(channel, self.state_blobs.compact(value, found)) for channel, value in writes]
+        self._save_blobs(found)
+        return super().put_writes(config, writes, task_id, task_path)
+
+    def get_tuple(self, config):
+        saved = super().get_tuple(config)
+        return self._expand(saved) if saved else saved
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        for saved in super().list(config, filter=filter, before=before, limit=limit):
+            yield self._expand(saved)
+
+def _pruning_sqlite_saver():
+    # Imported lazily so the memory backend works without langgraph-checkpoint-sqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    class PruningSqliteSaver(AsyncSqliteSaver):
+        """AsyncSqliteSaver that keeps only the last N checkpoints per thread,
+        deletes threads that have been idle longer than the TTL, and stores
+        long strings of the state once as blobs (see state_blobs). A blob is
+        kept while any stored checkpoint (or its pending writes) refers to it."""
+
+        def __init__(self, conn, *, keep_last: int, ttl_seconds: int, sweep_seconds: int,
+                     blobs: StateBlobs = None, serde=None):
+            super().__init__(conn, serde=serde)
+            self.state_blobs = blobs or StateBlobs()
+            self.keep_last = keep_last
+            self.ttl_seconds = ttl_seconds
+            self.sweep_seconds = sweep_seconds
+            self.last_sweep = 0.0
+            self.activity_ready = False
+
+        async def setup(self) -> None:
+            await super().setup()
+            if self.activity_ready:
+                return
+            async with self.lock:
+                await self.conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS thread_activity (
+                        thread_id TEXT PRIMARY KEY,
+                        updated_at REAL NOT NULL
+                    )
+                    """
+                )
+                await self.conn.execute(
+                    "CREATE INDEX IF NOT EXISTS thread_activity_updated ON thread_activity (updated_at)"
+                )
+                await self.conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+                        sha TEXT PRIMARY KEY,
+                        data BLOB NOT NULL,
+                        compressed INTEGER NOT NULL
+                    )
+                    """
+                )
+                # Refs used to be per thread: keep those as thread-wide refs (checkpoint_id ''),
+                # freed when the thread is deleted
+                async with self.conn.execute("PRAGMA table_info(checkpoint_blob_refs)") as cur:
+                    columns = [row[1] for row in await cur.fetchall()]
+                if columns and "checkpoint_id" not in columns:
+                    await self.conn.execute("ALTER TABLE checkpoint_blob_refs RENAME TO checkpoint_blob_refs_old")
+                    await self.conn.execute("DROP INDEX IF EXISTS checkpoint_blob_refs_sha")
+                await self.conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS checkpoint_blob_refs (
+                        thread_id TEXT NOT NULL,
+                        checkpoint_ns TEXT NOT NULL DEFAULT '',
+                        checkpoint_id TEXT NOT NULL,
+                        sha TEXT NOT NULL,
+                        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, sha)
+                    )
+                    """
+                )
+                await self.conn.execute(
+                    "CREATE INDEX IF NOT EXISTS checkpoint_blob_refs_sha ON checkpoint_blob_refs (sha)"
+                )
+                if columns and "checkpoint_id" not in columns:
+                    await self.conn.execute(
+                        "INSERT INTO checkpoint_blob_refs (thread_id, checkpoint_ns, checkpoint_id, sha) "
+                        "SELECT thread_id, '', '', sha FROM checkpoint_blob_refs_old"
+                    )
+                    await self.conn.execute("DROP TABLE checkpoint_blob_refs_old")
+                await self.conn.commit()
+            self.activity_ready = True
+
+        async def save_blobs(self, config: dict, checkpoint_id: str, found: dict) -> None:
+            """Store the blobs a checkpoint or write refers to, before it is saved itself."""
+            if not found:
+                return
+            await self.setup()
+            async with self.lock:
+                # Refs first: from then on this transaction holds SQLite's write lock, so no
+                # other process's pruning can delete the blobs before they are checked below
+                configurable = config["configurable"]
+                key = (str(configurable["thread_id"]), configurable.get("checkpoint_ns", ""), checkpoint_id)
+                await self.conn.executemany(
+                    "INSERT OR IGNORE INTO checkpoint_blob_refs (thread_id, checkpoint_ns, checkpoint_id, sha) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(*key, sha) for sha in found],
+                )
+                # Always checked in the table (another worker may have pruned a blob this one
+                # has cached); only the missing ones are compressed and stored
+                shas = list(found)
+                async with self.conn.execute(
+                    f"SELECT sha FROM checkpoint_blobs WHERE sha IN ({','.join('?' * len(shas))})", shas
+                ) as cur:
+                    stored = {row[0] for row in await cur.fetchall()}
+                new = [(sha, *self.state_blobs.pack(text)) for sha, text in found.items() if sha not in stored]
+                if new:
+                    await self.conn.executemany(
+                        "INSERT OR IGNORE INTO checkpoint_blobs (sha, data, compressed) VALUES (?, ?, ?)", new
+                    )
+                await self.conn.commit()
+            for sha, text in found.items():
+                self.state_blobs.remember(sha, text)
+
+        async def expand(self, saved):
+            """A loaded checkpoint tuple with its blob references resolved."""
+            texts, missing = {}, []
+            for sha in tuple_refs(self.state_blobs, saved):
+                text = self.state_blobs.cached(sha)
+                if text is None:
+                    missing.append(sha)
+                else:
+                    texts[sha] = text
+            if missing:
+                async with self.lock:
+                    async with self.conn.execute(
+                        f"SELECT sha, data, compressed FROM checkpoint_blobs WHERE sha IN ({','.join('?' * len(missing))})",
+                        missing,
+                    ) as cur:
+                        rows = await cur.fetchall()
+                for sha, data, compressed in rows:
+                    texts[sha] = self.state_blobs.unpack(data, bool(compressed))
+                    self.state_blobs.remember(sha, texts[sha])
+            return expand_tuple(self.state_blobs, saved, texts)
+
+        async def aget_tuple(self, config):
+            saved = await super().aget_tuple(config)
+            return await self.expand(saved) if saved else saved
+
+        async def alist(self, config, *, filter=None, before=None, limit=None):
+            # The base listing holds the lock while it yields, so read it all before expanding
+            listed = [saved async for saved in super().alist(config, filter=filter, before=before, limit=limit)]
+            for saved in listed:
+                yield await self.expand(saved)
+
+        async def aput_writes(self, config, writes, task_id, task_path=""):
+            found = {}
+            writes = [(channel, self.state_blobs.compact(value, found)) for channel, value in writes]
+            await self.save_blobs(config, config["configurable"]["checkpoint_id"], found)
+            return await super().aput_writes(config, writes, task_id, task_path)
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            found = {}
+            checkpoint = {**checkpoint, "channel_values": self.state_blobs.compact(checkpoint["channel_values"], found)}
+            await self.save_blobs(config, checkpoint["id"], found)
+            result = await super().aput(config, checkpoint, metadata, new_versions)
+            await self.prune_thread(
+                str(config["configurable"]["thread_id"]),
+                config["configurable"]["checkpoint_ns"],
+            )
+            # At most one sweep per interval, however many writes are in flight
+            if time.time() - self.last_sweep >= self.sweep_seconds:
+                await self.sweep_expired()
+            return result
+
+        async def prune_thread(self, thread_id: str, checkpoint_ns: str) -> None:
+            """Drop everything but the newest `keep_last` checkpoints of a thread, and blobs only they used."""
+            orphaned = []
+            async with self.lock:
+                await self.conn.execute(
+                    "INSERT OR REPLACE INTO thread_activity (thread_id, updated_at) VALUES (?, ?)",
+                    (thread_id, time.time()),
+                )
+                # Checkpoint ids are time-ordered (uuid6), so newest sorts last
+                async with self.conn.execute(
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                    (thread_id, checkpoint_ns, self.keep_last),
+                ) as cur:
+                    stale = [(thread_id, checkpoint_ns, row[0]) for row in await cur.fetchall()]
+                if stale:
+                    await self.conn.executemany(
+                        "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                        stale,
+                    )
+                    await self.conn.executemany(
+                        "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                        stale,
+                    )
+                    orphaned = await self.drop_blob_refs(
+                        "thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale)
+                await self.conn.commit()
+            self.state_blobs.forget(orphaned)
+
+        async def drop_blob_refs(self, where: str, keys: list) -> list:
+            """
+            Delete the blob refs matching `where` for each of `keys`, then the
+            blobs nothing refers to any more; returns their shas. Call holding
+            the lock; the caller commits.
+            """
+            shas = set()
+            for key in keys:
+                async with self.conn.execute(f"SELECT sha FROM checkpoint_blob_refs WHERE {where}", key) as cur:
+                    shas.update(row[0] for row in await cur.fetchall())
+            if not shas:
+                return []
+            await self.conn.executemany(f"DELETE FROM checkpoint_blob_refs WHERE {where}", keys)
+            async with self.conn.execute(
+                f"SELECT sha FROM checkpoint_blobs WHERE sha IN ({','.join('?' * len(shas))}) AND NOT EXISTS "
+                "(SELECT 1 FROM checkpoint_blob_refs AS refs WHERE refs.sha = checkpoint_blobs.sha)",
+                list(shas),
+            ) as cur:
+                orphaned = [row[0] for row in await cur.fetchall()]
+            await self.conn.executemany("DELETE FROM checkpoint_blobs WHERE sha = ?", [(sha,) for sha in orphaned])
+            return orphaned
+
+        async def sweep_expired(self) -> int:
+            """Delete every thread idle for longer than the TTL. Returns how many were removed."""
+            # Claimed before the first await, so concurrent writers don't start sweeps of their own
+            self.last_sweep = now = time.time()
+            await self.setup()
+            async with self.lock:
+                async with self.conn.execute(
+                    "SELECT thread_id FROM thread_activity WHERE updated_at < ?",
+                    (now - self.ttl_seconds,),
+                ) as cur:
+                    expired = [row[0] for row in await cur.fetchall()]
+            for thread_id in expired:
+                await self.adelete_thread(thread_id)
+                async with self.lock:
+                    await self.conn.execute("DELETE FROM thread_activity WHERE thread_id = ?", (thread_id,))
+                    await self.conn.commit()
+            return len(expired)
+
+        async def adelete_thread(self, thread_id: str) -> None:
+            """Delete the thread, and the blobs no other thread refers to."""
+            await super().adelete_thread(thread_id)
+            await self.setup()
+            async with self.lock:
+                orphaned = await self.drop_blob_refs("thread_id = ?", [(str(thread_id),)])
+                await self.conn.commit()
+            self.state_blobs.forget(orphaned)
+
+    return PruningSqliteSaver
+
 async def get_checkpointer():
-    """Get or create the async memory checkpointer."""
+    """Get or create the checkpointer selected by CHECKPOINTER_BACKEND."""
     global _checkpointer
     if _checkpointer is None:
-        _checkpointer = MemorySaver()
+        if CHECKPOINTER_BACKEND == "sqlite":
+            import aiosqlite
+
+            saver_cls = _pruning_sqlite_saver()
+            conn = await aiosqlite.connect(CHECKPOINT_DB_PATH)
+            _checkpointer = saver_cls(
+                conn,
+                keep_last=CHECKPOINT_KEEP_LAST,
+                ttl_seconds=CHECKPOINT_TTL_SECONDS,
+                sweep_seconds=CHECKPOINT_SWEEP_SECONDS,
+            )
+            await _checkpointer.setup()
+            await _checkpointer.sweep_expired()
+        elif CHECKPOINTER_BACKEND == "memory":
+            _checkpointer = CompactMemorySaver()
+        else:
+            raise ValueError(f"Unknown CHECKPOINTER_BACKEND: {CHECKPOINTER_BACKEND!r}")
     return _checkpointer
+
+async def close_checkpointer():
+    """Close the checkpointer's database connection (no-op for the memory backend)."""
+    global _checkpointer
+    conn = getattr(_checkpointer, "conn", None)
+    if conn is not None:
+        await conn.close()
+    _checkpointer = None
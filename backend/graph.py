@@ -1,38 +1,80 @@
+import hashlib
+import time
 from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableConfig
 from backend.state import AgentState
 from backend.agents.filter import filter_node
 from backend.agents.drafter import drafter_node
 from backend.agents.safety import safety_node
 from backend.agents.critic import critic_node
-from backend.database import get_checkpointer
+from backend.database import get_checkpointer, close_checkpointer
+from backend.config import REVIEW_MODE, PROTOCOL_CACHE, PROTOCOL_CACHE_THRESHOLD
+from backend.protocol_cache import get_protocol_index
+from backend.metrics import RunMetrics
+from backend.speculation import SpeculationTracker
+from backend.review_cache import close_review_cache
+from backend.llm import close_models
 
 MAX_REVISIONS = 3  # Safety limit to prevent infinite loops in global revisions
 
+# Graph node name → agent shown in the UI (parallel review nodes report as their agent)
+AGENT_NODES = {
+    "Filter": "Filter",
+    "Drafter": "Drafter",
+    "Safety": "Safety",
+    "Critic": "Critic",
+    "ParallelSafety": "Safety",
+    "ParallelCritic": "Critic",
+    "Library": "Library",
+    "Interrupt": "Interrupt",
+    "Rejection": "Rejection",
+}
+
+# Per-node latency, token and cost stats for the LLM agents (see build_graph)
+run_metrics = RunMetrics({node: agent for node, agent in AGENT_NODES.items() if agent in ("Filter", "Drafter", "Safety", "Critic")})
+
+# Speculative review outcomes, latency saved and tokens wasted (review_mode "speculative")
+speculation = SpeculationTracker()
+
 # Define Nodes
-def interrupt_node(state: AgentState):
+async def interrupt_node(state: AgentState):
     """Pause for human approval - marks workflow as complete after approval"""
     return {
         "status": "Approved and Finalized",
         "next": None  # Explicitly mark as complete
     }
 
-def rejection_node(state: AgentState):
-    """Handle irrelevant queries"""
-    return {"status": "Rejected", "artifact": "Your query is not related to CBT/mental health. Please try a relevant topic."}
+async def library_node(state: AgentState, config: RunnableConfig):
+    """Serve an approved protocol on the same topic instead of drafting a new one.
+    Per request, configurable `protocol_cache_threshold` overrides the similarity
+    needed and `protocol_cache_bypass` skips the lookup."""
+    configurable = config.get("configurable", {})
+    if PROTOCOL_CACHE != "on" or configurable.get("protocol_cache_bypass"):
+        return {"next": "Drafter"}
 
-# Build Graph with Bidirectional Routing
-builder = StateGraph(AgentState)
+    messages = state["messages"]
+    query = messages[-1].content if messages else ""
+    threshold = configurable.get("protocol_cache_threshold")
+    if threshold is None:
+        threshold = PROTOCOL_CACHE_THRESHOLD
+    match = get_protocol_index().lookup(query, threshold)
+    if match is None:
+        return {"next": "Drafter"}
 
-# Add all nodes
-builder.add_node("Filter", filter_node)
-builder.add_node("Drafter", drafter_node)
-builder.add_node("Safety", safety_node)
-builder.add_node("Critic", critic_node)
-builder.add_node("Interrupt", interrupt_node)
-builder.add_node("Rejection", rejection_node)
+    score, protocol = match
+    return {
+        "artifact": protocol["artifact"],
+        "status": f"Served from Protocol Library ({score:.2f})",
+        "scratchpad": {
+            "Library": f"Matched approved protocol {protocol['source'] or protocol['id'][:12]} (similarity {score:.2f})",
+            "LibraryScore": score
+        },
+        "next": "Interrupt"
+    }
 
-# Entry point
-builder.set_entry_point("Filter")
+async def rejection_node(state: AgentState):
+    """Handle irrelevant queries"""
+    return {"status": "Rejected", "artifact": "Your query is not related to CBT/mental health. Please try a relevant topic."}
 
 # Filter router - supports bidirectional loop with Safety
 def filter_router(state):
@@ -49,13 +91,14 @@ def filter_router(state):
         # Bidirectional: Filter → Safety (PII check loop)
         return "Safety"
     else:
-        # Normal forward flow: Filter → Drafter
-        return "Drafter"
-
-builder.add_conditional_edges("Filter", filter_router)
+        # Normal forward flow: Filter → Library (→ Drafter unless an approved protocol matches)
+        return "Library"
 
-# Drafter → Safety (always, after creating/revising protocol)
-builder.add_edge("Drafter", "Safety")
+def library_router(state):
+    # /revise on a served protocol marks it not approved - revise it like a Critic rejection
+    if state.get("scratchpad", {}).get("CriticApproved") is False:
+        return "Drafter"
+    return state["next"]
 
 # Safety router - supports bidirectional loops with Filter and Critic
 def safety_router(state):
@@ -88,8 +131,6 @@ def safety_router(state):
         # Safe - proceed to Critic
         return "Critic"
 
-builder.add_conditional_edges("Safety", safety_router)
-
 # Critic router - supports bidirectional loops with Drafter and Safety
 def critic_router(state):
     scratchpad = state.get("scratchpad", {})
@@ -120,13 +161,156 @@ def critic_router(state):
     # If we've exhausted iterations or revisions, approve and move forward
     return "Interrupt"
 
-builder.add_conditional_edges("Critic", critic_router)
+# Parallel review: Safety and Critic both only read the fresh draft, so after
+# the Drafter they run side by side and ReviewJoin applies the sequential
+# priorities. Each writes to its own channel since they share a super-step.
+async def parallel_safety_node(state: AgentState, config: RunnableConfig):
+    return {"safety_review": await safety_node(state, config)}
+
+async def parallel_critic_node(state: AgentState, config: RunnableConfig):
+    return {"critic_review": await critic_node(state, config)}
+
+def merge_reviews(state, safety_update: dict, critic_update: dict):
+    """
+    Combine concurrent Safety and Critic results as if they had run in
+    sequence. The Critic's result only counts if safety_router would have
+    sent the draft to the Critic; otherwise it is discarded.
+    Returns (state update, next node).
+    """
+    after_safety = {**state, **safety_update}
+    route = safety_router(after_safety)
+    if route != "Critic":
+        return safety_update, route
+    update = {**safety_update, **critic_update}
+    return update, critic_router({**after_safety, **critic_update})
+
+# Speculative review: the same two nodes, but the Critic only keeps going
+# while Safety's verdict could still send the draft to it. Halves are paired
+# up by thread and draft.
+def _speculation_key(state, config: RunnableConfig) -> tuple:
+    thread_id = config.get("configurable", {}).get("thread_id")
+    return thread_id, hashlib.sha256(state.get("artifact", "").encode("utf-8")).hexdigest()
+
+async def speculative_safety_node(state: AgentState, config: RunnableConfig):
+    started, route = time.perf_counter(), None
+    try:
+        update = await safety_node(state, config)
+        route = safety_router({**state, **update})
+        return {"safety_review": update}
+    finally:
+        speculation.safety_done(_speculation_key(state, config), route, time.perf_counter() - started)
+
+async def speculative_critic_node(state: AgentState, config: RunnableConfig):
+    thread_id = config.get("configurable", {}).get("thread_id")
+    def critic_tokens() -> int:
+        stats = run_metrics.thread_summary(thread_id).get("Critic", {})
+        return stats.get("prompt_tokens", 0) + stats.get("completion_tokens", 0)
+    update = await speculation.critic(_speculation_key(state, config), critic_node(state, config), critic_tokens)
+    return {"critic_review": update}
 
-# Terminal nodes
-builder.add_edge("Interrupt", END)
-builder.add_edge("Rejection", END)
+def review_join_node(state: AgentState):
+    update, route = merge_reviews(state, state.get("safety_review") or {}, state.get("critic_review") or {})
+    return {**update, "next": route, "safety_review": None, "critic_review": None}
 
-async def build_graph():
+def review_join_router(state):
+    # /revise marks the draft not approved after the join has routed it to
+    # Interrupt - route it like a Critic rejection, as the sequential graph does
+    scratchpad = state.get("scratchpad", {})
+    if scratchpad.get("CriticApproved") is False and not scratchpad.get("SafetyDangerous", False):
+        return critic_router(state)
+    return state["next"]
+
+async def request_revision(graph, config: dict, feedback: str):
+    """Record a reviewer's feedback on a paused thread as a Critic rejection, so resuming it revises the draft."""
+    state = await graph.aget_state(config)
+    scratchpad = dict(state.values.get("scratchpad", {}))
+    scratchpad["UserFeedback"] = feedback
+    scratchpad["Critic"] = f"User Feedback: {feedback}"
+    scratchpad["CriticApproved"] = False
+    scratchpad["CriticScore"] = 0.5  # Force revision
+    await graph.aupdate_state(config, {"scratchpad": scratchpad})
+
+def create_workflow(review_mode: str = REVIEW_MODE) -> StateGraph:
+    """
+    Build the agent graph with bidirectional routing.
+
+    review_mode "sequential" runs Drafter → Safety → Critic; "parallel"
+    runs both reviews of each new draft concurrently (see review_join_node);
+    "speculative" does too, but cancels the Critic as soon as Safety's
+    verdict skips it (see speculative_critic_node).
+    """
+    if review_mode not in ("sequential", "parallel", "speculative"):
+        raise ValueError(f"Unknown review mode: {review_mode!r}")
+
+    builder = StateGraph(AgentState)
+
+    # Add all nodes
+    builder.add_node("Filter", filter_node)
+    builder.add_node("Drafter", drafter_node)
+    builder.add_node("Safety", safety_node)
+    builder.add_node("Critic", critic_node)
+    builder.add_node("Library", library_node)
+    builder.add_node("Interrupt", interrupt_node)
+    builder.add_node("Rejection", rejection_node)
+
+    # Entry point
+    builder.set_entry_point("Filter")
+
+    builder.add_conditional_edges("Filter", filter_router)
+    builder.add_conditional_edges("Library", library_router, ["Drafter", "Interrupt"])
+
+    if review_mode in ("parallel", "speculative"):
+        # Drafter → (Safety ∥ Critic) → ReviewJoin
+        speculative = review_mode == "speculative"
+        builder.add_node("ParallelSafety", speculative_safety_node if speculative else parallel_safety_node)
+        builder.add_node("ParallelCritic", speculative_critic_node if speculative else parallel_critic_node)
+        builder.add_node("ReviewJoin", review_join_node)
+        builder.add_edge("Drafter", "ParallelSafety")
+        builder.add_edge("Drafter", "ParallelCritic")
+        builder.add_edge(["ParallelSafety", "ParallelCritic"], "ReviewJoin")
+        builder.add_conditional_edges("ReviewJoin", review_join_router, ["Filter", "Drafter", "Safety", "Critic", "Interrupt"])
+    else:
+        # Drafter → Safety (always, after creating/revising protocol)
+        builder.add_edge("Drafter", "Safety")
+
+    # Safety/Critic nodes still handle consultations and Filter rechecks in both modes
+    builder.add_conditional_edges("Safety", safety_router)
+    builder.add_conditional_edges("Critic", critic_router)
+
+    # Terminal nodes
+    builder.add_edge("Interrupt", END)
+    builder.add_edge("Rejection", END)
+    return builder
+
+# Process-wide compiled graph (compiling is too costly to repeat per request)
+_graph = None
+
+async def build_graph(review_mode: str = REVIEW_MODE):
+    """Compile a fresh graph. Prefer get_graph() outside of startup/benchmarks."""
     checkpointer = await get_checkpointer()
-    return builder.compile(checkpointer=checkpointer, interrupt_before=["Interrupt"])
+    graph = create_workflow(review_mode).compile(checkpointer=checkpointer, interrupt_before=["Interrupt"])
+    # Every run (and the LLM calls inside it) reports to run_metrics
+    return graph.with_config(callbacks=[run_metrics])
+
+async def get_graph():
+    """Get or create the shared compiled graph."""
+    global _graph
+    if _graph is None:
+        _graph = await build_graph()
+    return _graph
+
+async def warm_up_graph():
+    """Compile the graph and touch the checkpointer read path once, so the
+    first real request doesn't pay for lazy imports and setup."""
+    graph = await get_graph()
+    await graph.aget_state({"configurable": {"thread_id": "__warmup__"}})
+    return graph
+
+async def close_graph():
+    """Drop the shared graph and close its checkpointer, review cache and model clients (call on shutdown)."""
+    global _graph
+    _graph = None
+    await close_checkpointer()
+    close_review_cache()
+    await close_models()
 
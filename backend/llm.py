@@ -0,0 +1,316 @@
+import asyncio
+import importlib.util
+import json
+import re
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langgraph.config import get_config
+from pydantic import Field, PrivateAttr
+
+from backend.config import (
+    LLM_PROVIDER,
+    FAKE_LLM_LATENCY,
+    FAKE_LLM_TOKENS_PER_SECOND,
+    FAKE_LLM_SCENARIO,
+    FAKE_LLM_SCRIPT,
+    LLM_HTTP2,
+    LLM_HTTP_MAX_CONNECTIONS,
+    LLM_HTTP_KEEPALIVE_CONNECTIONS,
+    LLM_HTTP_KEEPALIVE_SECONDS,
+    LLM_HTTP_TIMEOUT_SECONDS,
+)
+
+def _critic(score: float, feedback: str = "Clear steps with concrete examples.", safety_concern: str = "") -> str:
+    # In CriticReview's field order, as structured output would produce it
+    return json.dumps({
+        "overall_score": score, "safety_concern": safety_concern,
+        "empathy_score": score, "clarity_score": score, "technique_score": score,
+        "completeness_score": score, "safety_score": score, "feedback": feedback,
+    })
+
+# Scripted replies per scenario and agent kind. Reviewer lists (safety,
+# safety_consult, critic) are indexed by the draft's revision number, so a
+# scenario plays out the same in sequential and parallel review modes; the
+# other lists are indexed by call count within the thread. The last entry
+# repeats once a list runs out.
+FAKE_SCENARIOS: Dict[str, Dict[str, List[str]]] = {
+    "approve": {
+        "critic": [_critic(0.92)],
+    },
+    "critic_revise": {
+        "critic": [_critic(0.82, "Add a concrete example to Step 2."), _critic(0.93)],
+    },
+    "safety_revise": {
+        "safety": ["REVISE: Add guidance on when to seek professional help.", "SAFE: Appropriate CBT content."],
+    },
+    "revise_twice": {
+        "safety": ["REVISE: Add guidance on when to seek professional help.", "SAFE: Appropriate CBT content."],
+        "critic": [_critic(0.93), _critic(0.82, "Progress Tracking needs a concrete schedule."), _critic(0.93)],
+    },
+    "max_loops": {
+        "critic": [_critic(0.80, "Steps are vague."), _critic(0.84, "Still vague."), _critic(0.86, "Better.")],
+    },
+    "safety_stop": {
+        "safety": ["STOP: The protocol gives medication advice."],
+    },
+    "pii_recheck": {
+        "safety": ["RECHECK_INPUT: The request may include personal details.", "SAFE: Appropriate CBT content."],
+    },
+    "safety_consult": {
+        "critic": [_critic(0.88, "Good overall.", "Step 3 may need a crisis-line note.")],
+    },
+    "irrelevant": {
+        "filter": ["irrelevant"],
+    },
+}
+
+# Replies used when the scenario doesn't script an agent kind
+FAKE_DEFAULTS: Dict[str, List[str]] = {
+    "filter": ["relevant"],
+    "filter_pii": ["CLEAN: No PII detected"],
+    "safety": ["SAFE: Appropriate CBT content."],
+    "safety_consult": ["SAFETY_CONFIRMED: The protocol already points to professional help."],
+    "critic": [_critic(0.92)],
+    "supervisor": ["Drafter"],
+}
+
+FAKE_PROTOCOL = """# CBT Protocol: Managing Everyday Anxiety
+
+## Understanding the Issue
+It's understandable to feel overwhelmed. You're not alone, and anxiety is a common, treatable experience.
+
+## CBT Technique: Cognitive Restructuring
+Cognitive restructuring helps you notice anxious thoughts, test them against evidence and replace them with balanced ones.
+
+## Step-by-Step Exercise
+
+### Step 1: Catch the Thought
+- **Action:** Write down 3 anxious thoughts as soon as you notice them.
+- **Example:** "I'll never be able to sleep tonight."
+
+### Step 2: Rate the Feeling
+- **Action:** Rate how strongly you believe each thought from 0 to 100.
+- **Example:** "I'll never sleep" - 85/100.
+
+### Step 3: Examine the Evidence
+- **Action:** List facts for and against each thought.
+- **Example:** "I slept fine on Tuesday after a stressful day."
+
+### Step 4: Write a Balanced Thought
+- **Action:** Replace the thought with a realistic alternative.
+- **Example:** "Some nights are harder, but I usually fall asleep eventually."
+
+## Progress Tracking
+- Re-rate your belief in the original thought after each exercise.
+- Practice once a day for two weeks.
+
+## Tips for Success
+- Keep your thought record somewhere easy to reach.
+- Be patient - new habits take time.
+- Reach out to a mental health professional if anxiety feels unmanageable.
+
+---
+*Remember: Every small step counts, and being kind to yourself is part of the process.*
+
+<!-- revision {revision} -->
+"""
+
+_REVISION_MARKER = re.compile(r"<!-- revision (\d+) -->")
+_SECTION_TO_REVISE = re.compile(r"SECTION TO REVISE:\n(.*?)\n\nFEEDBACK TO ADDRESS:", re.DOTALL)
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline chat model for load tests and benchmarks.
+
+    Waits `latency` seconds before the first token, then streams the reply
+    word by word at `tokens_per_second` (0 = all at once). Replies come from
+    FAKE_SCENARIOS; pick a scenario per run with
+    `config["metadata"]["fake_scenario"]`.
+    """
+    role: str
+    model: str = "fake"  # Model being stood in for - reported as ls_model_name, so costs are estimated for it
+    latency: float = FAKE_LLM_LATENCY
+    tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND
+    scenario: str = FAKE_LLM_SCENARIO
+    scenarios: Dict[str, Dict[str, List[str]]] = Field(default_factory=lambda: FAKE_SCENARIOS)
+    protocol: str = FAKE_PROTOCOL  # Drafter reply, with a {revision} placeholder
+    blocking: bool = False  # Sleep synchronously, like a sync client inside an async node
+    _calls: Dict[tuple, int] = PrivateAttr(default_factory=lambda: defaultdict(int))
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _kind(self, system: str) -> str:
+        if self.role == "filter" and "PII" in system:
+            return "filter_pii"
+        if self.role == "safety" and "consultation" in system.lower():
+            return "safety_consult"
+        if self.role == "drafter" and "one section" in system.lower():
+            return "drafter_section"
+        return self.role
+
+    def _reply(self, messages, metadata: dict) -> str:
+        system = messages[0].content if messages else ""
+        prompt = "\n".join(str(m.content) for m in messages[1:])
+        kind = self._kind(system)
+        revisions = [int(n) for n in _REVISION_MARKER.findall(prompt)]
+
+        if kind == "drafter":
+            # A revision prompt carries the previous draft and its marker
+            return self.protocol.format(revision=max(revisions) + 1 if revisions else 0)
+        if kind == "drafter_section":
+            # The section back with a new marker, so reviewers see the next revision
+            section = _SECTION_TO_REVISE.search(prompt)
+            return f"{section.group(1) if section else ''}\n<!-- revision {max(revisions, default=-1) + 1} -->"
+
+        scenario = self.scenarios.get(metadata.get("fake_scenario", self.scenario), {})
+        replies = scenario.get(kind) or FAKE_DEFAULTS.get(kind, [""])
+        if kind in ("safety", "safety_consult", "critic") and revisions:
+            index = max(revisions)
+        else:
+            key = (metadata.get("thread_id"), kind)
+            index = self._calls[key]
+            self._calls[key] += 1
+        return replies[min(index, len(replies) - 1)]
+
+    def _metadata(self, run_manager) -> dict:
+        if run_manager:
+            return run_manager.metadata
+        try:  # astream() doesn't hand _astream a run manager; the run's config still has the metadata
+            return get_config().get("metadata", {})
+        except RuntimeError:
+            return {}
+
+    def _usage(self, messages, reply: str) -> dict:
+        # Rough token estimate: ~4 characters per token
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        output_tokens = max(1, len(reply) // 4)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        reply = self._reply(messages, self._metadata(run_manager))
+        words = reply.split(" ")
+        time.sleep(self.latency + (len(words) / self.tokens_per_second if self.tokens_per_second else 0))
+        message = AIMessage(content=reply, usage_metadata=self._usage(messages, reply))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        chunks = [chunk async for chunk in self._astream(messages, stop, run_manager, **kwargs)]
+        content = "".join(chunk.text for chunk in chunks)
+        usage = chunks[-1].message.usage_metadata if chunks else None
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content, usage_metadata=usage))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        reply = self._reply(messages, self._metadata(run_manager))
+        await self._sleep(self.latency)
+        # Word-sized tokens at the configured rate, or the whole reply as one chunk
+        words = reply.split(" ") if self.tokens_per_second else [reply]
+        for i, word in enumerate(words):
+            if self.tokens_per_second:
+                await self._sleep(1 / self.tokens_per_second)
+            last = i == len(words) - 1
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=word if last else word + " ",
+                usage_metadata=self._usage(messages, reply) if last else None,
+            ))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _sleep(self, seconds: float):
+        if self.blocking:
+            time.sleep(seconds)
+        else:
+            await asyncio.sleep(seconds)
+
+def _load_script(path: Optional[str]) -> Dict[str, Dict[str, List[str]]]:
+    """FAKE_SCENARIOS, extended/overridden by a JSON file of {scenario: {kind: [replies]}}."""
+    scenarios = dict(FAKE_SCENARIOS)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            scenarios.update(json.load(f))
+    return scenarios
+
+def model_cache_id(model: BaseChatModel) -> str:
+    """Identifies a model in cache keys. Fake replies also depend on the run's scenario."""
+    if isinstance(model, FakeChatModel):
+        try:
+            scenario = get_config().get("metadata", {}).get("fake_scenario", model.scenario)
+        except RuntimeError:  # Called outside a graph run
+            scenario = model.scenario
+        return f"fake/{model.model}/{scenario}"
+    return getattr(model, "model_name", None) or getattr(model, "model", "") or type(model).__name__
+
+def get_chat_model(role: str, model: str, max_tokens: int) -> BaseChatModel:
+    """Chat model for an agent, from the provider selected by LLM_PROVIDER."""
+    if LLM_PROVIDER == "fake":
+        return FakeChatModel(role=role, model=model, scenarios=_load_script(FAKE_LLM_SCRIPT))
+    if LLM_PROVIDER == "openai":
+        from langchain_openai import ChatOpenAI
+        http_client, http_async_client = get_http_clients()
+        return ChatOpenAI(
+            model=model,
+            max_tokens=max_tokens,
+            max_retries=0,  # Retries are the scheduler's job
+            http_client=http_client,
+            http_async_client=http_async_client,
+            stream_usage=True,  # Only on by default with the SDK's own clients
+        )
+    raise ValueError(f"Unknown LLM_PROVIDER: {LLM_PROVIDER!r}")
+
+# Model and reply limit per agent. Clients are built on first use, so importing
+# the graph (e.g. for /check_thread) doesn't load the provider SDK.
+MODEL_SPECS = {
+    "filter": ("gpt-4o-mini", 300),  # Increased for better classification
+    "drafter": ("gpt-4o-mini", 4000),  # Increased for longer protocols
+    "safety": ("gpt-4o-mini", 800),  # Increased for thorough safety reviews
+    "critic": ("gpt-4o-mini", 1000),  # Increased for detailed feedback
+    "supervisor": ("gpt-5-mini", 100),
+}
+
+_models: Dict[str, BaseChatModel] = {}
+
+def get_model(role: str) -> BaseChatModel:
+    """The agent's chat model, built on first use and shared afterwards."""
+    model = _models.get(role)
+    if model is None:
+        name, max_tokens = MODEL_SPECS[role]
+        model = _models[role] = get_chat_model(role, model=name, max_tokens=max_tokens)
+    return model
+
+# (sync, async) httpx clients shared by all OpenAI models, created on first use
+_http_clients = None
+
+def get_http_clients() -> tuple:
+    """One tuned keep-alive connection pool for every agent, over HTTP/2 when available."""
+    global _http_clients
+    if _http_clients is None:
+        import httpx
+        http2 = LLM_HTTP2 == "on" or (LLM_HTTP2 == "auto" and importlib.util.find_spec("h2") is not None)
+        settings = {
+            "http2": http2,
+            "limits": httpx.Limits(
+                max_connections=LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_HTTP_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_HTTP_KEEPALIVE_SECONDS,
+            ),
+            "timeout": httpx.Timeout(LLM_HTTP_TIMEOUT_SECONDS, connect=10.0),
+        }
+        _http_clients = (httpx.Client(**settings), httpx.AsyncClient(**settings))
+    return _http_clients
+
+async def close_models():
+    """Drop the built models and close the shared connection pool (call on shutdown)."""
+    global _http_clients
+    _models.clear()
+    if _http_clients is not None:
+        http_client, http_async_client = _http_clients
+        _http_clients = None
+        http_client.close()
+        await http_async_client.aclose()
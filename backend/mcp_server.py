@@ -8,9 +8,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
 
 from mcp.server.fastmcp import FastMCP
-from backend.graph import build_graph
+from backend.graph import get_graph
+from backend.config import START_COALESCING
+from backend.singleflight import get_flights, flight_key
 from langchain_core.messages import HumanMessage
-import asyncio
 import uuid
 
 # Initialize FastMCP Server
@@ -23,10 +24,16 @@ async def create_protocol(query: str) -> str:
     This tool triggers the Cerina Foundry multi-agent system.
     """
     thread_id = str(uuid.uuid4())
+    if START_COALESCING != "on":
+        return await run_protocol(query, thread_id)
+    # Identical queries in flight (e.g. a client retrying after a timeout) share one run
+    return await get_flights().run(flight_key(query), thread_id, lambda tid: run_protocol(query, tid), "mcp")
+
+async def run_protocol(query: str, thread_id: str) -> str:
     config = {"configurable": {"thread_id": thread_id}}
     input_data = {"messages": [HumanMessage(content=query)]}
     
-    graph = await build_graph()
+    graph = await get_graph()
     
     # Run the graph until interrupt or end
     async for event in graph.astream(input_data, config, stream_mode="values"):
@@ -34,7 +41,7 @@ async def create_protocol(query: str) -> str:
         pass
         
     # Get final state
-    state = graph.get_state(config)
+    state = await graph.aget_state(config)
     values = state.values
     
     status = values.get("status", "Unknown")
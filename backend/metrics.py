@@ -0,0 +1,267 @@
+import asyncio
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+# (name, type, help, value) - type is "gauge" or "counter"; value is a number,
+# or a {label string: number} dict such as {'agent="Drafter"': 1.5}
+Metric = Tuple[str, str, str, Union[int, float, Dict[str, Union[int, float]]]]
+
+# Estimated USD per 1M tokens (prompt, completion)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-5-mini": (0.25, 2.00),
+}
+
+MAX_TRACKED_THREADS = 1000  # Per-thread summaries kept in memory (LRU)
+
+def render_prometheus(metrics: Iterable[Metric]) -> str:
+    """Render metrics in the Prometheus text exposition format."""
+    lines = []
+    for name, kind, help_text, value in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if isinstance(value, dict):
+            for labels, sample in value.items():
+                lines.append(f"{name}{{{labels}}} {sample}")
+        else:
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+def stream_metrics(stats: dict) -> list:
+    """Metrics for a StreamSessionManager.stats() snapshot."""
+    return [
+        ("cerina_stream_sessions", "gauge", "Open SSE stream sessions", stats["sessions"]),
+        ("cerina_stream_subscribers", "gauge", "Connected SSE clients", stats["subscribers"]),
+        ("cerina_stream_queued_events", "gauge", "Events waiting in stream queues", stats["queued_events"]),
+        ("cerina_stream_dropped_events_total", "counter", "Events dropped because a queue was full", stats["dropped_events"]),
+        ("cerina_stream_evicted_sessions_total", "counter", "Stream sessions evicted by TTL or LRU", stats["evicted_sessions"]),
+        ("cerina_stream_replayed_events_total", "counter", "Events replayed to reconnecting clients", stats["replayed_events"]),
+    ]
+
+def relevance_metrics(stats: dict) -> list:
+    """Metrics for a RelevanceClassifier.stats() snapshot."""
+    return [
+        ("cerina_relevance_decisions_total", "counter", "Filter relevance decisions by who made them",
+         {'source="local",label="relevant"': stats["relevant"], 'source="local",label="irrelevant"': stats["irrelevant"],
+          'source="llm"': stats["llm"]}),
+        ("cerina_relevance_local_hit_rate", "gauge", "Share of relevance checks answered without the LLM", round(stats["hit_rate"], 4)),
+        ("cerina_relevance_confidence_threshold", "gauge", "Classifier confidence needed to skip the LLM", stats["threshold"]),
+    ]
+
+def review_cache_metrics(stats: dict) -> list:
+    """Metrics for a ReviewCache.stats() snapshot."""
+    by_kind = lambda counts: {f'kind="{kind}"': n for kind, n in sorted(counts.items())}
+    return [
+        ("cerina_review_cache_entries", "gauge", "Verdicts held in the in-memory review cache", stats["entries"]),
+        ("cerina_review_cache_hits_total", "counter", "Reviews answered from the cache", by_kind(stats["hits"])),
+        ("cerina_review_cache_disk_hits_total", "counter", "Cache hits served by the SQLite tier", by_kind(stats["disk_hits"])),
+        ("cerina_review_cache_misses_total", "counter", "Reviews that needed an LLM call", by_kind(stats["misses"])),
+        ("cerina_review_cache_db_evicted_total", "counter", "Oldest verdicts dropped from the SQLite tier", stats["db_evicted"]),
+    ]
+
+def coalescing_metrics(stats: dict) -> list:
+    """Metrics for a SingleFlight.stats() snapshot."""
+    by_entry = lambda counts: {f'entry="{entry}"': n for entry, n in counts.items()}
+    return [
+        ("cerina_start_in_flight", "gauge", "Runs other identical requests can join", stats["in_flight"]),
+        ("cerina_start_runs_total", "counter", "Requests (/start, MCP) that led a new coalescable run",
+         by_entry(stats["started"])),
+        ("cerina_start_coalesced_total", "counter", "Requests (/start, MCP) attached to a run already in flight",
+         by_entry(stats["coalesced"])),
+    ]
+
+def scheduler_metrics(stats: dict) -> list:
+    """Metrics for an LLMScheduler.stats() snapshot."""
+    by_class = lambda values: {f'class="{c}"': v for c, v in values.items()}
+    return [
+        ("cerina_llm_queue_depth", "gauge", "LLM calls waiting for a scheduler slot", by_class(stats["queued"])),
+        ("cerina_llm_running", "gauge", "LLM calls in flight", stats["running"]),
+        ("cerina_llm_scheduled_calls_total", "counter", "LLM calls started by the scheduler", by_class(stats["calls"])),
+        ("cerina_llm_queue_wait_seconds_total", "counter", "Time LLM calls spent queued", by_class(stats["wait_seconds"])),
+        ("cerina_llm_queue_wait_max_seconds", "gauge", "Longest queue wait seen", stats["max_wait_seconds"]),
+        ("cerina_llm_retries_total", "counter", "LLM calls retried after a transient error", stats["retries"]),
+        ("cerina_llm_rate_limited_total", "counter", "Rate-limit replies from the provider", stats["rate_limited"]),
+        ("cerina_llm_failures_total", "counter", "LLM calls that failed after retries", stats["failures"]),
+    ]
+
+def speculation_metrics(stats: dict) -> list:
+    """Metrics for a SpeculationTracker.stats() snapshot."""
+    return [
+        ("cerina_speculative_reviews_in_flight", "gauge", "Speculative Critic reviews waiting on Safety", stats["in_flight"]),
+        ("cerina_speculative_reviews_total", "counter", "Speculative Critic reviews by outcome",
+         {f'outcome="{outcome}"': stats[outcome] for outcome in ("committed", "cancelled", "discarded")}),
+        ("cerina_speculative_saved_seconds_total", "counter", "Critic time overlapped with Safety on committed reviews", stats["saved_seconds"]),
+        ("cerina_speculative_wasted_tokens_total", "counter", "Tokens spent on cancelled or discarded Critic reviews", stats["wasted_tokens"]),
+    ]
+
+def run_registry_metrics(stats: dict) -> list:
+    """Metrics for a RunRegistry.stats() snapshot."""
+    return [
+        ("cerina_runs_in_flight", "gauge", "Graph runs in progress", stats["running"]),
+        ("cerina_runs_started_total", "counter", "Graph runs started (start, approve, resume, revise)", stats["started"]),
+        ("cerina_runs_cancelled_total", "counter", "Graph runs cancelled, by reason",
+         {f'reason="{reason}"': n for reason, n in stats["cancelled"].items()}),
+    ]
+
+def artifact_store_metrics(stats: dict) -> list:
+    """Metrics for an ArtifactStore.stats() snapshot."""
+    return [
+        ("cerina_protocols_saved_total", "counter", "Approved protocols written to the library", stats["saved"]),
+        ("cerina_protocols_duplicate_total", "counter", "Approvals of a protocol already in the library", stats["duplicates"]),
+        ("cerina_protocol_save_failures_total", "counter", "Approved protocols that could not be saved", stats["failures"]),
+        ("cerina_protocol_saves_in_flight", "gauge", "Approved protocols being written", stats["in_flight"]),
+        ("cerina_protocol_save_seconds_total", "counter", "Time the writer threads spent saving protocols", stats["write_seconds"]),
+    ]
+
+def estimate_cost(model: Optional[str], prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of one call (0 for models without a known price)."""
+    prompt_price, completion_price = MODEL_PRICES.get(model or "", (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+class AgentStats:
+    """Counters for one agent (per thread, or process-wide)."""
+    __slots__ = ("visits", "node_seconds", "llm_calls", "ttft_seconds", "prompt_tokens", "completion_tokens", "cost_usd")
+
+    def __init__(self):
+        self.visits = 0
+        self.node_seconds = 0.0
+        self.llm_calls = 0
+        self.ttft_seconds = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+
+    def summary(self) -> dict:
+        return {
+            "visits": self.visits,
+            "seconds": round(self.node_seconds, 3),
+            "llm_calls": self.llm_calls,
+            "avg_ttft_ms": round(self.ttft_seconds / self.llm_calls * 1000, 1) if self.llm_calls else None,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+class RunMetrics(AsyncCallbackHandler):
+    """
+    Callback handler attached to the compiled graph. Records, per agent
+    (`node_agents` maps graph node name → agent):
+    wall time of each node visit, and for each LLM call the time to first
+    token, prompt/completion tokens and estimated cost. Aggregated per
+    thread (for the final `control` event) and process-wide (for /metrics).
+    """
+
+    def __init__(self, node_agents: Dict[str, str], max_threads: int = MAX_TRACKED_THREADS):
+        self.node_agents = node_agents
+        self.max_threads = max_threads
+        self.nodes = {}  # run_id -> (thread_id, agent, started)
+        self.llm_calls = {}  # run_id -> [thread_id, agent, model, started, first_token_at]
+        self.threads: "OrderedDict[str, Dict[str, AgentStats]]" = OrderedDict()
+        self.totals: Dict[str, AgentStats] = defaultdict(AgentStats)
+
+    def _stats(self, thread_id: Optional[str], agent: str):
+        """The (thread, process-wide) stats objects for an agent."""
+        thread = self.threads.get(thread_id)
+        if thread is None:
+            thread = self.threads[thread_id] = defaultdict(AgentStats)
+            while len(self.threads) > self.max_threads:
+                self.threads.popitem(last=False)
+        else:
+            self.threads.move_to_end(thread_id)
+        return thread[agent], self.totals[agent]
+
+    async def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, name=None, **kwargs):
+        metadata = metadata or {}
+        if name in self.node_agents and metadata.get("langgraph_node") == name:
+            self.nodes[run_id] = (metadata.get("thread_id"), self.node_agents[name], time.perf_counter())
+
+    async def on_chain_end(self, outputs, *, run_id, **kwargs):
+        node = self.nodes.pop(run_id, None)
+        if node:
+            thread_id, agent, started = node
+            elapsed = time.perf_counter() - started
+            for stats in self._stats(thread_id, agent):
+                stats.visits += 1
+                stats.node_seconds += elapsed
+
+    async def on_chain_error(self, error, *, run_id, **kwargs):
+        await self.on_chain_end(None, run_id=run_id)
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        metadata = metadata or {}
+        agent = self.node_agents.get(metadata.get("langgraph_node"))
+        if agent:
+            # Prompt size is kept (~4 characters a token) for streams closed before usage arrives
+            prompt_estimate = sum(len(str(m.content)) for batch in messages for m in batch) // 4
+            self.llm_calls[run_id] = [metadata.get("thread_id"), agent, metadata.get("ls_model_name"), time.perf_counter(), None, 0, prompt_estimate]
+
+    async def on_llm_new_token(self, token, *, run_id, **kwargs):
+        call = self.llm_calls.get(run_id)
+        if call:
+            if call[4] is None:
+                call[4] = time.perf_counter()
+            call[5] += 1
+
+    async def on_llm_end(self, response, *, run_id, **kwargs):
+        call = self.llm_calls.pop(run_id, None)
+        if not call:
+            return
+        thread_id, agent, model, started, first_token_at, chunks, prompt_estimate = call
+        # Without streaming the first token arrives with the whole reply
+        ttft = (first_token_at or time.perf_counter()) - started
+        if isinstance(kwargs.get("error"), (GeneratorExit, asyncio.CancelledError)):
+            prompt_tokens, completion_tokens = prompt_estimate, chunks  # A token per streamed chunk
+        else:
+            prompt_tokens, completion_tokens = _token_usage(response)
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+        for stats in self._stats(thread_id, agent):
+            stats.llm_calls += 1
+            stats.ttft_seconds += ttft
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.cost_usd += cost
+
+    async def on_llm_error(self, error, *, run_id, response=None, **kwargs):
+        if isinstance(error, (GeneratorExit, asyncio.CancelledError)):
+            # Stream closed once the caller had what it needed, or the call was cancelled - still billed
+            await self.on_llm_end(response, run_id=run_id, error=error)
+        else:
+            self.llm_calls.pop(run_id, None)
+
+    def thread_summary(self, thread_id: str) -> dict:
+        """Per-agent stats for one thread, plus a total."""
+        agents = self.threads.get(thread_id, {})
+        summary = {agent: stats.summary() for agent, stats in agents.items()}
+        total = AgentStats()
+        for stats in agents.values():
+            for field in AgentStats.__slots__:
+                setattr(total, field, getattr(total, field) + getattr(stats, field))
+        summary["total"] = total.summary()
+        return summary
+
+    def prometheus(self) -> list:
+        """Process-wide per-agent metrics for render_prometheus()."""
+        by_agent = lambda field: {f'agent="{agent}"': round(getattr(stats, field), 6) for agent, stats in self.totals.items()}
+        return [
+            ("cerina_node_visits_total", "counter", "Graph node visits per agent", by_agent("visits")),
+            ("cerina_node_seconds_total", "counter", "Wall time spent in agent nodes", by_agent("node_seconds")),
+            ("cerina_llm_calls_total", "counter", "LLM calls per agent", by_agent("llm_calls")),
+            ("cerina_llm_ttft_seconds_total", "counter", "Summed LLM time to first token per agent", by_agent("ttft_seconds")),
+            ("cerina_llm_prompt_tokens_total", "counter", "Prompt tokens per agent", by_agent("prompt_tokens")),
+            ("cerina_llm_completion_tokens_total", "counter", "Completion tokens per agent", by_agent("completion_tokens")),
+            ("cerina_llm_cost_usd_total", "counter", "Estimated LLM cost in USD per agent", by_agent("cost_usd")),
+        ]
+
+def _token_usage(response) -> Tuple[int, int]:
+    """(prompt, completion) tokens from an LLMResult, via usage_metadata or llm_output."""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
@@ -0,0 +1,119 @@
+import json
+from typing import Any, Dict
+
+# Incremental reader for a JSON object arriving in pieces (a streamed model
+# reply). Hands back each top-level field as soon as its value is complete,
+# so a caller can act on the first fields without waiting for the rest.
+
+_WHITESPACE = " \t\r\n"
+
+class FieldStream:
+    """
+    Feed it text as it arrives; `fields` holds the top-level members of the
+    first JSON object parsed so far. Text before the object (a code fence,
+    a preamble) is skipped. A value counts only once it has ended - "0.9"
+    is not read as a score until the "3" of "0.93" can no longer follow.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.state = "start"  # start -> key -> colon -> value -> comma -> ... -> done
+        self.key = None
+        self.fields: Dict[str, Any] = {}
+
+    @property
+    def done(self) -> bool:
+        """The object's closing brace has arrived."""
+        return self.state == "done"
+
+    def feed(self, text: str) -> Dict[str, Any]:
+        self.buffer += text
+        while self.state != "done":
+            if self.state == "value":
+                end = self._value_end()
+                if end is None:
+                    break
+                try:
+                    self.fields[self.key] = json.loads(self.buffer[self.pos:end])
+                except json.JSONDecodeError:
+                    self.state = "done"  # Not JSON after all; keep what was read
+                    break
+                self.pos = end
+                self.state = "comma"
+                continue
+            self._skip_whitespace()
+            if self.pos >= len(self.buffer):
+                break
+            char = self.buffer[self.pos]
+            if self.state == "start":
+                self.pos += 1
+                if char == "{":
+                    self.state = "key"
+            elif self.state == "key":
+                if char == "}":
+                    self.state = "done"
+                    break
+                end = self._string_end(self.pos) if char == '"' else -1
+                if end is None:
+                    break
+                if end < 0:
+                    self.state = "done"
+                    break
+                self.key = json.loads(self.buffer[self.pos:end])
+                self.pos = end
+                self.state = "colon"
+            elif self.state == "colon":
+                self.pos += 1
+                self.state = "value" if char == ":" else "done"
+            elif self.state == "comma":
+                self.pos += 1
+                self.state = "key" if char == "," else "done"
+        return self.fields
+
+    def _skip_whitespace(self):
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+            self.pos += 1
+
+    def _string_end(self, start: int):
+        """Index just past the string opening at `start`, or None if it hasn't closed yet."""
+        i = start + 1
+        while i < len(self.buffer):
+            if self.buffer[i] == "\\":
+                i += 2
+            elif self.buffer[i] == '"':
+                return i + 1
+            else:
+                i += 1
+        return None
+
+    def _value_end(self):
+        """Index just past the value at self.pos, or None if it may still continue."""
+        self._skip_whitespace()
+        if self.pos >= len(self.buffer):
+            return None
+        char = self.buffer[self.pos]
+        if char == '"':
+            return self._string_end(self.pos)
+        if char in "{[":
+            depth, i = 0, self.pos
+            while i < len(self.buffer):
+                if self.buffer[i] == '"':
+                    end = self._string_end(i)
+                    if end is None:
+                        return None
+                    i = end
+                    continue
+                if self.buffer[i] in "{[":
+                    depth += 1
+                elif self.buffer[i] in "}]":
+                    depth -= 1
+                    if depth == 0:
+                        return i + 1
+                i += 1
+            return None
+        # Number or literal: ends at the next delimiter
+        i = self.pos
+        while i < len(self.buffer) and self.buffer[i] not in ",}]" + _WHITESPACE:
+            i += 1
+        return i if i < len(self.buffer) else None
@@ -0,0 +1,117 @@
+import re
+from typing import List
+
+# Local PII pre-screen for the Filter's PII check.
+#
+# One compiled alternation with a named group per kind scans a message in a
+# single pass, and messages without a digit, an "@" or a name introduction
+# skip even that. Matches are either definite PII (reported without asking the
+# LLM) or ambiguous (a bare date, a lone first name, an unstructured digit
+# run). A CLEAN verdict only means no pattern matched - free-text PII ("I'm
+# Sarah Johnson and my husband...") is beyond regexes, so the Filter still
+# asks the LLM for everything but definite PII.
+
+_STREET_SUFFIX = (
+    r"(?i:street|st|avenue|ave|road|rd|boulevard|blvd|lane|ln|drive|dr|court|ct|"
+    r"way|place|pl|terrace|ter|circle|cir|highway|hwy|parkway|pkwy)"
+)
+_MONTH = (
+    r"(?i:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|"
+    r"sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+)
+_DATE = (
+    rf"(?:\d{{1,2}}[/.-]\d{{1,2}}[/.-](?:19|20)?\d{{2}}"
+    rf"|(?:19|20)\d{{2}}-\d{{1,2}}-\d{{1,2}}"
+    rf"|{_MONTH}\.?\s+\d{{1,2}}(?:st|nd|rd|th)?,?\s+(?:19|20)\d{{2}}"
+    rf"|\d{{1,2}}(?:st|nd|rd|th)?\s+(?:of\s+)?{_MONTH}\.?,?\s+(?:19|20)\d{{2}})"
+)
+
+# Order matters: at each position the first alternative that matches wins
+_PII_PATTERN = re.compile("|".join([
+    r"(?P<email>\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b)",
+    r"(?P<ssn>\b(?!000|666|9\d\d)\d{3}[- ](?!00)\d{2}[- ](?!0000)\d{4}\b)",
+    rf"(?P<dob>(?i:\bborn(?:\s+on)?|\bd\.?o\.?b\.?|\bdate\s+of\s+birth|\bbirth\s?day(?:\s+is)?)[:\s]+{_DATE})",
+    rf"(?P<date>\b{_DATE}\b)",
+    r"(?P<mrn>(?i:\b(?:mrn|medical\s+record(?:\s+(?:number|no\.?|#))?|patient\s+id)\b)[:#\s]*[A-Z0-9-]{5,})",
+    r"(?P<po_box>\b(?i:p\.?\s?o\.?\s+box)\s+\d+)",
+    rf"(?P<address>\b\d{{1,6}}\s+(?:[A-Z][a-z]+\s+){{1,4}}{_STREET_SUFFIX}\b\.?)",
+    r"(?P<number>(?<![\w/.-])\+?\(?\d[\d\s().-]{5,}\d(?![\w/]))",
+    r"(?P<name>(?i:\bmy\s+name\s+is|\bi\s+am\s+called|\bcall\s+me)\s+[A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)",
+    r"(?P<handle>(?<![\w.])@[A-Za-z0-9_]{3,})",
+]))
+
+_YEAR_RANGE = re.compile(r"^(?:19|20)\d{2}\s*[-–]\s*(?:19|20)\d{2}$")
+
+# Kind → description used in the Filter's "PII_FOUND: ..." result
+PII_LABELS = {
+    "email": "email address",
+    "ssn": "Social Security number",
+    "card": "credit card number",
+    "phone": "phone number",
+    "dob": "date of birth",
+    "mrn": "medical record number",
+    "address": "street address",
+    "po_box": "mailing address",
+    "name": "full name",
+}
+
+# Every pattern but `name` needs a digit or an "@"
+_TRIGGER = re.compile(r"[\d@]")
+_NAME_INTRO = re.compile(r"(?i:\bmy\s+name\s+is|\bi\s+am\s+called|\bcall\s+me)\s+(?=[A-Z])")
+
+def luhn_valid(digits: str) -> bool:
+    """Luhn checksum, as used by payment card numbers."""
+    total = 0
+    for i, char in enumerate(reversed(digits)):
+        n = int(char)
+        if i % 2:
+            n = n * 2 - 9 if n > 4 else n * 2
+        total += n
+    return total % 10 == 0
+
+def _classify(kind: str, text: str):
+    """(kind, definite) for a raw match, or None when it's not PII at all."""
+    if kind == "number":
+        if _YEAR_RANGE.match(text):
+            return None
+        digits = re.sub(r"\D", "", text)
+        if 13 <= len(digits) <= 19:
+            return ("card", True) if luhn_valid(digits) else ("number", False)
+        if len(digits) == 10 or (len(digits) == 11 and digits[0] == "1") or (text.startswith("+") and 8 <= len(digits) <= 15):
+            return "phone", True
+        return "number", False  # 7-9 (maybe an SSN or local phone) or 12+ unstructured digits
+    if kind == "name":
+        # "my name is Jane Smith" is a full name; a lone first name may be a pet, a colleague...
+        return ("name", True) if len(text[_NAME_INTRO.match(text).end():].split()) >= 2 else ("name", False)
+    if kind in ("date", "handle"):
+        return kind, False
+    return kind, True
+
+def _result(matches: List[tuple]) -> dict:
+    found = sorted({kind for kind, definite in matches if definite})
+    ambiguous = sorted({kind for kind, definite in matches if not definite})
+    if found:
+        verdict = "PII_FOUND"
+        summary = "PII_FOUND: " + ", ".join(PII_LABELS[kind] for kind in found) + " (local screen)"
+    elif ambiguous:
+        verdict, summary = "AMBIGUOUS", None
+    else:
+        verdict, summary = "CLEAN", "CLEAN: No PII detected"
+    return {"verdict": verdict, "found": found, "ambiguous": ambiguous, "summary": summary}
+
+def scan_pii(text: str) -> dict:
+    """
+    Screen one message for PII.
+
+    Returns {"verdict": "PII_FOUND" | "CLEAN" | "AMBIGUOUS", "found": [kinds],
+    "ambiguous": [kinds], "summary": Filter-style result string, or None
+    when the verdict is AMBIGUOUS and the LLM should decide}.
+    """
+    if not _TRIGGER.search(text) and not _NAME_INTRO.search(text):
+        return _result([])
+    matches = []
+    for match in _PII_PATTERN.finditer(text):
+        classified = _classify(match.lastgroup, match.group())
+        if classified:
+            matches.append(classified)
+    return _result(matches)
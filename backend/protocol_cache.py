@@ -0,0 +1,163 @@
+import glob
+import hashlib
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from backend.config import PROTOCOL_CACHE_DIR, PROTOCOL_CACHE_THRESHOLD
+
+# Similarity index over approved protocols, so a query on an already
+# covered topic ("trouble sleeping" after "sleep anxiety") can be served
+# the approved protocol instead of running Drafter → Safety → Critic.
+#
+# Each protocol is indexed by the query that produced it (when known) and
+# its title, technique and opening paragraph - the step-by-step body is
+# shared boilerplate across topics and only adds noise. Queries are
+# compared by TF-IDF cosine similarity over an inverted index: adding a
+# protocol only touches its own terms' postings, and a search only scores
+# the protocols sharing a term with the query.
+#
+# Off by default (PROTOCOL_CACHE): a served protocol goes straight to the
+# human reviewer without being adapted to the query or re-reviewed.
+
+_WORD = re.compile(r"[a-z]+")
+_TITLE = re.compile(r"^#\s+(?:CBT Protocol:\s*)?(.+)$", re.MULTILINE)
+_TECHNIQUE = re.compile(r"^##\s+CBT Technique:\s*(.+)$", re.MULTILINE)
+_ISSUE = re.compile(r"^##\s+Understanding the Issue\s*\n(.+?)(?=^#|\Z)", re.MULTILINE | re.DOTALL)
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "cbt", "do", "for", "from", "get",
+    "help", "how", "i", "in", "into", "is", "it", "its", "me", "my", "of", "on", "or", "protocol",
+    "so", "that", "the", "this", "to", "with", "you", "your", "want", "need", "some", "about", "what",
+    "t", "have", "really", "very", "always", "night", "day",
+    # How the ask is phrased rather than what it is about
+    "trouble", "problem", "problems", "issue", "issues", "deal", "dealing", "cope", "coping", "manage",
+    "managing", "management", "overcome", "overcoming", "improve", "improving", "better", "tips", "tip",
+    "feel", "feeling", "feelings", "understanding", "therapy", "technique", "exercise",
+}
+
+# Everyday words folded onto the term the protocols use
+SYNONYMS = {
+    "insomnia": "sleep", "sleepless": "sleep", "asleep": "sleep", "sleeping": "sleep",
+    "anxious": "anxiety", "nervous": "anxiety", "nerves": "anxiety", "worry": "anxiety", "worries": "anxiety",
+    "depressed": "depression", "panicking": "panic", "stressed": "stress", "stressful": "stress",
+    "exams": "exam", "tests": "test", "angry": "anger", "lonely": "loneliness",
+}
+
+# Field → weight in a protocol's index vector
+FIELD_WEIGHTS = {"query": 3.0, "title": 3.0, "technique": 2.0, "issue": 0.5}
+
+def _stem(word: str) -> str:
+    word = SYNONYMS.get(word, word)
+    for suffix in ("ing", "ies", "es", "s", "ed", "ly"):
+        if word.endswith(suffix) and not word.endswith("ss") and len(word) - len(suffix) >= 4:
+            word = word[: -len(suffix)]
+            break
+    return SYNONYMS.get(word, word)
+
+def terms(text: str) -> List[str]:
+    return [_stem(w) for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+
+def protocol_fields(artifact: str, query: Optional[str] = None) -> Dict[str, str]:
+    """The parts of a protocol that describe its topic."""
+    fields = {}
+    for name, pattern in (("title", _TITLE), ("technique", _TECHNIQUE), ("issue", _ISSUE)):
+        match = pattern.search(artifact)
+        if match:
+            fields[name] = match.group(1).strip()
+    if query:
+        fields["query"] = query
+    return fields
+
+class ProtocolIndex:
+    """TF-IDF index of approved protocols; `search()` returns the best match and its score."""
+
+    def __init__(self):
+        self.docs: List[dict] = []  # {"id", "artifact", "source", "tf": {term: 1 + log(count)}}
+        self.ids = set()
+        self.postings: Dict[str, Dict[int, float]] = {}  # term -> {doc position: tf}
+        # Doc position -> (len(docs) when computed, vector norm); idf moves with every add,
+        # so norms are recomputed lazily, for the docs a search actually scores
+        self.norms: Dict[int, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, artifact: str, query: Optional[str] = None, source: Optional[str] = None) -> bool:
+        """Index a protocol. Returns False if the same text is already indexed."""
+        doc_id = hashlib.sha256(artifact.encode("utf-8")).hexdigest()
+        if doc_id in self.ids:
+            return False
+        counts = Counter()
+        for field, text in protocol_fields(artifact, query).items():
+            for term in terms(text):
+                counts[term] += FIELD_WEIGHTS[field]
+        position = len(self.docs)
+        tf = {term: 1 + math.log(count) for term, count in counts.items()}
+        self.docs.append({"id": doc_id, "artifact": artifact, "source": source, "tf": tf})
+        self.ids.add(doc_id)
+        for term, weight in tf.items():
+            self.postings.setdefault(term, {})[position] = weight
+        return True
+
+    def load_dir(self, path: str = PROTOCOL_CACHE_DIR) -> int:
+        """Index every Markdown protocol in a folder (e.g. CBT_Downloaded/). Returns how many were added."""
+        added = 0
+        for filepath in sorted(glob.glob(os.path.join(path, "*.md"))):
+            with open(filepath, encoding="utf-8") as f:
+                added += self.add(f.read(), source=os.path.basename(filepath))
+        return added
+
+    def _idf(self, term: str) -> float:
+        # Terms no protocol uses (df 0) count fully against a match
+        return math.log((1 + len(self.docs)) / (1 + len(self.postings.get(term, ())))) + 1
+
+    def _norm(self, position: int) -> float:
+        cached = self.norms.get(position)
+        if cached is not None and cached[0] == len(self.docs):
+            return cached[1]
+        norm = math.sqrt(sum((tf * self._idf(t)) ** 2 for t, tf in self.docs[position]["tf"].items()))
+        self.norms[position] = (len(self.docs), norm)
+        return norm
+
+    @staticmethod
+    def _normalize(vector: Dict[str, float]) -> Dict[str, float]:
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {t: v / norm for t, v in vector.items()} if norm else vector
+
+    def search(self, query: str) -> Optional[tuple]:
+        """(score, doc) of the most similar protocol, or None for an empty index or query."""
+        if not self.docs:
+            return None
+        counts = Counter(terms(query))
+        idf = {t: self._idf(t) for t in counts}
+        q = self._normalize({t: (1 + math.log(c)) * idf[t] for t, c in counts.items()})
+        if not q:
+            return None
+        # Dot products over the query terms' postings; protocols sharing no term score 0
+        dots = Counter()
+        for t, w in q.items():
+            for position, tf in self.postings.get(t, {}).items():
+                dots[position] += w * tf * idf[t]
+        if not dots:
+            return 0.0, self.docs[0]
+        scores = {position: dot / self._norm(position) for position, dot in dots.items()}
+        best = max(scores, key=lambda position: (scores[position], -position))  # Earliest of equal scores
+        return scores[best], self.docs[best]
+
+    def lookup(self, query: str, threshold: float = PROTOCOL_CACHE_THRESHOLD) -> Optional[tuple]:
+        """search(), but only a match scoring at least `threshold`."""
+        match = self.search(query)
+        return match if match and match[0] >= threshold else None
+
+# Process-wide index over PROTOCOL_CACHE_DIR, built on first use
+_index = None
+
+def get_protocol_index() -> ProtocolIndex:
+    global _index
+    if _index is None:
+        _index = ProtocolIndex()
+        _index.load_dir()
+    return _index
@@ -0,0 +1,189 @@
+import glob
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Optional
+
+from backend.config import PROTOCOL_CACHE_DIR, PROTOCOL_LIBRARY_DB
+from backend.protocol_cache import protocol_fields
+
+# Browsable, searchable catalogue of the approved protocols in
+# CBT_Downloaded/: one row per saved file in SQLite plus an FTS5 full-text
+# index over title, technique, the query that produced it and the text.
+# Owned by the artifact store, which adds each protocol as it is saved;
+# sync() catches up with files added or removed by hand. Serves the
+# paginated /protocols endpoints - listing and searching stay index
+# lookups however many protocols there are, instead of reading the folder.
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+def match_query(text: str) -> Optional[str]:
+    """FTS5 query for free text: every word must appear, the last one as a prefix (typeahead)."""
+    words = _WORD.findall(text.lower())
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words[:-1]) + f' "{words[-1]}"*'
+
+class ProtocolLibrary:
+    """
+    SQLite catalogue of saved protocols at `db_path`, used from the event
+    loop and the artifact writer threads alike (one connection, one lock).
+    """
+
+    def __init__(self, db_path: Optional[str] = PROTOCOL_LIBRARY_DB, save_dir: str = PROTOCOL_CACHE_DIR):
+        self.save_dir = save_dir
+        self.db_path = db_path or os.path.join(save_dir, "library.db")
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA mmap_size = 268435456")  # Read pages straight from the mapped file
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS protocols (
+                id INTEGER PRIMARY KEY,
+                file TEXT UNIQUE NOT NULL,
+                sha256 TEXT NOT NULL,
+                title TEXT,
+                technique TEXT,
+                query TEXT,
+                thread_id TEXT,
+                score REAL,
+                chars INTEGER,
+                approvals INTEGER NOT NULL DEFAULT 1,
+                approved_at TEXT
+            );
+            CREATE INDEX IF NOT EXISTS protocols_sha256 ON protocols (sha256);
+            CREATE INDEX IF NOT EXISTS protocols_approved_at ON protocols (approved_at);
+            CREATE VIRTUAL TABLE IF NOT EXISTS protocols_fts USING fts5(
+                title, technique, query, body, tokenize = 'porter unicode61'
+            );
+            """
+        )
+        self.db.commit()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM protocols").fetchone()[0]
+
+    def add(self, file: str, artifact: str, record: Optional[dict] = None) -> int:
+        """
+        Catalogue a saved protocol file (`record` is its artifact-store index
+        line, if any). A file already catalogued only has its approvals
+        counted. Returns the protocol's id.
+        """
+        with self.lock:
+            row = self.db.execute("SELECT id FROM protocols WHERE file = ?", (file,)).fetchone()
+            if row is not None:
+                self.db.execute("UPDATE protocols SET approvals = approvals + 1 WHERE id = ?", (row["id"],))
+                protocol_id = row["id"]
+            else:
+                protocol_id = self._insert(file, artifact, record or {})
+            self.db.commit()
+            return protocol_id
+
+    def _insert(self, file: str, artifact: str, record: dict) -> int:
+        fields = protocol_fields(artifact, record.get("query"))
+        cursor = self.db.execute(
+            "INSERT INTO protocols (file, sha256, title, technique, query, thread_id, score, chars, approved_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (file, record.get("sha256") or hashlib.sha256(artifact.encode("utf-8")).hexdigest(),
+             fields.get("title"), fields.get("technique"), fields.get("query"), record.get("thread_id"),
+             record.get("score"), len(artifact), record.get("approved_at")),
+        )
+        self.db.execute(
+            "INSERT INTO protocols_fts (rowid, title, technique, query, body) VALUES (?, ?, ?, ?, ?)",
+            (cursor.lastrowid, fields.get("title"), fields.get("technique"), fields.get("query"), artifact),
+        )
+        return cursor.lastrowid
+
+    def remove(self, file: str) -> bool:
+        with self.lock:
+            row = self.db.execute("SELECT id FROM protocols WHERE file = ?", (file,)).fetchone()
+            if row is None:
+                return False
+            self.db.execute("DELETE FROM protocols_fts WHERE rowid = ?", (row["id"],))
+            self.db.execute("DELETE FROM protocols WHERE id = ?", (row["id"],))
+            self.db.commit()
+            return True
+
+    def sync(self, records: Optional[dict] = None) -> tuple:
+        """
+        Catalogue .md files the library doesn't know (with their index line
+        from `records`, file -> record, if any) and drop rows whose file is
+        gone. Returns (added, removed).
+        """
+        on_disk = {os.path.basename(path) for path in glob.glob(os.path.join(self.save_dir, "*.md"))}
+        with self.lock:
+            known = {row["file"] for row in self.db.execute("SELECT file FROM protocols")}
+        new = sorted(on_disk - known)
+        for start in range(0, len(new), 500):  # One transaction per 500 files
+            with self.lock:
+                for file in new[start:start + 500]:
+                    path = os.path.join(self.save_dir, file)
+                    with open(path, encoding="utf-8") as f:
+                        artifact = f.read()
+                    record = (records or {}).get(file) or {
+                        "approved_at": datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds")}
+                    self._insert(file, artifact, record)
+                self.db.commit()
+        removed = sum(self.remove(file) for file in known - on_disk)
+        return len(new), removed
+
+    def _page(self, rows, total: int, limit: int, offset: int) -> dict:
+        items = [dict(row) for row in rows]
+        return {
+            "items": items,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "next_offset": offset + len(items) if offset + len(items) < total else None,
+        }
+
+    def list(self, limit: int = 20, offset: int = 0) -> dict:
+        """A page of protocols, newest first."""
+        with self.lock:
+            total = self.db.execute("SELECT COUNT(*) FROM protocols").fetchone()[0]
+            rows = self.db.execute(
+                "SELECT * FROM protocols ORDER BY approved_at DESC, id DESC LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
+        return self._page(rows, total, limit, offset)
+
+    def search(self, text: str, limit: int = 20, offset: int = 0) -> dict:
+        """A page of the protocols matching `text`, best match first, each with a highlighted `snippet`."""
+        query = match_query(text)
+        if query is None:
+            return self._page([], 0, limit, offset)
+        with self.lock:
+            total = self.db.execute("SELECT COUNT(*) FROM protocols_fts WHERE protocols_fts MATCH ?", (query,)).fetchone()[0]
+            # Title and technique weigh most, then the query that produced the protocol, then its text
+            rows = self.db.execute(
+                "SELECT p.*, snippet(protocols_fts, 3, '**', '**', '…', 12) AS snippet, "
+                "bm25(protocols_fts, 4.0, 2.0, 2.0, 1.0) AS rank "
+                "FROM protocols_fts JOIN protocols AS p ON p.id = protocols_fts.rowid "
+                "WHERE protocols_fts MATCH ? ORDER BY rank LIMIT ? OFFSET ?",
+                (query, limit, offset),
+            ).fetchall()
+        return self._page(rows, total, limit, offset)
+
+    def get(self, protocol_id: int) -> Optional[dict]:
+        """A protocol's catalogue row plus its text (`artifact`), or None."""
+        with self.lock:
+            row = self.db.execute("SELECT * FROM protocols WHERE id = ?", (protocol_id,)).fetchone()
+        if row is None:
+            return None
+        protocol = dict(row)
+        try:
+            with open(os.path.join(self.save_dir, protocol["file"]), encoding="utf-8") as f:
+                protocol["artifact"] = f.read()
+        except FileNotFoundError:
+            return None
+        return protocol
+
+    def close(self):
+        with self.lock:
+            self.db.close()
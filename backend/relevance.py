@@ -0,0 +1,101 @@
+import json
+import math
+import os
+import random
+import re
+import zlib
+from typing import Dict, List, Optional
+
+from backend.config import RELEVANCE_CONFIDENCE
+
+# Local relevance classifier for the Filter's entry check.
+#
+# Hashed word/bigram/character n-gram features plus a mental-health keyword
+# count, scored by a logistic regression trained at first use from the
+# bundled seed set (relevance_seed.json, a fraction of a second). Confident
+# predictions skip the LLM; the rest fall back to RELEVANCE_PROMPT.
+
+SEED_PATH = os.path.join(os.path.dirname(__file__), "relevance_seed.json")
+HASH_BUCKETS = 1 << 18
+
+KEYWORDS = {
+    "anxiety", "anxious", "panic", "depression", "depressed", "stress", "stressed", "worry",
+    "sleep", "insomnia", "mood", "fear", "phobia", "trauma", "grief", "lonely", "guilt",
+    "guilty", "anger", "angry", "cbt", "therapy", "cope", "coping", "overwhelmed", "sad",
+    "hopeless", "worthless", "mindfulness", "rumination", "overthinking", "burnout",
+    "self-esteem", "nervous", "ocd", "thoughts", "feel", "feeling", "emotional", "mental",
+}
+
+_WORD = re.compile(r"[a-z0-9']+(?:-[a-z0-9']+)*")
+
+def _features(text: str) -> List[int]:
+    words = _WORD.findall(text.lower())
+    grams = [f"w:{w}" for w in words]
+    grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"<{w}>"
+        grams += [f"c:{padded[i:i + 4]}" for i in range(max(1, len(padded) - 3))]
+    keyword_hits = sum(w in KEYWORDS for w in words)
+    grams.append(f"k:{min(keyword_hits, 3)}")
+    grams.append("bias")
+    return [zlib.crc32(gram.encode()) % HASH_BUCKETS for gram in grams]
+
+class RelevanceClassifier:
+    """Logistic regression over hashed n-grams, returning P(relevant)."""
+
+    def __init__(self, threshold: float = RELEVANCE_CONFIDENCE):
+        self.threshold = threshold
+        self.weights: Dict[int, float] = {}
+        self.decisions = {"relevant": 0, "irrelevant": 0, "llm": 0}
+
+    def fit(self, examples: List[tuple], epochs: int = 20, lr: float = 0.2, l2: float = 1e-2, seed: int = 0):
+        """Train on (text, is_relevant) pairs with plain SGD. The fairly strong L2 keeps
+        unfamiliar queries near 0.5, so they go to the LLM instead of being guessed."""
+        rows = [(_features(text), 1.0 if label else 0.0) for text, label in examples]
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(rows)
+            for features, label in rows:
+                error = self._sigmoid(features) - label
+                for i in features:
+                    w = self.weights.get(i, 0.0)
+                    self.weights[i] = w - lr * (error + l2 * w)
+        return self
+
+    def _sigmoid(self, features: List[int]) -> float:
+        z = sum(self.weights.get(i, 0.0) for i in features)
+        return 1 / (1 + math.exp(-max(-30.0, min(30.0, z))))
+
+    def probability(self, text: str) -> float:
+        return self._sigmoid(_features(text))
+
+    def classify(self, text: str) -> Optional[str]:
+        """'relevant' / 'irrelevant' when confident, None when the LLM should decide."""
+        p = self.probability(text)
+        if p >= self.threshold:
+            decision = "relevant"
+        elif p <= 1 - self.threshold:
+            decision = "irrelevant"
+        else:
+            decision = None
+        self.decisions[decision or "llm"] += 1
+        return decision
+
+    def stats(self) -> dict:
+        total = sum(self.decisions.values())
+        local = self.decisions["relevant"] + self.decisions["irrelevant"]
+        return {**self.decisions, "threshold": self.threshold, "hit_rate": local / total if total else 0.0}
+
+def load_seed(path: str = SEED_PATH) -> List[tuple]:
+    with open(path, encoding="utf-8") as f:
+        seed = json.load(f)
+    return [(text, True) for text in seed["relevant"]] + [(text, False) for text in seed["irrelevant"]]
+
+# Process-wide classifier, trained on first use
+_classifier = None
+
+def get_relevance_classifier() -> RelevanceClassifier:
+    global _classifier
+    if _classifier is None:
+        _classifier = RelevanceClassifier().fit(load_seed())
+    return _classifier
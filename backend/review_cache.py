@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Optional
+
+from backend.config import REVIEW_CACHE_SIZE, REVIEW_CACHE_DB, REVIEW_CACHE_DB_SIZE
+
+def review_key(prompt: str, model_id: str, artifact: str) -> str:
+    """Content address of a review: the prompt text (its version), the model and the artifact."""
+    digest = hashlib.sha256()
+    for part in (prompt, model_id, artifact):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+class ReviewCache:
+    """
+    Parsed Safety/Critic verdicts by review_key().
+
+    An in-memory LRU of `max_entries` (0 disables the cache), optionally
+    backed by a SQLite table at `db_path` so verdicts survive restarts and
+    are shared between worker processes. The table keeps the newest
+    `db_max_entries` verdicts. Disk reads and writes run in a worker thread
+    to keep the event loop free.
+    """
+
+    def __init__(self, max_entries: int = REVIEW_CACHE_SIZE, db_path: Optional[str] = REVIEW_CACHE_DB,
+                 db_max_entries: int = REVIEW_CACHE_DB_SIZE):
+        self.max_entries = max_entries
+        self.db_max_entries = max(1, db_max_entries)
+        # Trimming scans past the newest db_max_entries rows, so it runs every tenth of that many puts
+        self.trim_every = max(1, self.db_max_entries // 10)
+        self.db_puts = 0
+        self.db_evicted = 0
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = defaultdict(int)  # kind -> count
+        self.disk_hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self.db = None
+        self.db_lock = threading.Lock()
+        if db_path and max_entries:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS review_cache (key TEXT PRIMARY KEY, kind TEXT, verdict TEXT, created_at REAL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS review_cache_created_at ON review_cache (created_at)")
+            self._db_trim()
+            self.db.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    async def get(self, key: str, kind: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        verdict = self.entries.get(key)
+        if verdict is not None:
+            self.entries.move_to_end(key)
+            self.hits[kind] += 1
+            return verdict
+        if self.db is not None:
+            verdict = await asyncio.to_thread(self._db_get, key)
+            if verdict is not None:
+                self._remember(key, verdict)
+                self.hits[kind] += 1
+                self.disk_hits[kind] += 1
+                return verdict
+        self.misses[kind] += 1
+        return None
+
+    async def put(self, key: str, kind: str, verdict: dict):
+        if not self.enabled:
+            return
+        self._remember(key, verdict)
+        if self.db is not None:
+            await asyncio.to_thread(self._db_put, key, kind, verdict)
+
+    def _remember(self, key: str, verdict: dict):
+        self.entries[key] = verdict
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _db_get(self, key: str) -> Optional[dict]:
+        with self.db_lock:
+            row = self.db.execute("SELECT verdict FROM review_cache WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _db_put(self, key: str, kind: str, verdict: dict):
+        with self.db_lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO review_cache (key, kind, verdict, created_at) VALUES (?, ?, ?, ?)",
+                (key, kind, json.dumps(verdict), time.time()),
+            )
+            self.db_puts += 1
+            if self.db_puts % self.trim_every == 0:
+                self._db_trim()
+            self.db.commit()
+
+    def _db_trim(self):
+        """Drop the oldest verdicts beyond db_max_entries (other processes' included). Call holding db_lock."""
+        cursor = self.db.execute(
+            "DELETE FROM review_cache WHERE key IN "
+            "(SELECT key FROM review_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.db_max_entries,),
+        )
+        self.db_evicted += max(0, cursor.rowcount)
+
+    def close(self):
+        if self.db is not None:
+            with self.db_lock:
+                self.db.close()
+            self.db = None
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "hits": dict(self.hits),
+            "disk_hits": dict(self.disk_hits),
+            "misses": dict(self.misses),
+            "db_evicted": self.db_evicted,
+        }
+
+# Process-wide cache, created on first use
+_review_cache = None
+
+def get_review_cache() -> ReviewCache:
+    global _review_cache
+    if _review_cache is None:
+        _review_cache = ReviewCache()
+    return _review_cache
+
+def close_review_cache():
+    global _review_cache
+    if _review_cache is not None:
+        _review_cache.close()
+    _review_cache = None
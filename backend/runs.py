@@ -0,0 +1,92 @@
+import asyncio
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Optional
+
+# Graph runs in flight, by thread. Runs are asyncio tasks, so cancelling one
+# stops it at its next await - including a model call or a queued scheduler
+# slot - and the checkpoint of the last finished step is what /resume picks up.
+
+# Why a run was cancelled, as reported in its "Cancelled" control event
+CANCEL_REASONS = ("user", "deadline", "superseded", "abandoned")
+
+class RunRegistry:
+    """
+    Tracks the task running each thread's graph, cancels it on request, at
+    its deadline, or once nobody has watched it for a grace period.
+    `on_cancel(thread_id)` is called as soon as a run is cancelled, before
+    its task has unwound.
+    """
+
+    def __init__(self, on_cancel: Optional[Callable[[str], None]] = None):
+        self.on_cancel = on_cancel
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.reasons: Dict[str, str] = {}  # thread_id -> why its current run is being cancelled
+        self.deadlines: Dict[str, asyncio.TimerHandle] = {}
+        self.watchdogs: Dict[str, asyncio.TimerHandle] = {}  # Pending abandonment checks
+        self.started = 0
+        self.cancelled = defaultdict(int)  # reason -> runs
+
+    def __contains__(self, thread_id: str) -> bool:
+        task = self.tasks.get(thread_id)
+        return task is not None and not task.done()
+
+    def start(self, thread_id: str, run: Awaitable, deadline_seconds: Optional[float] = None) -> asyncio.Task:
+        """Run `run` as the thread's task, cancelled after `deadline_seconds` if given."""
+        task = asyncio.ensure_future(run)
+        self.tasks[thread_id] = task
+        self.reasons.pop(thread_id, None)
+        self.started += 1
+        self._clear_timers(thread_id)
+        if deadline_seconds:
+            self.deadlines[thread_id] = asyncio.get_running_loop().call_later(
+                deadline_seconds, self.cancel, thread_id, "deadline")
+        task.add_done_callback(lambda _: self._finished(thread_id, task))
+        return task
+
+    def cancel(self, thread_id: str, reason: str = "user") -> Optional[asyncio.Task]:
+        """Cancel the thread's run; returns its task (to await) or None if nothing is running."""
+        task = self.tasks.get(thread_id)
+        if task is None or task.done():
+            return None
+        if thread_id not in self.reasons:
+            self.reasons[thread_id] = reason
+            self.cancelled[reason] += 1
+        task.cancel()
+        if self.on_cancel is not None:
+            self.on_cancel(thread_id)
+        return task
+
+    def reason(self, thread_id: str) -> Optional[str]:
+        return self.reasons.get(thread_id)
+
+    def watch_abandonment(self, thread_id: str, grace_seconds: float, watched: Callable[[], bool]):
+        """Cancel the thread's run if `watched()` is still false `grace_seconds` from now (0 = never)."""
+        if not grace_seconds or thread_id not in self:
+            return
+        def check():
+            self.watchdogs.pop(thread_id, None)
+            if not watched():
+                self.cancel(thread_id, "abandoned")
+        previous = self.watchdogs.pop(thread_id, None)
+        if previous is not None:
+            previous.cancel()  # The grace period restarts from the latest disconnect
+        self.watchdogs[thread_id] = asyncio.get_running_loop().call_later(grace_seconds, check)
+
+    def _clear_timers(self, thread_id: str):
+        for timers in (self.deadlines, self.watchdogs):
+            timer = timers.pop(thread_id, None)
+            if timer is not None:
+                timer.cancel()
+
+    def _finished(self, thread_id: str, task: asyncio.Task):
+        if self.tasks.get(thread_id) is task:
+            del self.tasks[thread_id]
+            self.reasons.pop(thread_id, None)
+            self._clear_timers(thread_id)
+
+    def stats(self) -> dict:
+        return {
+            "running": sum(1 for task in self.tasks.values() if not task.done()),
+            "started": self.started,
+            "cancelled": {reason: self.cancelled[reason] for reason in CANCEL_REASONS},
+        }
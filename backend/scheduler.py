@@ -0,0 +1,266 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from collections import defaultdict
+from typing import Callable, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langgraph.config import get_config
+
+from backend.config import (
+    LLM_MAX_CONCURRENCY,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_SECONDS,
+    LLM_RETRY_MAX_SECONDS,
+    LLM_RATE_BURST_SECONDS,
+)
+
+# Process-wide LLM call scheduler. Every agent call waits here for a
+# concurrency slot and room in the requests/min and tokens/min budgets, so
+# a load spike queues up in priority order instead of tripping the
+# provider's rate limits for everyone at once.
+
+# Request classes, most urgent first: someone watching a /start run, then
+# MCP/CLI/benchmark work. Runs pick theirs with config["metadata"]["priority"].
+REQUEST_CLASSES = ("interactive", "batch")
+
+# Call stages, most urgent first: reviews of a draft already in flight,
+# revisions, then work for a new run - so started runs finish first
+STAGES = ("review", "revision", "new")
+
+RETRYABLE_ERRORS = {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError", "TimeoutError"}
+
+class TokenBucket:
+    """
+    Refilled continuously at `per_minute` units a minute (0 = unlimited),
+    holding at most `burst_seconds` worth - providers enforce per-minute
+    limits over much shorter windows, so a full minute's burst would be refused.
+    """
+
+    def __init__(self, per_minute: int, burst_seconds: float = LLM_RATE_BURST_SECONDS):
+        self.rate = per_minute / 60
+        self.capacity = self.rate * burst_seconds
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 = now)."""
+        if not self.rate:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)  # Oversized requests wait for a full bucket, not forever
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float):
+        """Spend `amount` units; negative amounts refund an over-estimate. The level may go negative."""
+        if self.rate:
+            self._refill()
+            self.level = min(self.capacity, self.level - amount)
+
+class LLMScheduler:
+    """
+    Priority queue in front of the model provider.
+
+    Waiting calls are ordered by (request class, stage, arrival). The head
+    of the queue starts once a concurrency slot is free and both token
+    buckets can cover it; token spend is estimated up front (prompt size
+    plus max_tokens) and corrected from the reply's usage. Retryable
+    errors are retried with jittered exponential backoff, and a rate-limit
+    reply pauses all new calls until the provider's Retry-After.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, requests_per_minute: int = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = LLM_TOKENS_PER_MINUTE, max_retries: int = LLM_MAX_RETRIES,
+                 retry_base: float = LLM_RETRY_BASE_SECONDS, retry_max: float = LLM_RETRY_MAX_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.waiting = []  # Heap of (priority, seq, future, tokens, request class)
+        self.seq = itertools.count()
+        self.running = 0
+        self.paused_until = 0.0  # Set from rate-limit replies
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.calls = defaultdict(int)  # request class -> calls started
+        self.wait_seconds = defaultdict(float)  # request class -> total queue wait
+        self.max_wait = 0.0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    async def acquire(self, request_class: str, stage: str, tokens: int) -> float:
+        """Wait for a slot; returns the seconds spent queued. Pair with release()."""
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        priority = (REQUEST_CLASSES.index(request_class), STAGES.index(stage))
+        heapq.heappush(self.waiting, (priority, next(self.seq), future, tokens, request_class))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # Granted just as the caller was cancelled
+            raise
+        waited = time.monotonic() - started
+        self.calls[request_class] += 1
+        self.wait_seconds[request_class] += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def release(self):
+        self.running -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Start queued calls in priority order while slots and budget allow."""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        while self.waiting and (not self.max_concurrency or self.running < self.max_concurrency):
+            _, _, future, tokens, _ = self.waiting[0]
+            if future.done():  # Caller was cancelled while queued
+                heapq.heappop(self.waiting)
+                continue
+            delay = max(self.paused_until - time.monotonic(), self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if delay > 0:
+                self.timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self.waiting)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.running += 1
+            future.set_result(None)
+
+    async def call(self, model: BaseChatModel, messages: list, stage: str = "new",
+                   until: Optional[Callable[[str], bool]] = None, **kwargs):
+        """
+        `model.ainvoke(messages, **kwargs)` through the queue, retrying transient
+        provider errors. With `until`, the reply is streamed and cut off as soon
+        as until(reply so far) is true.
+        """
+        request_class = _request_class()
+        estimate = estimate_tokens(model, messages)
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(request_class, stage, estimate)
+            try:
+                if until is None:
+                    response = await model.ainvoke(messages, **kwargs)
+                else:
+                    response = await _stream_until(model, messages, until, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not _retryable(e):
+                    self.failures += 1
+                    raise
+                delay = self._backoff(attempt, e)
+            else:
+                usage = getattr(response, "usage_metadata", None) or {}
+                self.tokens.take(usage.get("total_tokens", estimate) - estimate)
+                return response
+            finally:
+                self.release()
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Seconds before retry `attempt + 1`: full jitter, or the provider's Retry-After plus jitter."""
+        if _status(error) != 429:
+            return random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+        # Rate limited: hold back every queued call, not just this one
+        self.rate_limited += 1
+        pause = _retry_after(error) or min(self.retry_max, self.retry_base * 2 ** attempt)
+        self.paused_until = max(self.paused_until, time.monotonic() + pause)
+        return pause + random.uniform(0, self.retry_base)
+
+    def stats(self) -> dict:
+        queued = defaultdict(int)
+        for _, _, future, _, request_class in self.waiting:
+            if not future.done():
+                queued[request_class] += 1
+        return {
+            "queued": {c: queued[c] for c in REQUEST_CLASSES},
+            "running": self.running,
+            "calls": {c: self.calls[c] for c in REQUEST_CLASSES},
+            "wait_seconds": {c: round(self.wait_seconds[c], 6) for c in REQUEST_CLASSES},
+            "max_wait_seconds": round(self.max_wait, 6),
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures,
+        }
+
+def estimate_tokens(model: BaseChatModel, messages: list) -> int:
+    """Tokens a call may spend: the prompt (~4 characters a token) plus the reply limit."""
+    prompt = sum(len(str(m.content)) for m in messages) // 4
+    return prompt + (getattr(model, "max_tokens", None) or 256)
+
+async def _stream_until(model: BaseChatModel, messages: list, until: Callable[[str], bool], **kwargs):
+    """Stream a reply, closing the stream (and the provider's generation) once until(text) holds."""
+    reply, text, chunks = None, "", 0
+    stream = model.astream(messages, **kwargs)
+    try:
+        async for chunk in stream:
+            reply = chunk if reply is None else reply + chunk
+            text += chunk.text
+            chunks += 1
+            if until(text):
+                break
+        else:
+            # A stream that ended without a single chunk still answers with a (empty) message
+            return reply if reply is not None else AIMessage(content="")
+    finally:
+        await stream.aclose()
+    # Cut short: no usage arrives, so count the prompt estimate and a token per chunk
+    input_tokens = sum(len(str(m.content)) for m in messages) // 4
+    usage = {"input_tokens": input_tokens, "output_tokens": chunks, "total_tokens": input_tokens + chunks}
+    return AIMessage(content=text, usage_metadata=usage, response_metadata={"finish_reason": "stopped_early"})
+
+def _request_class() -> str:
+    try:
+        request_class = get_config().get("metadata", {}).get("priority", "batch")
+    except RuntimeError:  # Called outside a graph run
+        request_class = "batch"
+    return request_class if request_class in REQUEST_CLASSES else "batch"
+
+def _status(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def _retryable(error: Exception) -> bool:
+    status = _status(error)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+# Process-wide scheduler, created on first use
+_scheduler = None
+
+def get_scheduler() -> LLMScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler()
+    return _scheduler
+
+async def invoke_llm(model: BaseChatModel, messages: list, stage: str = "new",
+                     until: Optional[Callable[[str], bool]] = None, **kwargs):
+    """Call a chat model through the process-wide scheduler (see LLMScheduler.call)."""
+    return await get_scheduler().call(model, messages, stage, until, **kwargs)
@@ -0,0 +1,176 @@
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Section-level view of a protocol, in the Markdown layout INITIAL_PROMPT
+# asks for (# title, ## Understanding the Issue, ## CBT Technique: ...,
+# ## Step-by-Step Exercise with ### Step N: ..., ## Progress Tracking,
+# ## Tips for Success). Lets the Drafter rewrite just the sections a piece
+# of feedback is about and splice them back into the draft, and the
+# reviewers re-read only the sections that changed since their last review.
+
+_HEADING = re.compile(r"^(#{1,3})\s+(.+?)\s*$", re.MULTILINE)
+_STEP = re.compile(r"^Step\s+(\d+)\b", re.IGNORECASE)
+_STEP_REFERENCE = re.compile(r"\bsteps?\s+(\d+)(?:\s*(?:-|–|to|and|&)\s*(\d+))?", re.IGNORECASE)
+
+# Heading (up to any ":") -> how feedback tends to refer to it
+SECTION_ALIASES = {
+    "cbt protocol": ("title",),
+    "understanding the issue": ("understanding the issue", "introduction", "opening paragraph", "validation"),
+    "cbt technique": ("technique explanation", "technique section", "explanation of the technique"),
+    "step-by-step exercise": ("step-by-step", "all steps", "the steps", "exercise steps"),
+    "progress tracking": ("progress tracking", "tracking", "track progress", "measure progress", "schedule", "frequency"),
+    "tips for success": ("tips",),
+}
+CLOSING_ALIASES = ("closing", "remember", "encouraging statement", "ending")
+
+# Above this share of the draft, regenerating everything is no more expensive
+MAX_TARGET_SHARE = 0.6
+
+class Section:
+    """One heading and the text up to the next heading (the preamble has level 0 and no name)."""
+    __slots__ = ("level", "name", "text")
+
+    def __init__(self, level: int, name: str, text: str):
+        self.level = level
+        self.name = name
+        self.text = text
+
+    @property
+    def key(self) -> str:
+        """Heading without its subtitle, lowercased: "CBT Technique: X" -> "cbt technique"."""
+        return self.name.split(":", 1)[0].strip().lower()
+
+    @property
+    def step(self) -> Optional[int]:
+        match = _STEP.match(self.name)
+        return int(match.group(1)) if match else None
+
+def split_sections(markdown: str) -> List[Section]:
+    """Split a draft at its #, ## and ### headings. join_sections() gives back the exact text."""
+    sections = []
+    matches = list(_HEADING.finditer(markdown))
+    if not matches or matches[0].start() > 0:
+        sections.append(Section(0, "", markdown[:matches[0].start() if matches else len(markdown)]))
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following else len(markdown)
+        sections.append(Section(len(match.group(1)), match.group(2), markdown[match.start():end]))
+    return sections
+
+def join_sections(sections: List[Section]) -> str:
+    return "".join(section.text for section in sections)
+
+def _mentions(text: str, phrases) -> bool:
+    return any(re.search(rf"\b{re.escape(phrase)}\b", text) for phrase in phrases)
+
+def target_sections(feedback: str, sections: List[Section]) -> List[int]:
+    """Indexes of the sections a piece of feedback refers to (empty if it can't be pinned down)."""
+    text = feedback.lower()
+    targets = set()
+
+    steps = set()
+    for match in _STEP_REFERENCE.finditer(feedback):
+        first = int(match.group(1))
+        last = int(match.group(2) or first)
+        steps.update(range(first, max(first, last) + 1))
+
+    in_exercise = False
+    for i, section in enumerate(sections):
+        if section.level == 2:
+            in_exercise = section.key == "step-by-step exercise"
+        aliases = SECTION_ALIASES.get(section.key, ())
+        subtitle = section.name.split(":", 1)[1].strip().lower() if ":" in section.name else ""
+        if section.step in steps:
+            targets.add(i)
+        elif _mentions(text, aliases):
+            targets.add(i)
+        elif len(subtitle.split()) >= 2 and subtitle in text:
+            targets.add(i)  # e.g. "Catch the Thought needs an example"
+
+        # "the steps" means every step of the exercise
+        if section.step is not None and in_exercise and _mentions(text, SECTION_ALIASES["step-by-step exercise"]):
+            targets.add(i)
+
+    if _mentions(text, CLOSING_ALIASES) and sections:
+        targets.add(len(sections) - 1)  # The closing line ends the last section
+    return sorted(targets)
+
+def plan_revision(feedbacks: List[str], sections: List[Section]) -> Optional[List[int]]:
+    """
+    Sections to regenerate for all of `feedbacks`, or None when the whole
+    draft should be rewritten: some feedback isn't about a particular
+    section, or the targets are most of the draft anyway.
+    """
+    targets = set()
+    for feedback in feedbacks:
+        found = target_sections(feedback, sections)
+        if not found:
+            return None
+        targets.update(found)
+    targets.discard(next((i for i, s in enumerate(sections) if s.key == "step-by-step exercise"), None))
+    total = sum(len(s.text) for s in sections) or 1
+    if not targets or sum(len(sections[i].text) for i in targets) / total > MAX_TARGET_SHARE:
+        return None
+    return sorted(targets)
+
+def splice_section(section: Section, reply: str) -> Optional[str]:
+    """
+    A model's rewrite of `section`, cleaned up to replace it in place: same
+    heading level, nothing past the section, original trailing whitespace.
+    None if the reply isn't a rewrite of this section.
+    """
+    body = reply.strip()
+    fence = re.match(r"^```(?:markdown|md)?\n(.*?)\n```$", body, re.DOTALL)
+    if fence:
+        body = fence.group(1).strip()
+    if not body:
+        return None
+    first = _HEADING.match(body)
+    if first is None:
+        body = f"{'#' * section.level} {section.name}\n{body}"  # Heading left out
+    elif len(first.group(1)) != section.level:
+        return None
+    # Drop anything the model carried on into (the next step, the rest of the protocol)
+    for match in _HEADING.finditer(body):
+        if match.start() > 0 and len(match.group(1)) <= section.level:
+            body = body[:match.start()].rstrip()
+            break
+    trailing = section.text[len(section.text.rstrip()):]
+    return body + (trailing or "\n")
+
+def section_hash(section: Section) -> str:
+    return hashlib.sha256(section.text.strip().encode("utf-8")).hexdigest()[:16]
+
+def plan_rereview(sections: List[Section], reviewed: Dict[str, object]) -> Optional[Tuple[List[int], List[int]]]:
+    """
+    (changed, unchanged) section indexes when a reviewer that already
+    passed the sections hashed in `reviewed` only needs to look at what
+    changed. None means review the whole draft: no earlier review, nothing
+    (or everything) changed, or the changes are most of the draft.
+    """
+    if not reviewed:
+        return None
+    changed = [i for i, s in enumerate(sections) if section_hash(s) not in reviewed and s.text.strip()]
+    unchanged = [i for i, s in enumerate(sections) if i not in changed and s.text.strip()]
+    if not changed or not unchanged:
+        return None
+    total = sum(len(s.text) for s in sections) or 1
+    if sum(len(sections[i].text) for i in changed) / total > MAX_TARGET_SHARE:
+        return None
+    return changed, unchanged
+
+def summarize_sections(sections: List[Section], indexes: List[int], width: int = 80) -> str:
+    """One line per section - its heading and the start of its text - standing in for sections already reviewed."""
+    lines = []
+    for i in indexes:
+        section = sections[i]
+        body = next((line.strip() for line in section.text.splitlines()[1 if section.level else 0:] if line.strip()), "")
+        body = re.sub(r"^[-*+]\s+", "", body)  # List marker
+        if len(body) > width:
+            body = body[:width].rstrip() + "..."
+        heading = f"{'#' * section.level} {section.name}" if section.level else ""
+        lines.append(f"{heading} - {body}" if heading and body else heading or body)
+    return "\n".join(lines)
+
+def sections_text(sections: List[Section], indexes: List[int]) -> str:
+    return "\n\n".join(sections[i].text.strip() for i in indexes)
@@ -4,19 +4,44 @@ from dotenv import load_dotenv
 # Load env from the directory where this file exists
 load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, Request, Header
+from fastapi.responses import StreamingResponse, PlainTextResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import asyncio
 import json
+import tempfile
 import uuid
-from typing import Dict, AsyncGenerator
-from .graph import build_graph
+from contextlib import asynccontextmanager
+from starlette.background import BackgroundTask
+from typing import Dict, AsyncGenerator, List, Optional, Union
+from .graph import get_graph, warm_up_graph, close_graph, AGENT_NODES, run_metrics, speculation, request_revision
+from .streams import StreamSessionManager, TokenCoalescer
+from .config import STREAM_FRAME_MS, STREAM_FRAME_MAX_CHARS, START_COALESCING, BATCH_CONCURRENCY, BATCH_CONCURRENCY_MAX, RUN_DEADLINE_SECONDS, RUN_ABANDON_SECONDS
+from .metrics import render_prometheus, stream_metrics, relevance_metrics, review_cache_metrics, coalescing_metrics, scheduler_metrics, speculation_metrics, run_registry_metrics, artifact_store_metrics
+from .scheduler import get_scheduler
+from .singleflight import get_flights, flight_key
+from .runs import RunRegistry
+from .review_cache import get_review_cache
+from .protocol_cache import get_protocol_index
+from .artifact_store import get_artifact_store, close_artifact_store
+from .relevance import get_relevance_classifier
+from .batch import run_batch
 from langchain_core.messages import HumanMessage
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile the graph once per process instead of on every request
+    await warm_up_graph()
+    get_relevance_classifier()  # Train the Filter's local classifier before the first query
+    get_protocol_index()  # Index the approved protocols in CBT_Downloaded/
+    await get_artifact_store().load()  # Learn which protocols are already saved; catalogue any new files
+    yield
+    await close_graph()
+    close_artifact_store()  # Let approvals still being written finish
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,13 +50,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store queues for SSE
-# Key: thread_id, Value: asyncio.Queue
-queues: Dict[str, asyncio.Queue] = {}
+# Bounded, evictable SSE queues - one session per thread_id
+streams = StreamSessionManager()
+
+# Identical /start queries in flight share one run
+flights = get_flights()
+
+# Graph runs in flight - cancellable by /cancel, deadlines and abandonment.
+# A cancelled run stops leading its flight at once, so no new /start joins it
+runs = RunRegistry(on_cancel=flights.drop)
 
 class StartRequest(BaseModel):
     query: str
     thread_id: str = None
+    protocol_cache_threshold: Optional[float] = None  # Similarity needed to serve an approved protocol (default PROTOCOL_CACHE_THRESHOLD)
+    bypass_protocol_cache: bool = False  # Always draft a new protocol
+    isolated: bool = False  # Never join another client's in-flight run for the same query
+    deadline_seconds: Optional[float] = None  # Cancel the run if it takes longer (default RUN_DEADLINE_SECONDS, 0 = none)
+    replaces: Optional[str] = None  # This client's previous thread - its run is cancelled
+
+class BatchItem(BaseModel):
+    query: str
+    id: Optional[Union[str, int]] = None  # Echoed back in the item's events (default: its position)
+    protocol_cache_threshold: Optional[float] = None
+    bypass_protocol_cache: bool = False
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    concurrency: int = Field(BATCH_CONCURRENCY, ge=1, le=BATCH_CONCURRENCY_MAX)  # Graph runs in flight at once
+    auto_approve: bool = False  # Approve and save drafts that passed Safety and the Critic; others wait for /approve
 
 class ApproveRequest(BaseModel):
     thread_id: str
@@ -40,53 +87,65 @@ class ApproveRequest(BaseModel):
 class ResumeRequest(BaseModel):
     thread_id: str
 
-async def run_graph_and_stream(thread_id: str, input_data: dict, config: dict):
+async def run_graph_and_stream(thread_id: str, input_data: dict, config: dict, flight: Optional[str] = None):
     """
     Runs the graph and pushes events to the SSE queue.
+    `flight` is the coalescing key this run leads, released when it ends.
     """
-    queue = queues.get(thread_id)
-    if not queue:
-        return # Should not happen if set up correctly
-
+    # Someone is watching this run - its LLM calls go ahead of batch work
+    config = {**config, "metadata": {**config.get("metadata", {}), "priority": "interactive"}}
     try:
-        graph = await build_graph()
+        graph = await get_graph()
         
         # Emit initial status
-        await queue.put(json.dumps({"type": "status", "content": "🚀 Graph Started", "agent": "System"}))
+        await streams.publish(thread_id, json.dumps({"type": "status", "content": "🚀 Graph Started", "agent": "System"}))
         
         # Track agent visits for bidirectional detection
         agent_visit_count = {}
         current_agent = None
-        output_buffer = []
+        # Model output per agent (Safety and Critic may stream at the same time in parallel review mode)
+        output_buffers = {}
+        
+        # Live subscribers (/stream?live=true) get tokens as they arrive, the others
+        # one agent_output per agent. Agents whose first token found a live subscriber
+        # are streamed in frames to the end; their agent_output then only goes to
+        # non-live subscribers (live ones already have it, token by token)
+        session = streams.get_or_create(thread_id)
+        coalescers = {}
+        
+        async def flush_output(agent):
+            output_buffer = output_buffers.pop(agent, [])
+            tokens = coalescers.pop(agent, None)
+            frame = tokens.flush() if tokens else None
+            if frame:
+                await streams.publish(thread_id, json.dumps({"type": "agent_token", "agent": agent, "content": frame}),
+                                      live=True)
+            if output_buffer:
+                full_output = "".join(output_buffer)
+                await streams.publish(thread_id, json.dumps({
+                    "type": "agent_output", 
+                    "agent": agent,
+                    "content": full_output[:500] + ("..." if len(full_output) > 500 else "")
+                }), live=False if tokens else None)
 
         async for event in graph.astream_events(input_data, config, version="v1"):
             kind = event["event"]
-            name = event.get("name", "")
+            name = AGENT_NODES.get(event.get("name", ""))
             
             # Agent starts - announce it
-            if kind == "on_chain_start" and name in ["Filter", "Drafter", "Safety", "Critic", "Interrupt", "Rejection"]:
-                # If switching agents, flush previous buffer
-                if current_agent and current_agent != name and output_buffer:
-                    full_output = "".join(output_buffer)
-                    await queue.put(json.dumps({
-                        "type": "agent_output", 
-                        "agent": current_agent,
-                        "content": full_output[:500] + ("..." if len(full_output) > 500 else "")
-                    }))
-                    output_buffer = []
-                
+            if kind == "on_chain_start" and name:
                 # Track visit count
                 agent_visit_count[name] = agent_visit_count.get(name, 0) + 1
                 visit_num = agent_visit_count[name]
                 
                 # Determine if this is a bidirectional revisit
                 is_bidirectional = visit_num > 1
-                emoji = "🔄" if is_bidirectional else "🔍" if name == "Filter" else "📝" if name == "Drafter" else "🛡️" if name == "Safety" else "🎯" if name == "Critic" else "⏸️"
+                emoji = "🔄" if is_bidirectional else "🔍" if name == "Filter" else "📚" if name == "Library" else "📝" if name == "Drafter" else "🛡️" if name == "Safety" else "🎯" if name == "Critic" else "⏸️"
                 
                 visit_marker = f" (visit #{visit_num})" if is_bidirectional else ""
                 
                 current_agent = name
-                await queue.put(json.dumps({
+                await streams.publish(thread_id, json.dumps({
                     "type": "agent_start", 
                     "agent": name, 
                     "content": f"Executing...{visit_marker}",
@@ -96,22 +155,27 @@ async def run_graph_and_stream(thread_id: str, input_data: dict, config: dict):
                 }))
             
             # Agent ends - send complete output
-            elif kind == "on_chain_end" and name in ["Filter", "Drafter", "Safety", "Critic"]:
-                if output_buffer:
-                    full_output = "".join(output_buffer)
-                    await queue.put(json.dumps({
-                        "type": "agent_output", 
-                        "agent": name,
-                        "content": full_output[:500] + ("..." if len(full_output) > 500 else "")
-                    }))
-                    output_buffer = []
-                await queue.put(json.dumps({"type": "agent_end", "agent": name, "content": "Complete"}))
+            elif kind == "on_chain_end" and name in ["Filter", "Library", "Drafter", "Safety", "Critic"]:
+                await flush_output(name)
+                await streams.publish(thread_id, json.dumps({"type": "agent_end", "agent": name, "content": "Complete"}))
                 
-            # Collect tokens into buffer (don't send individually)
+            # Collect tokens into buffer (live mode sends them in small frames)
             elif kind == "on_chat_model_stream":
                 content = event["data"]["chunk"].content
                 if content:
-                    output_buffer.append(content)
+                    agent = AGENT_NODES.get(event.get("metadata", {}).get("langgraph_node"), current_agent)
+                    if agent not in output_buffers and session.live:
+                        coalescers[agent] = TokenCoalescer(STREAM_FRAME_MAX_CHARS)
+                    output_buffers.setdefault(agent, []).append(content)
+                    tokens = coalescers.get(agent)
+                    if tokens:
+                        frame = tokens.add(content, session.frame_ms / 1000)
+                        if frame:
+                            await streams.publish(thread_id, json.dumps({
+                                "type": "agent_token",
+                                "agent": agent,
+                                "content": frame
+                            }), live=True)
 
         # Check final state to see if Interrupted or Done
         try:
@@ -134,7 +198,7 @@ async def run_graph_and_stream(thread_id: str, input_data: dict, config: dict):
                     loops.append(f"Critic↔Safety={critic_safety_iters}/2")
                 loop_summary += ", ".join(loops)
                 
-                await queue.put(json.dumps({
+                await streams.publish(thread_id, json.dumps({
                     "type": "status",
                     "agent": "System",
                     "content": loop_summary
@@ -143,96 +207,190 @@ async def run_graph_and_stream(thread_id: str, input_data: dict, config: dict):
             if snapshot.next:
                 # Technically paused/interrupted
                 safe_state = {k: v for k, v in snapshot.values.items() if k != "messages"}
-                await queue.put(json.dumps({"type": "control", "content": "Interrupted", "state": safe_state}))
+                await streams.publish(thread_id, json.dumps({"type": "control", "content": "Interrupted", "state": safe_state, "metrics": run_metrics.thread_summary(thread_id)}))
             else:
                 safe_state = {k: v for k, v in snapshot.values.items() if k != "messages"}
-                await queue.put(json.dumps({"type": "control", "content": "Finished", "state": safe_state}))
+                await streams.publish(thread_id, json.dumps({"type": "control", "content": "Finished", "state": safe_state, "metrics": run_metrics.thread_summary(thread_id)}))
         except Exception as state_err:
             # Fallback if async state fails - still send success
-            await queue.put(json.dumps({"type": "control", "content": "Finished", "state": {}}))
+            await streams.publish(thread_id, json.dumps({"type": "control", "content": "Finished", "state": {}}))
 
+    except asyncio.CancelledError:
+        # /cancel, deadline, superseded or abandoned: in-flight model calls were cancelled with us.
+        # The last finished step is checkpointed, so /resume can pick the run up again.
+        content = {"type": "control", "content": "Cancelled", "reason": runs.reason(thread_id) or "shutdown"}
+        try:
+            graph = await get_graph()
+            snapshot = await graph.aget_state(config)
+            content["state"] = {k: v for k, v in snapshot.values.items() if k != "messages"}
+            content["resumable"] = bool(snapshot.next)
+        except Exception:
+            pass
+        content["metrics"] = run_metrics.thread_summary(thread_id)
+        await streams.publish(thread_id, json.dumps(content))
     except Exception as e:
-        await queue.put(json.dumps({"type": "error", "content": str(e)}))
+        await streams.publish(thread_id, json.dumps({"type": "error", "content": str(e)}))
     finally:
+        if flight:
+            flights.release(flight, thread_id)
         # Signal end of stream logic (but SSE might stay open if we want to support multiple runs? 
         # For now, close execution side)
         pass 
         # We don't close the queue because the client might want to approve and continue on SAME stream?
         # Actually better to keep stream open.
 
+async def thread_exists(thread_id: str) -> bool:
+    """A thread is known if it has a stream session or a saved checkpoint
+    (sessions may have been evicted, or lost in a restart)."""
+    if thread_id in streams:
+        return True
+    graph = await get_graph()
+    state = await graph.aget_state({"configurable": {"thread_id": thread_id}})
+    return bool(state.values)
+
 @app.post("/start")
-async def start_task(req: StartRequest, background_tasks: BackgroundTasks):
+async def start_task(req: StartRequest):
     thread_id = req.thread_id or str(uuid.uuid4())
+    ensure_not_running(thread_id)  # An explicit thread_id may name a run still in flight
     
-    # Create queue if not exists
-    if thread_id not in queues:
-        queues[thread_id] = asyncio.Queue()
+    # The client moved on from its previous query - stop spending on it, unless
+    # other clients coalesced onto that run still follow it; then just detach
+    if req.replaces and req.replaces != thread_id:
+        if flights.attached(req.replaces) > 1:
+            flights.leave(req.replaces)
+        else:
+            runs.cancel(req.replaces, "superseded")
     
-    config = {"configurable": {"thread_id": thread_id}}
+    # Identical query already running (double submit, client retry)? Hand out its
+    # thread - the client streams the leader's events and shares its result
+    flight = None
+    if START_COALESCING == "on" and not req.isolated and not req.thread_id:
+        flight = flight_key(req.query, req.protocol_cache_threshold, req.bypass_protocol_cache)
+        leader = flights.join(flight, thread_id)
+        if leader:
+            return {"thread_id": leader, "status": "Started", "coalesced": True}
+    
+    # Create stream session if not exists
+    streams.get_or_create(thread_id)
+    
+    config = {"configurable": {
+        "thread_id": thread_id,
+        "protocol_cache_threshold": req.protocol_cache_threshold,
+        "protocol_cache_bypass": req.bypass_protocol_cache
+    }}
     input_data = {"messages": [HumanMessage(content=req.query)]}
     
-    background_tasks.add_task(run_graph_and_stream, thread_id, input_data, config)
+    deadline = req.deadline_seconds if req.deadline_seconds is not None else RUN_DEADLINE_SECONDS
+    runs.start(thread_id, run_graph_and_stream(thread_id, input_data, config, flight), deadline)
+    
+    return {"thread_id": thread_id, "status": "Started", "coalesced": False}
+
+@app.post("/batch")
+async def batch_task(req: BatchRequest):
+    """Generate protocols for many queries; streams progress, one result per item and a summary as NDJSON"""
+    items = [item.model_dump(exclude_none=True) for item in req.items]
     
-    return {"thread_id": thread_id, "status": "Started"}
+    async def lines():
+        # Runs at batch priority; stops the remaining runs if the client disconnects
+        async for event in run_batch(items, req.concurrency, req.auto_approve):
+            yield json.dumps(event) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def ensure_not_running(thread_id: str):
+    """409 if the thread's graph is still running - a second run on the same checkpoint would race it."""
+    if thread_id in runs:
+        raise HTTPException(status_code=409, detail="Thread is still running")
 
 @app.post("/approve")
-async def approve_task(req: ApproveRequest, background_tasks: BackgroundTasks):
+async def approve_task(req: ApproveRequest):
     thread_id = req.thread_id
-    if thread_id not in queues:
+    if not await thread_exists(thread_id):
         raise HTTPException(status_code=404, detail="Thread not found")
+    ensure_not_running(thread_id)
     
     # Get the final state to retrieve the artifact
-    graph = await build_graph()
+    graph = await get_graph()
     config = {"configurable": {"thread_id": thread_id}}
     
+    saved = None
     try:
         state = await graph.aget_state(config)
         artifact = state.values.get("artifact", "")
         
-        # Save the approved protocol to file
+        # Save the approved protocol to the library (and serve it to future queries on the same topic).
+        # The file is written by the artifact store's threads - streams keep flowing meanwhile.
         if artifact:
-            from datetime import datetime
-            import re
-            
-            # Create CBT_Downloaded directory if it doesn't exist
-            save_dir = os.path.join(os.path.dirname(__file__), "..", "CBT_Downloaded")
-            os.makedirs(save_dir, exist_ok=True)
-            
-            # Generate filename from protocol title or timestamp
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            
-            # Try to extract title from markdown
-            title_match = re.search(r'^#\s+CBT Protocol:\s*(.+)$', artifact, re.MULTILINE)
-            if title_match:
-                title = title_match.group(1).strip()
-                # Sanitize filename
-                safe_title = re.sub(r'[^\w\s-]', '', title).strip().replace(' ', '_')[:50]
-                filename = f"{safe_title}_{timestamp}.md"
-            else:
-                filename = f"protocol_{timestamp}.md"
-            
-            # Save to file
-            filepath = os.path.join(save_dir, filename)
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(artifact)
-            
-            print(f"✅ Protocol saved to: {filepath}")
+            messages = state.values.get("messages", [])
+            saved = await get_artifact_store().save(
+                artifact,
+                thread_id=thread_id,
+                query=messages[0].content if messages else None,
+                score=state.values.get("scratchpad", {}).get("CriticScore"),
+            )
+            print(f"✅ Protocol {'already saved as' if saved['duplicate'] else 'saved to'}: {saved['path']}")
     except Exception as e:
         print(f"⚠️ Error saving protocol: {e}")
     
-    # Continue workflow
+    # Continue workflow (unless a concurrent /approve got there while the protocol was saved)
     input_data = None 
-    background_tasks.add_task(run_graph_and_stream, thread_id, input_data, config)
+    ensure_not_running(thread_id)
+    runs.start(thread_id, run_graph_and_stream(thread_id, input_data, config), RUN_DEADLINE_SECONDS)
     
-    return {"status": "Approved", "saved_to": filepath if 'filepath' in locals() else None}
+    return {"status": "Approved", "saved_to": saved["path"] if saved else None,
+            "duplicate": saved["duplicate"] if saved else None,
+            "protocol_id": saved["protocol_id"] if saved else None}
+
+@app.get("/protocols/export")
+async def export_protocols(format: str = "zip", since: Optional[str] = None):
+    """
+    Download every saved protocol: format=zip (Markdown files + index.jsonl)
+    or jsonl (index records with the text inline). `since` is an ISO timestamp.
+    """
+    if format not in ("zip", "jsonl"):
+        raise HTTPException(status_code=400, detail="format must be zip or jsonl")
+    fd, path = tempfile.mkstemp(suffix=f".{format}")
+    os.close(fd)
+    try:
+        await get_artifact_store().export(path, format, since)
+    except Exception:
+        os.unlink(path)
+        raise
+    return FileResponse(
+        path,
+        media_type="application/zip" if format == "zip" else "application/x-ndjson",
+        filename=f"cbt_protocols.{format}",
+        background=BackgroundTask(os.unlink, path),  # Removed once sent
+    )
+
+@app.get("/protocols")
+async def list_protocols(q: Optional[str] = None, limit: int = 20, offset: int = 0):
+    """
+    Saved protocols, a page at a time: newest first, or with `q` the
+    full-text matches best first (with a highlighted snippet).
+    """
+    if not 1 <= limit <= 100 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit must be 1-100 and offset >= 0")
+    library = get_artifact_store().library
+    if q:
+        return await asyncio.to_thread(library.search, q, limit, offset)
+    return await asyncio.to_thread(library.list, limit, offset)
+
+@app.get("/protocols/{protocol_id}")
+async def get_protocol(protocol_id: int):
+    """A saved protocol with its text"""
+    protocol = await asyncio.to_thread(get_artifact_store().library.get, protocol_id)
+    if protocol is None:
+        raise HTTPException(status_code=404, detail="Protocol not found")
+    return protocol
 
 @app.post("/resume")
-async def resume_task(req: ResumeRequest, background_tasks: BackgroundTasks):
+async def resume_task(req: ResumeRequest):
     """Resume an interrupted workflow from its last checkpoint"""
     thread_id = req.thread_id
     
     # Check if thread exists and is resumable
-    graph = await build_graph()
+    graph = await get_graph()
     config = {"configurable": {"thread_id": thread_id}}
     
     try:
@@ -241,10 +399,11 @@ async def resume_task(req: ResumeRequest, background_tasks: BackgroundTasks):
             return {"status": "Already completed", "thread_id": thread_id}
         
         # Resume with input_data=None (continues from checkpoint)
-        if thread_id not in queues:
-            queues[thread_id] = asyncio.Queue()
+        streams.get_or_create(thread_id)
         
-        background_tasks.add_task(run_graph_and_stream, thread_id, None, config)
+        if thread_id in runs:
+            return {"thread_id": thread_id, "status": "Running"}
+        runs.start(thread_id, run_graph_and_stream(thread_id, None, config), RUN_DEADLINE_SECONDS)
         return {"thread_id": thread_id, "status": "Resumed"}
     
     except Exception as e:
@@ -253,7 +412,7 @@ async def resume_task(req: ResumeRequest, background_tasks: BackgroundTasks):
 @app.get("/check_thread/{thread_id}")
 async def check_thread(thread_id: str):
     """Check thread status and get last state"""
-    graph = await build_graph()
+    graph = await get_graph()
     config = {"configurable": {"thread_id": thread_id}}
     
     try:
@@ -273,55 +432,90 @@ class ReviseRequest(BaseModel):
     feedback: str
 
 @app.post("/revise")
-async def revise_task(req: ReviseRequest, background_tasks: BackgroundTasks):
+async def revise_task(req: ReviseRequest):
     """User requests revision with feedback - routes through Critic to Drafter"""
     thread_id = req.thread_id
-    if thread_id not in queues:
+    if not await thread_exists(thread_id):
         raise HTTPException(status_code=404, detail="Thread not found")
+    ensure_not_running(thread_id)
     
     # Inject user feedback as Critic feedback and trigger revision
     config = {"configurable": {"thread_id": thread_id}}
     
     # Update the graph state with user feedback
-    graph = await build_graph()
+    graph = await get_graph()
     
-    # Get current state and update scratchpad with user feedback
+    # Add user feedback to scratchpad as if Critic gave it
     try:
-        current_state = await graph.aget_state(config)
-        # Add user feedback to scratchpad as if Critic gave it
-        new_scratchpad = current_state.values.get("scratchpad", {})
-        new_scratchpad["UserFeedback"] = req.feedback
-        new_scratchpad["Critic"] = f"User Feedback: {req.feedback}"
-        new_scratchpad["CriticApproved"] = False
-        new_scratchpad["CriticScore"] = 0.5  # Force revision
-        
-        # Update the state
-        await graph.aupdate_state(config, {"scratchpad": new_scratchpad})
+        await request_revision(graph, config, req.feedback)
     except Exception as e:
         print(f"State update error: {e}")
     
     # Resume with the user feedback triggering revision
     input_data = None
     
-    await queues[thread_id].put(json.dumps({
+    await streams.publish(thread_id, json.dumps({
         "type": "status", 
         "agent": "User",
         "content": f"📝 User Feedback: {req.feedback}"
     }))
     
-    background_tasks.add_task(run_graph_and_stream, thread_id, input_data, config)
+    ensure_not_running(thread_id)
+    runs.start(thread_id, run_graph_and_stream(thread_id, input_data, config), RUN_DEADLINE_SECONDS)
     
     return {"status": "Revision Requested"}
 
+@app.post("/cancel/{thread_id}")
+async def cancel_task(thread_id: str):
+    """Stop a running workflow - its model calls are cancelled and /resume continues from the last finished step"""
+    task = runs.cancel(thread_id, "user")
+    if task is None:
+        if not await thread_exists(thread_id):
+            raise HTTPException(status_code=404, detail="Thread not found")
+        return {"thread_id": thread_id, "status": "Not running"}
+    # Give the run a moment to wind down, so a /resume right after finds it stopped
+    await asyncio.wait({task}, timeout=5)
+    return {"thread_id": thread_id, "status": "Cancelled"}
+
 @app.get("/stream/{thread_id}")
-async def stream_task(thread_id: str):
-    if thread_id not in queues:
-        queues[thread_id] = asyncio.Queue()
-        
+async def stream_task(
+    thread_id: str,
+    request: Request,
+    last_event_id: Optional[str] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    live: bool = False,
+    frame_ms: int = STREAM_FRAME_MS,
+):
+    # Browsers send Last-Event-ID on automatic reconnects; clients that open
+    # a new EventSource pass ?last_event_id= instead
+    resume_from = last_event_id if last_event_id is not None else last_event_id_header
+    
     async def event_generator():
-        while True:
-            # Wait for data
-            data = await queues[thread_id].get()
-            yield f"data: {data}\n\n"
+        # Replays missed events first; ends (and releases the session) once the client disconnects.
+        # live=true streams model output as "agent_token" frames every ~frame_ms to this
+        # client instead of one truncated "agent_output" per agent
+        try:
+            async for event_id, data in streams.subscribe(thread_id, request.is_disconnected, resume_from,
+                                                     live=live, frame_ms=frame_ms):
+                yield f"id: {event_id}\ndata: {data}\n\n"
+        finally:
+            # Nobody reconnects within the grace period: stop the run instead of finishing it for no one
+            watched = lambda: thread_id in streams and streams.sessions[thread_id].subscribers > 0
+            runs.watch_abandonment(thread_id, RUN_ABANDON_SECONDS, watched)
             
     return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text metrics"""
+    return PlainTextResponse(render_prometheus(
+        stream_metrics(streams.stats())
+        + relevance_metrics(get_relevance_classifier().stats())
+        + review_cache_metrics(get_review_cache().stats())
+        + coalescing_metrics(flights.stats())
+        + scheduler_metrics(get_scheduler().stats())
+        + speculation_metrics(speculation.stats())
+        + run_registry_metrics(runs.stats())
+        + artifact_store_metrics(get_artifact_store().stats())
+        + run_metrics.prometheus()
+    ))
@@ -0,0 +1,107 @@
+import asyncio
+import re
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Optional
+
+# In-flight request coalescing for /start and the MCP create_protocol tool:
+# while a run for a query is in progress, identical queries (retry storms,
+# double submits, MCP retries) are attached to that run's thread instead of
+# starting their own. Both entry points share one SingleFlight (get_flights)
+# and one key function, so a query coalesces the same way wherever it comes in.
+
+# Entry points, as reported in the coalescing metrics
+ENTRY_POINTS = ("start", "mcp")
+
+_SPACE = re.compile(r"\s+")
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation insensitive form of a query."""
+    return _SPACE.sub(" ", query).strip().rstrip("?.!").strip().lower()
+
+def flight_key(query: str, protocol_cache_threshold: Optional[float] = None,
+               bypass_protocol_cache: bool = False) -> str:
+    """Coalescing key: the normalized query plus the per-request options that change the result."""
+    return "\x00".join([normalize_query(query), repr(protocol_cache_threshold), repr(bypass_protocol_cache)])
+
+class SingleFlight:
+    """Maps a flight key to the thread_id of the run currently serving it."""
+
+    def __init__(self):
+        self.leaders: Dict[str, str] = {}
+        self.keys: Dict[str, str] = {}  # Leader thread_id -> its key
+        self.followers: Dict[str, int] = {}  # Leader thread_id -> requests coalesced onto it
+        self.tasks: Dict[str, asyncio.Task] = {}  # Leader thread_id -> its run, for callers that await it (run())
+        self.started = defaultdict(int)  # entry point -> flights led
+        self.coalesced = defaultdict(int)  # entry point -> requests attached to a flight
+
+    def join(self, key: str, thread_id: str, entry: str = "start") -> Optional[str]:
+        """Make `thread_id` the leader for `key` and return None, or return the thread already leading it."""
+        leader = self.leaders.get(key)
+        if leader is not None:
+            self.coalesced[entry] += 1
+            self.followers[leader] += 1
+            return leader
+        self.leaders[key] = thread_id
+        self.keys[thread_id] = key
+        self.followers[thread_id] = 0
+        self.started[entry] += 1
+        return None
+
+    async def run(self, key: str, thread_id: str, start: Callable[[str], Awaitable], entry: str):
+        """
+        Await the result of `key`'s flight: the leader runs `start(thread_id)`,
+        identical calls meanwhile share that run. A caller that gives up does
+        not cancel the run for the others.
+        """
+        leader = self.join(key, thread_id, entry)
+        task = self.tasks.get(leader) if leader else None
+        if task is None:
+            if leader:  # Led by a /start run whose result we can't await - run our own
+                return await start(thread_id)
+            task = asyncio.ensure_future(start(thread_id))
+            self.tasks[thread_id] = task
+            task.add_done_callback(lambda _: self.release(key, thread_id))
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if leader:
+                self.leave(leader)
+
+    def attached(self, thread_id: str) -> int:
+        """Requests served by the flight `thread_id` leads: the leader plus its followers (0 if none)."""
+        return self.followers[thread_id] + 1 if thread_id in self.keys else 0
+
+    def leave(self, thread_id: str):
+        """Detach one request from the flight `thread_id` leads (the flight itself goes on)."""
+        if self.followers.get(thread_id):
+            self.followers[thread_id] -= 1
+
+    def release(self, key: str, thread_id: str):
+        """End the leader's flight; later identical requests start a new run."""
+        if self.leaders.get(key) == thread_id:
+            del self.leaders[key]
+            del self.keys[thread_id]
+            del self.followers[thread_id]
+            self.tasks.pop(thread_id, None)
+
+    def drop(self, thread_id: str):
+        """End whatever flight `thread_id` leads (its run is being cancelled), so nobody new joins it."""
+        key = self.keys.get(thread_id)
+        if key is not None:
+            self.release(key, thread_id)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self.leaders),
+            "started": {entry: self.started[entry] for entry in ENTRY_POINTS},
+            "coalesced": {entry: self.coalesced[entry] for entry in ENTRY_POINTS},
+        }
+
+# Process-wide flights, shared by the API and the MCP tool
+_flights = None
+
+def get_flights() -> SingleFlight:
+    global _flights
+    if _flights is None:
+        _flights = SingleFlight()
+    return _flights
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+# Speculative review: the Critic starts on a new draft while Safety is still
+# reviewing it. Most drafts are SAFE, so the Critic's answer is usually
+# needed and arrives early; when Safety's verdict sends the run elsewhere
+# (REVISE, STOP, RECHECK_INPUT) the Critic is cancelled and its spend is
+# counted as waste.
+
+class Speculation:
+    """One speculative Critic review alongside the Safety review of the same draft."""
+
+    def __init__(self):
+        self.route = asyncio.get_running_loop().create_future()  # Where safety_router sends the run
+        self.safety_seconds = 0.0
+        self.critic = None  # (seconds, tokens, cancelled) once the Critic side has finished
+
+class SpeculationTracker:
+    """
+    Pairs up the Safety and Critic halves of each speculative review by key
+    (thread and draft) and keeps process-wide totals: speculations
+    committed, cancelled or discarded, Critic seconds overlapped with
+    Safety (latency saved over running them in sequence), and tokens spent
+    on Critic reviews that were thrown away.
+    """
+
+    def __init__(self):
+        self.pending: Dict[tuple, Speculation] = {}
+        self.started = 0
+        self.committed = 0
+        self.cancelled = 0  # Stopped mid-review
+        self.discarded = 0  # Finished before Safety, then thrown away
+        self.saved_seconds = 0.0
+        self.wasted_tokens = 0
+
+    def _speculation(self, key: tuple) -> Speculation:
+        speculation = self.pending.get(key)
+        if speculation is None:
+            speculation = self.pending[key] = Speculation()
+        return speculation
+
+    def safety_done(self, key: tuple, route: Optional[str], seconds: float):
+        """Record Safety's routing decision (None if the review failed); a running Critic acts on it."""
+        speculation = self._speculation(key)
+        speculation.safety_seconds = seconds
+        if not speculation.route.done():
+            speculation.route.set_result(route)
+        self._settle(key, speculation)
+
+    async def critic(self, key: tuple, review: Awaitable[dict], tokens_spent: Callable[[], int]) -> Optional[dict]:
+        """
+        Run the Critic's `review` until it finishes, or until Safety routes
+        the run away from the Critic - then cancel it and return None.
+        `tokens_spent` reads the Critic's running token total for the thread.
+        """
+        speculation = self._speculation(key)
+        self.started += 1
+        started, before = time.perf_counter(), tokens_spent()
+        task = asyncio.ensure_future(review)
+        cancelled = False
+        try:
+            await asyncio.wait({task, speculation.route}, return_when=asyncio.FIRST_COMPLETED)
+            if not task.done() and speculation.route.result() != "Critic":
+                cancelled = task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                return None
+            return await task
+        except asyncio.CancelledError:
+            cancelled = task.cancel()  # The run itself was cancelled
+            raise
+        finally:
+            speculation.critic = (time.perf_counter() - started, tokens_spent() - before, cancelled)
+            self._settle(key, speculation)
+
+    def _settle(self, key: tuple, speculation: Speculation):
+        """Count the outcome once both halves are in."""
+        if speculation.critic is None or not speculation.route.done():
+            return
+        self.pending.pop(key, None)
+        seconds, tokens, cancelled = speculation.critic
+        if speculation.route.result() == "Critic":
+            self.committed += 1
+            # In sequence the Critic would have started after Safety: the overlap is saved
+            self.saved_seconds += min(seconds, speculation.safety_seconds)
+        else:
+            if cancelled:
+                self.cancelled += 1
+            else:
+                self.discarded += 1
+            self.wasted_tokens += tokens
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self.pending),
+            "started": self.started,
+            "committed": self.committed,
+            "cancelled": self.cancelled,
+            "discarded": self.discarded,
+            "saved_seconds": round(self.saved_seconds, 6),
+            "wasted_tokens": self.wasted_tokens,
+        }
@@ -1,4 +1,4 @@
-from typing import TypedDict, Annotated
+from typing import TypedDict, Annotated, Optional
 from langgraph.graph.message import add_messages
 
 class AgentState(TypedDict):
@@ -13,3 +13,9 @@ class AgentState(TypedDict):
     filter_safety_iterations: int  # Filter ↔ Safety loops
     critic_drafter_iterations: int  # Critic ↔ Drafter loops
     critic_safety_iterations: int   # Critic ↔ Safety loops
+    # Parallel review mode: per-reviewer results, merged by ReviewJoin
+    safety_review: Optional[dict]
+    critic_review: Optional[dict]
+    # Incremental re-review: each reviewer's last result and the section hashes it covered
+    safety_sections: Optional[dict]
+    critic_sections: Optional[dict]
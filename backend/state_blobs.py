@@ -0,0 +1,147 @@
+import hashlib
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Set, Tuple
+
+from langchain_core.messages import BaseMessage
+
+from backend.config import (
+    CHECKPOINT_COMPACT,
+    CHECKPOINT_BLOB_MIN_CHARS,
+    CHECKPOINT_BLOB_COMPRESSION,
+    CHECKPOINT_BLOB_CACHE,
+)
+
+# Compact checkpoints: every super-step checkpoint holds the whole state -
+# the protocol draft, the chat history, the scratchpad - so a thread with a
+# few revisions and review loops stores the same multi-KB texts over and
+# over. Before a checkpoint (or a node's pending writes) is saved, strings
+# of CHECKPOINT_BLOB_MIN_CHARS or more are swapped for a reference to a
+# content-addressed blob, stored once (zlib-compressed if that is smaller)
+# no matter how many checkpoints and threads share it. Loaded checkpoints
+# get the texts back, so nodes and the API still see plain strings.
+
+# A stored string's reference is this prefix plus the text's sha256; real text never starts with NUL
+BLOB_REF = "\x00blob:"
+
+def _walk(value: Any, fn: Callable[[str], str]) -> Any:
+    """Copy of `value` with `fn` applied to every string in its dicts, lists, tuples and message contents."""
+    if isinstance(value, str):
+        return fn(value)
+    if isinstance(value, dict):
+        return {key: _walk(item, fn) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_walk(item, fn) for item in value]
+    if isinstance(value, tuple):
+        items = [_walk(item, fn) for item in value]
+        return type(value)._make(items) if hasattr(value, "_fields") else tuple(items)
+    if isinstance(value, BaseMessage):
+        return value.model_copy(update={"content": _walk(value.content, fn)})
+    return value
+
+class StateBlobs:
+    """
+    Swaps long strings in checkpointed values for blob references and back.
+    Storage is up to the checkpointer: compact() reports the blobs a value
+    needs, expand() takes the texts for the references refs() finds. Recently
+    used texts are kept (up to `cache_size`) so most loads need no lookup.
+    """
+
+    def __init__(self, enabled: bool = CHECKPOINT_COMPACT == "on", min_chars: int = CHECKPOINT_BLOB_MIN_CHARS,
+                 compression: str = CHECKPOINT_BLOB_COMPRESSION, cache_size: int = CHECKPOINT_BLOB_CACHE):
+        if compression not in ("zlib", "off"):
+            raise ValueError(f"Unknown CHECKPOINT_BLOB_COMPRESSION: {compression!r}")
+        self.enabled = enabled
+        self.min_chars = min_chars
+        self.compression = compression
+        self.cache_size = cache_size
+        self.texts: "OrderedDict[str, str]" = OrderedDict()  # sha -> text, least recently used first
+        self.written = 0  # Blobs stored
+        self.written_chars = 0
+        self.written_bytes = 0
+
+    def compact(self, value: Any, found: Dict[str, str]) -> Any:
+        """`value` with long strings replaced by references; adds each referenced {sha: text} to `found`."""
+        if not self.enabled:
+            return value
+        def ref(text: str) -> str:
+            if len(text) < self.min_chars or text.startswith(BLOB_REF):
+                return text
+            sha = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            found[sha] = text
+            return BLOB_REF + sha
+        return _walk(value, ref)
+
+    def refs(self, value: Any) -> Set[str]:
+        """Blob shas referenced anywhere in `value`."""
+        found = set()
+        def collect(text: str) -> str:
+            if text.startswith(BLOB_REF):
+                found.add(text[len(BLOB_REF):])
+            return text
+        _walk(value, collect)
+        return found
+
+    def expand(self, value: Any, texts: Dict[str, str]) -> Any:
+        """`value` with references replaced by the texts in `texts` (sha -> text)."""
+        def resolve(text: str) -> str:
+            if not text.startswith(BLOB_REF):
+                return text
+            sha = text[len(BLOB_REF):]
+            if sha not in texts:
+                raise ValueError(f"Checkpoint blob {sha} is missing")
+            return texts[sha]
+        return _walk(value, resolve)
+
+    def pack(self, text: str) -> Tuple[bytes, bool]:
+        """Stored form of a blob: (data, compressed). Compressed only where that is smaller."""
+        data = text.encode("utf-8")
+        if self.compression == "zlib":
+            packed = zlib.compress(data, 6)
+            if len(packed) < len(data):
+                data, compressed = packed, True
+            else:
+                compressed = False
+        else:
+            compressed = False
+        self.written += 1
+        self.written_chars += len(text)
+        self.written_bytes += len(data)
+        return data, compressed
+
+    def unpack(self, data: bytes, compressed: bool) -> str:
+        return (zlib.decompress(data) if compressed else bytes(data)).decode("utf-8")
+
+    def cached(self, sha: str):
+        text = self.texts.get(sha)
+        if text is not None:
+            self.texts.move_to_end(sha)
+        return text
+
+    def remember(self, sha: str, text: str):
+        self.texts[sha] = text
+        self.texts.move_to_end(sha)
+        while len(self.texts) > self.cache_size:
+            self.texts.popitem(last=False)
+
+    def forget(self, shas):
+        for sha in shas:
+            self.texts.pop(sha, None)
+
+    def stats(self) -> dict:
+        return {
+            "blobs_written": self.written,
+            "chars_written": self.written_chars,
+            "bytes_written": self.written_bytes,
+            "cached": len(self.texts),
+        }
+
+def expand_tuple(blobs: StateBlobs, saved, texts: Dict[str, str]):
+    """A loaded CheckpointTuple with its channel values and pending writes expanded."""
+    checkpoint = {**saved.checkpoint, "channel_values": blobs.expand(saved.checkpoint["channel_values"], texts)}
+    pending = [blobs.expand(write, texts) for write in saved.pending_writes] if saved.pending_writes else saved.pending_writes
+    return saved._replace(checkpoint=checkpoint, pending_writes=pending)
+
+def tuple_refs(blobs: StateBlobs, saved) -> Set[str]:
+    """Blob shas a loaded CheckpointTuple needs."""
+    return blobs.refs(saved.checkpoint["channel_values"]) | blobs.refs(saved.pending_writes or [])
@@ -0,0 +1,253 @@
+import asyncio
+import secrets
+import time
+from collections import OrderedDict, deque
+from typing import AsyncGenerator, Dict, Optional, Tuple
+from backend.config import (
+    STREAM_MAX_SESSIONS,
+    STREAM_QUEUE_SIZE,
+    STREAM_IDLE_TTL_SECONDS,
+    STREAM_PUT_TIMEOUT_SECONDS,
+    STREAM_LOG_SIZE,
+    STREAM_FRAME_MS,
+)
+
+class StreamSession:
+    """
+    Event stream for one thread: a bounded queue per connected subscriber
+    (several clients may watch the same run), plus a ring buffer of the
+    last `log_size` events so late and reconnecting clients can replay
+    what they missed. Every event gets a sequence number, sent as the SSE
+    `id` together with the session's epoch ("<epoch>-<seq>"): a session
+    created anew (server restart, eviction) has a new epoch, so a client's
+    old Last-Event-ID isn't mistaken for a position in it.
+
+    Subscribers that opted into live mode get model tokens as they arrive;
+    an event published for live (or only non-live) subscribers reaches
+    just those, so one live client doesn't change what the others see.
+    """
+
+    def __init__(self, queue_size: int, log_size: int):
+        self.queue_size = queue_size
+        self.queues: list = []  # One asyncio.Queue per subscriber
+        self.live: Dict[asyncio.Queue, int] = {}  # Queues of live subscribers -> their frame_ms
+        self.log: deque = deque(maxlen=log_size)  # (seq, data, live): live is None for every subscriber
+        self.epoch = secrets.token_hex(4)
+        self.seq = 0
+        self.last_active = time.monotonic()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self.queues)
+
+    @property
+    def frame_ms(self) -> int:
+        """Token frame interval: the shortest any live subscriber asked for."""
+        return min(self.live.values(), default=STREAM_FRAME_MS)
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def append(self, data: str, live: Optional[bool] = None) -> tuple:
+        self.seq += 1
+        self.log.append((self.seq, data, live))
+        return self.seq, data
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def position(self, last_event_id: Optional[str]) -> Optional[int]:
+        """
+        The seq a client's Last-Event-ID points at in this session, or None
+        if it doesn't point into it (no id, another epoch, a seq not reached
+        yet) - the client then gets the whole log, like a first connect.
+        Bare numeric ids are taken as seqs of this session.
+        """
+        if not last_event_id:
+            return None
+        epoch, _, seq = str(last_event_id).rpartition("-")
+        if epoch and epoch != self.epoch or not seq.isdigit() or int(seq) > self.seq:
+            return None
+        return int(seq)
+
+    def replay(self, last_event_id: int, live: bool = False) -> list:
+        """Logged events newer than `last_event_id` meant for a (non-)live subscriber."""
+        return [(seq, data) for seq, data, audience in self.log
+                if seq > last_event_id and (audience is None or audience == live)]
+
+class StreamSessionManager:
+    """
+    Registry of per-thread SSE streams.
+
+    - Subscriber queues are bounded: publishers wait briefly for a slow subscriber
+      (backpressure), then drop the oldest event instead of growing.
+    - Sessions are kept in LRU order and evicted when idle past the TTL or
+      when the registry is over capacity. Sessions with a connected
+      subscriber are never evicted.
+    - Subscribers notice client disconnects and release their session.
+    - Reconnecting subscribers pass the last event id they saw and get
+      the missed events replayed from the session's ring buffer - or all of
+      it, if the id is from a session that no longer exists.
+    """
+
+    def __init__(self, max_sessions: int = STREAM_MAX_SESSIONS, queue_size: int = STREAM_QUEUE_SIZE,
+                 idle_ttl: float = STREAM_IDLE_TTL_SECONDS, put_timeout: float = STREAM_PUT_TIMEOUT_SECONDS,
+                 log_size: int = STREAM_LOG_SIZE):
+        self.max_sessions = max_sessions
+        self.queue_size = queue_size
+        self.log_size = log_size
+        self.idle_ttl = idle_ttl
+        self.put_timeout = put_timeout
+        self.sessions: "OrderedDict[str, StreamSession]" = OrderedDict()
+        self.dropped_events = 0
+        self.evicted_sessions = 0
+        self.replayed_events = 0
+
+    def __contains__(self, thread_id: str) -> bool:
+        return thread_id in self.sessions
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def get_or_create(self, thread_id: str) -> StreamSession:
+        session = self.sessions.get(thread_id)
+        if session is None:
+            self.evict()
+            session = StreamSession(self.queue_size, self.log_size)
+            self.sessions[thread_id] = session
+        else:
+            self.sessions.move_to_end(thread_id)
+        session.touch()
+        return session
+
+    def evict(self):
+        """Drop idle sessions (TTL), then least recently used ones over capacity."""
+        now = time.monotonic()
+        for thread_id, session in list(self.sessions.items()):
+            if now - session.last_active < self.idle_ttl:
+                break  # LRU order: everything after this is fresher
+            if session.subscribers == 0:
+                del self.sessions[thread_id]
+                self.evicted_sessions += 1
+
+        if len(self.sessions) >= self.max_sessions:
+            for thread_id, session in list(self.sessions.items()):
+                if len(self.sessions) < self.max_sessions:
+                    break
+                if session.subscribers == 0:
+                    del self.sessions[thread_id]
+                    self.evicted_sessions += 1
+
+    async def publish(self, thread_id: str, data: str, live: Optional[bool] = None):
+        """
+        Log an event and queue it for the thread's subscribers, applying
+        backpressure: all of them, or with `live` set only the live (True)
+        or only the non-live (False) ones.
+        """
+        session = self.get_or_create(thread_id)
+        event = session.append(data, live)
+        for queue in list(session.queues):
+            if live is not None and (queue in session.live) != live:
+                continue
+            if queue.full():
+                try:
+                    await asyncio.wait_for(queue.put(event), self.put_timeout)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            if queue.full():
+                # This subscriber is not draining fast enough - keep the newest
+                # events (dropped ones are still replayable from the log)
+                queue.get_nowait()
+                self.dropped_events += 1
+            queue.put_nowait(event)
+
+    async def subscribe(self, thread_id: str, is_disconnected, last_event_id: Optional[str] = None,
+                        poll_interval: float = 1.0, live: bool = False,
+                        frame_ms: int = STREAM_FRAME_MS) -> AsyncGenerator[Tuple[str, str], None]:
+        """
+        Yield `(event_id, data)` events for a thread until the client goes away.
+
+        Logged events after `last_event_id` (all of them for a first
+        connect, or when the id is from an earlier session of the thread)
+        are replayed first and queued duplicates of them are skipped. `is_disconnected` is an async callable (e.g.
+        `request.is_disconnected`) checked whenever no event arrived within
+        `poll_interval` seconds. A `live` subscriber gets model tokens in
+        frames of ~`frame_ms` instead of each agent's output at its end.
+        """
+        session = self.get_or_create(thread_id)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=session.queue_size)
+        session.queues.append(queue)  # Before replaying, so nothing published meanwhile is missed
+        if live:
+            session.live[queue] = max(1, frame_ms)
+        resumed = session.position(last_event_id)
+        cursor = resumed or 0
+        try:
+            for seq, data in session.replay(cursor, live):
+                cursor = seq
+                if resumed is not None:
+                    self.replayed_events += 1
+                yield session.event_id(seq), data
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), poll_interval)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        break
+                    continue
+                if event[0] <= cursor:
+                    continue  # Already replayed from the log
+                if event[0] > cursor + 1:
+                    # Events were dropped from the queue while we lagged (or were for the
+                    # other kind of subscriber) - fill the gap from the log
+                    for seq, data in session.replay(cursor, live):
+                        if seq >= event[0]:
+                            break
+                        yield session.event_id(seq), data
+                cursor = event[0]
+                session.touch()
+                yield session.event_id(event[0]), event[1]
+        finally:
+            session.queues.remove(queue)
+            session.live.pop(queue, None)
+            session.touch()
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "subscribers": sum(s.subscribers for s in self.sessions.values()),
+            "queued_events": sum(q.qsize() for s in self.sessions.values() for q in s.queues),
+            "dropped_events": self.dropped_events,
+            "evicted_sessions": self.evicted_sessions,
+            "replayed_events": self.replayed_events,
+        }
+
+class TokenCoalescer:
+    """
+    Groups streamed model tokens into frames, so live mode sends a few
+    dozen SSE events per second instead of one per token.
+    """
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.parts = []
+        self.size = 0
+        self.last_flush = time.monotonic()
+
+    def add(self, token: str, interval: float) -> Optional[str]:
+        """Buffer a token; returns a frame once `interval` seconds or `max_chars` are reached."""
+        self.parts.append(token)
+        self.size += len(token)
+        if self.size >= self.max_chars or time.monotonic() - self.last_flush >= interval:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[str]:
+        """Return whatever is buffered (None if empty) and start a new frame."""
+        self.last_flush = time.monotonic()
+        if not self.parts:
+            return None
+        frame = "".join(self.parts)
+        self.parts = []
+        self.size = 0
+        return frame
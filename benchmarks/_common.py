@@ -0,0 +1,30 @@
+"""
+Shared setup for the benchmark scripts - import it before anything from
+backend. Puts the repository on sys.path, supplies a dummy API key and keeps
+checkpoints in memory so no run writes backend/checkpoints.db;
+fake_pipeline() sets up the offline environment the graph benchmarks run in.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.append(ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("CHECKPOINTER_BACKEND", "memory")
+
+
+def fake_pipeline(review_cache: bool = False, llm_scheduler: bool = True):
+    """
+    Environment for running the graph offline: scripted fake model and the
+    full drafting pipeline. Reviews are never answered from the verdict cache
+    unless review_cache is set; llm_scheduler=False lifts the scheduler's
+    concurrency limit to measure the graph alone. Variables already set are
+    kept, except LLM_PROVIDER.
+    """
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ.setdefault("PROTOCOL_CACHE", "off")  # Always run the full drafting pipeline
+    if not review_cache:
+        os.environ.setdefault("REVIEW_CACHE_SIZE", "0")  # Real reviews, not cache hits
+    if not llm_scheduler:
+        os.environ.setdefault("LLM_MAX_CONCURRENCY", "0")
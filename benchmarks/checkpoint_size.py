@@ -0,0 +1,156 @@
+"""
+Benchmark: checkpoint storage with and without compact state.
+
+Runs a mix of long sessions (revisions, review loops, safety consults)
+through to approval, once with every checkpoint stored in full
+(CHECKPOINT_COMPACT=off) and once with long strings stored as shared blobs
+(on, optionally zlib-compressed). Reports the bytes each checkpointer
+holds per thread - SQLite (checkpoints, writes and blob tables) and the
+in-memory saver - the time to save a session and to load every thread
+back with a cold blob cache, and whether both modes load identical state.
+
+Drafts are padded with extra exercise steps to about --protocol-kb.
+
+    python benchmarks/checkpoint_size.py --threads 30 --protocol-kb 6 --compression zlib
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+from _common import fake_pipeline
+
+fake_pipeline()
+
+import aiosqlite
+from langchain_core.messages import HumanMessage
+
+from backend.config import CHECKPOINT_KEEP_LAST, REVIEW_MODE
+from backend.database import CompactMemorySaver, _pruning_sqlite_saver
+from backend.graph import create_workflow
+from backend.llm import FAKE_PROTOCOL, get_model
+from backend.state_blobs import StateBlobs
+
+# Long sessions: revisions and review loops write the most checkpoints
+SESSION_MIX = ("revise_twice", "max_loops", "critic_revise", "safety_revise", "safety_consult", "approve")
+
+
+def padded_protocol(kb: float) -> str:
+    """FAKE_PROTOCOL with extra exercise steps, about `kb` KB long."""
+    steps = []
+    step = 5
+    while len(FAKE_PROTOCOL) + sum(len(text) for text in steps) < kb * 1024:
+        steps.append(f"### Step {step}: Practice Exercise {step}\n"
+                     f"- **Action:** Spend ten minutes on exercise {step}, noting each anxious thought and the evidence for it.\n"
+                     f"- **Example:** \"Exercise {step}: I expected a bad night, but I got some rest and coped the next day.\"\n\n")
+        step += 1
+    return FAKE_PROTOCOL.replace("## Progress Tracking", "".join(steps) + "## Progress Tracking")
+
+
+def stored_bytes(value) -> int:
+    """Bytes held in the (nested) containers of the in-memory saver."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(stored_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(stored_bytes(item) for item in value)
+    return 0
+
+
+async def sqlite_bytes(conn) -> int:
+    total = 0
+    for query in ("SELECT SUM(LENGTH(checkpoint)) + SUM(LENGTH(metadata)) FROM checkpoints",
+                  "SELECT SUM(LENGTH(value)) FROM writes",
+                  "SELECT SUM(LENGTH(data)) FROM checkpoint_blobs"):
+        async with conn.execute(query) as cur:
+            total += (await cur.fetchone())[0] or 0
+    return total
+
+
+async def run_sessions(saver, threads: int):
+    """Run every session to human review and approve it; returns (graph, thread configs, seconds)."""
+    graph = create_workflow(REVIEW_MODE).compile(checkpointer=saver, interrupt_before=["Interrupt"])
+    configs = []
+    started = time.perf_counter()
+    for index in range(threads):
+        config = {
+            "configurable": {"thread_id": str(uuid.uuid4())},
+            "metadata": {"fake_scenario": SESSION_MIX[index % len(SESSION_MIX)]},
+        }
+        await graph.ainvoke({"messages": [HumanMessage(content="Help with sleep anxiety")]}, config)
+        if (await graph.aget_state(config)).next:
+            await graph.ainvoke(None, config)
+        configs.append(config)
+    return graph, configs, time.perf_counter() - started
+
+
+def comparable(state: dict) -> dict:
+    """A loaded state without the per-run message ids."""
+    return {**state, "messages": [(type(message).__name__, message.content) for message in state.get("messages", [])]}
+
+
+async def load_all(graph, saver, configs):
+    """Load every thread's latest state with a cold blob cache; returns (states, seconds)."""
+    saver.state_blobs.texts.clear()
+    started = time.perf_counter()
+    states = [(await graph.aget_state(config)).values for config in configs]
+    return states, time.perf_counter() - started
+
+
+async def measure_sqlite(directory: str, compact: bool, args):
+    conn = await aiosqlite.connect(os.path.join(directory, f"checkpoints-{'on' if compact else 'off'}.db"))
+    saver = _pruning_sqlite_saver()(conn, keep_last=args.keep_last, ttl_seconds=3600, sweep_seconds=3600,
+                                     blobs=StateBlobs(enabled=compact, compression=args.compression))
+    await saver.setup()
+    graph, configs, seconds = await run_sessions(saver, args.threads)
+    states, load_seconds = await load_all(graph, saver, configs)
+    size = await sqlite_bytes(conn)
+    await conn.close()
+    return size, seconds, load_seconds, states
+
+
+async def measure_memory(compact: bool, args):
+    saver = CompactMemorySaver(StateBlobs(enabled=compact, compression=args.compression))
+    graph, configs, seconds = await run_sessions(saver, args.threads)
+    states, load_seconds = await load_all(graph, saver, configs)
+    size = sum(stored_bytes(part) for part in (saver.storage, saver.writes, saver.blobs, saver.blob_data))
+    return size, seconds, load_seconds, states
+
+
+async def main(args):
+    for role in ("filter", "drafter", "safety", "critic"):
+        model = get_model(role)
+        model.latency = 0
+        model.tokens_per_second = 0
+    get_model("drafter").protocol = padded_protocol(args.protocol_kb)
+
+    print(f"{args.threads} sessions ({', '.join(SESSION_MIX)}), keep_last={args.keep_last}, "
+          f"~{args.protocol_kb:g} KB drafts, blob compression {args.compression}\n")
+    print(f"{'backend':8} {'compact':8} {'KB/thread':>10} {'total KB':>10} {'save ms/session':>16} {'load ms/thread':>15}")
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in ("sqlite", "memory"):
+            results = {}
+            for compact in (False, True):
+                if backend == "sqlite":
+                    results[compact] = await measure_sqlite(directory, compact, args)
+                else:
+                    results[compact] = await measure_memory(compact, args)
+                size, seconds, load_seconds, _ = results[compact]
+                print(f"{backend:8} {'on' if compact else 'off':8} {size / args.threads / 1024:10.1f} "
+                      f"{size / 1024:10.1f} {seconds / args.threads * 1000:16.1f} "
+                      f"{load_seconds / args.threads * 1000:15.2f}")
+            ratio = results[False][0] / max(1, results[True][0])
+            same = [comparable(state) for state in results[False][3]] == [comparable(state) for state in results[True][3]]
+            print(f"{'':8} {ratio:.1f}x smaller, same loaded state: {same}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=30)
+    parser.add_argument("--keep-last", type=int, default=CHECKPOINT_KEEP_LAST, help="checkpoints kept per thread (SQLite)")
+    parser.add_argument("--protocol-kb", type=float, default=6, help="approximate draft size")
+    parser.add_argument("--compression", choices=("zlib", "off"), default="zlib")
+    asyncio.run(main(parser.parse_args()))
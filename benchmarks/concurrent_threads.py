@@ -0,0 +1,87 @@
+"""
+Load test: many graph threads progressing at once on a single event loop.
+
+Runs N `run_graph_and_stream` jobs concurrently (exactly what one uvicorn
+worker does when N clients hit /start) with the fake model provider
+(LLM_PROVIDER=fake) answering after a fixed latency per call. While they run, a probe task polls
+/check_thread every 10 ms and records how late each answer arrives.
+
+    python benchmarks/concurrent_threads.py --threads 20 --latency 0.2
+    python benchmarks/concurrent_threads.py --threads 20 --latency 0.2 --blocking
+
+--blocking makes the fake model sleep synchronously, simulating the old
+`ChatOpenAI.invoke` nodes that stalled the whole worker.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from _common import fake_pipeline
+
+fake_pipeline(llm_scheduler=False)
+
+from langchain_core.messages import HumanMessage
+
+from backend import server
+from backend.graph import close_graph
+from backend.llm import get_model
+
+
+async def probe(thread_id: str, samples: list, stop: asyncio.Event):
+    """Poll /check_thread every 10 ms and record how late each answer arrives."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        await server.check_thread(thread_id)
+        samples.append(time.perf_counter() - started - 0.01)
+
+
+async def main(threads: int, latency: float, blocking: bool):
+    for model in (get_model("filter"), get_model("drafter"), get_model("safety"), get_model("critic")):
+        model.latency = latency
+        model.tokens_per_second = 0
+        model.blocking = blocking
+
+    thread_ids = [str(uuid.uuid4()) for _ in range(threads)]
+    for thread_id in thread_ids:
+        server.streams.get_or_create(thread_id)
+
+    samples = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(thread_ids[0], samples, stop))
+
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        server.run_graph_and_stream(
+            thread_id,
+            {"messages": [HumanMessage(content="Help with sleep anxiety")]},
+            {"configurable": {"thread_id": thread_id}},
+        )
+        for thread_id in thread_ids
+    ])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    await close_graph()
+
+    # Filter, Drafter, Safety, Critic = 4 sequential model calls per thread
+    serial = threads * 4 * latency
+    print(f"mode:                 {'blocking' if blocking else 'async'}")
+    print(f"threads:              {threads}")
+    print(f"model latency:        {latency * 1000:.0f} ms")
+    print(f"wall time:            {elapsed:.2f} s (serial would be {serial:.2f} s)")
+    print(f"speedup vs serial:    {serial / elapsed:.1f}x")
+    if samples:
+        print(f"/check_thread p50:    {statistics.median(samples) * 1000:.1f} ms")
+        print(f"/check_thread max:    {max(samples) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--blocking", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.threads, args.latency, args.blocking))
@@ -0,0 +1,95 @@
+"""
+Benchmark: streamed Critic reviews cut off once the route is known.
+
+The Critic's structured reply starts with overall_score and safety_concern.
+With critic_early_exit=on the stream is closed as soon as those settle the
+route and the feedback text would go unused (approvals, safety
+consultations, the last allowed loop). Runs each scenario with the
+setting off and on, and reports Critic completion tokens and time per run
+and whether both reach the same route and status.
+
+Critic feedback is padded to a realistic length (--feedback-words) and
+streamed at --tokens-per-second.
+
+    python benchmarks/critic_early_exit.py --runs 3 --tokens-per-second 100
+"""
+import argparse
+import asyncio
+import json
+import uuid
+
+from _common import fake_pipeline
+
+fake_pipeline()
+
+from langchain_core.messages import HumanMessage
+
+from backend.graph import build_graph, close_graph, run_metrics
+from backend.llm import FAKE_SCENARIOS, _critic, get_model
+
+SCENARIOS = ("approve", "critic_revise", "max_loops", "safety_consult")
+
+
+def padded_scenarios(words: int) -> dict:
+    """FAKE_SCENARIOS with every Critic feedback extended to about `words` words."""
+    filler = " ".join(["Consider adding a short worked example the reader can copy."] * max(0, words // 10))
+    scenarios = {}
+    for name, script in FAKE_SCENARIOS.items():
+        critic = script.get("critic") or [_critic(0.92)]
+        padded = []
+        for reply in critic:
+            review = json.loads(reply)
+            padded.append(_critic(review["overall_score"], f"{review['feedback']} {filler}".strip(), review["safety_concern"]))
+        scenarios[name] = {**script, "critic": padded}
+    return scenarios
+
+
+async def run_once(graph, scenario: str, early_exit: str):
+    thread_id = str(uuid.uuid4())
+    config = {
+        "configurable": {"thread_id": thread_id, "critic_early_exit": early_exit},
+        "metadata": {"fake_scenario": scenario},
+    }
+    route = []
+    async for update in graph.astream({"messages": [HumanMessage(content="Help with sleep anxiety")]}, config,
+                                      stream_mode="updates"):
+        route.extend(update.keys())
+    state = (await graph.aget_state(config)).values
+    critic = run_metrics.thread_summary(thread_id).get("Critic", {})
+    return route, state["status"], critic.get("completion_tokens", 0), critic.get("seconds", 0.0)
+
+
+async def main(args):
+    for role in ("filter", "drafter", "safety"):
+        model = get_model(role)
+        model.latency = 0.01
+        model.tokens_per_second = 0
+    critic = get_model("critic")
+    critic.latency = args.latency
+    critic.tokens_per_second = args.tokens_per_second
+    critic.scenarios = padded_scenarios(args.feedback_words)
+
+    graph = await build_graph()
+    print(f"{args.runs} runs per scenario, critic streams {args.tokens_per_second:.0f} tokens/s after "
+          f"{args.latency * 1000:.0f} ms, ~{args.feedback_words} words of feedback\n")
+    print(f"{'scenario':15} {'early exit':10} {'Critic tokens':>14} {'Critic time':>12}   final status")
+    for scenario in SCENARIOS:
+        outcomes = {}
+        for early_exit in ("off", "on"):
+            runs = [await run_once(graph, scenario, early_exit) for _ in range(args.runs)]
+            route, status, _, _ = runs[0]
+            tokens = sum(run[2] for run in runs) / args.runs
+            seconds = sum(run[3] for run in runs) / args.runs
+            outcomes[early_exit] = (route, status)
+            print(f"{scenario:15} {early_exit:10} {tokens:14.0f} {seconds:11.2f}s   {status}")
+        print(f"{'':15} same route and status: {outcomes['off'] == outcomes['on']}")
+    await close_graph()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.2, help="critic seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=100)
+    parser.add_argument("--feedback-words", type=int, default=120)
+    asyncio.run(main(parser.parse_args()))
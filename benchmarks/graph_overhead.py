@@ -0,0 +1,58 @@
+"""
+Micro-benchmark: per-request graph overhead before and after the shared
+compiled graph.
+
+"before" compiles a fresh graph for every request (the old build_graph()
+call in each endpoint), "after" reuses the process-wide graph from
+get_graph(). Both then do the same aget_state() a /check_thread poll does.
+
+    python benchmarks/graph_overhead.py --requests 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import _common  # noqa: F401 - repository path, dummy key, in-memory checkpoints
+
+from backend.graph import build_graph, get_graph, warm_up_graph, close_graph
+
+CONFIG = {"configurable": {"thread_id": "benchmark"}}
+
+
+async def measure(get, requests: int) -> list:
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        graph = await get()
+        await graph.aget_state(CONFIG)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def report(label: str, samples: list):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{label:28} mean {statistics.mean(samples) * 1000:7.3f} ms   "
+          f"p50 {statistics.median(samples) * 1000:7.3f} ms   p99 {p99 * 1000:7.3f} ms")
+
+
+async def main(requests: int):
+    started = time.perf_counter()
+    await warm_up_graph()
+    print(f"startup warm-up:             {(time.perf_counter() - started) * 1000:.1f} ms\n")
+
+    before = await measure(build_graph, requests)
+    after = await measure(get_graph, requests)
+    report("before (compile per call)", before)
+    report("after (shared graph)", after)
+    print(f"\nspeedup: {statistics.mean(before) / statistics.mean(after):.1f}x")
+    await close_graph()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
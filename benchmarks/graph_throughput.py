@@ -0,0 +1,131 @@
+"""
+Deterministic graph benchmark on the offline fake model (LLM_PROVIDER=fake).
+
+Runs many threads through the compiled graph with a weighted mix of
+scripted scenarios (see FAKE_SCENARIOS in backend/llm.py) and reports:
+
+- throughput (runs/s) and end-to-end run latency p50/p99
+- wall time per node visit, p50/p99, for each agent
+- revision-loop counts and final status per scenario
+
+    python benchmarks/graph_throughput.py --runs 200 --concurrency 20
+    python benchmarks/graph_throughput.py --mix approve=1,max_loops=1 --review-mode parallel
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from _common import fake_pipeline
+
+fake_pipeline(llm_scheduler=False)
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.messages import HumanMessage
+
+from backend.graph import AGENT_NODES, build_graph, close_graph
+from backend.llm import get_model
+
+DEFAULT_MIX = "approve=5,critic_revise=2,safety_revise=1,max_loops=1,safety_stop=1,pii_recheck=1,irrelevant=1"
+
+# Off-topic scenarios need an off-topic query, or the Filter's local classifier accepts them
+QUERIES = {"irrelevant": "How do I reverse a linked list in Python"}
+
+
+class NodeTimer(AsyncCallbackHandler):
+    """Records wall time of every graph node visit."""
+
+    def __init__(self):
+        self.started = {}
+        self.durations = defaultdict(list)
+
+    async def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, name=None, **kwargs):
+        if name in AGENT_NODES and (metadata or {}).get("langgraph_node") == name:
+            self.started[run_id] = (name, time.perf_counter())
+
+    async def on_chain_end(self, outputs, *, run_id, **kwargs):
+        if run_id in self.started:
+            name, started = self.started.pop(run_id)
+            self.durations[name].append(time.perf_counter() - started)
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+async def run_one(graph, scenario: str, timer: NodeTimer, semaphore: asyncio.Semaphore):
+    config = {
+        "configurable": {"thread_id": str(uuid.uuid4())},
+        "metadata": {"fake_scenario": scenario},
+        "callbacks": [timer],
+    }
+    async with semaphore:
+        started = time.perf_counter()
+        async for _ in graph.astream({"messages": [HumanMessage(content=QUERIES.get(scenario, "Help with sleep anxiety"))]}, config):
+            pass
+        elapsed = time.perf_counter() - started
+    values = (await graph.aget_state(config)).values
+    return scenario, elapsed, values
+
+
+async def main(args):
+    for model in (get_model("filter"), get_model("drafter"), get_model("safety"), get_model("critic")):
+        model.latency = args.latency
+        model.tokens_per_second = args.tps
+
+    weights = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    scenarios = rng.choices(list(weights), weights=list(weights.values()), k=args.runs)
+
+    graph = await build_graph(args.review_mode)
+    timer = NodeTimer()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[run_one(graph, s, timer, semaphore) for s in scenarios])
+    total = time.perf_counter() - started
+    await close_graph()
+
+    latencies = [elapsed for _, elapsed, _ in results]
+    print(f"runs {args.runs}, concurrency {args.concurrency}, review mode {args.review_mode}, "
+          f"model latency {args.latency * 1000:.0f} ms, {args.tps:.0f} tok/s\n")
+    print(f"throughput:  {args.runs / total:.1f} runs/s ({total:.2f} s total)")
+    print(f"run latency: p50 {statistics.median(latencies):.2f} s   p99 {percentile(latencies, 0.99):.2f} s\n")
+
+    print(f"{'node':12} {'visits':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, durations in sorted(timer.durations.items()):
+        print(f"{name:12} {len(durations):7} {statistics.median(durations) * 1000:9.1f} {percentile(durations, 0.99) * 1000:9.1f}")
+
+    by_scenario = defaultdict(list)
+    for scenario, _, values in results:
+        by_scenario[scenario].append(values)
+    print(f"\n{'scenario':14} {'runs':>5} {'revisions':>10} {'critic↔drafter':>15} {'critic↔safety':>14} {'filter↔safety':>14}  final status")
+    for scenario, runs in sorted(by_scenario.items()):
+        mean = lambda key: sum(v.get(key, 0) for v in runs) / len(runs)
+        statuses = Counter(v.get("status", "?") for v in runs).most_common(1)[0][0]
+        print(f"{scenario:14} {len(runs):5} {mean('revision_count'):10.2f} {mean('critic_drafter_iterations'):15.2f} "
+              f"{mean('critic_safety_iterations'):14.2f} {mean('filter_safety_iterations'):14.2f}  {statuses}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario=weight,... (scenarios from backend/llm.py)")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds to first token per call")
+    parser.add_argument("--tps", type=float, default=0, help="tokens per second after the first (0 = instant)")
+    parser.add_argument("--review-mode", default="sequential", choices=["sequential", "parallel", "speculative"])
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
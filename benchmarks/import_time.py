@@ -0,0 +1,76 @@
+"""
+Benchmark: cold-start import time of the entry points.
+
+Imports `backend.server`, `backend.mcp_server` and `run_client` in fresh
+interpreters (no model or network calls are made) and reports the median
+wall time, plus whether the OpenAI SDK got loaded along the way. With
+--compare, the same is measured on another git revision (extracted to a
+temporary directory), e.g. the commit before lazy model construction:
+
+    python benchmarks/import_time.py --repeat 5
+    python benchmarks/import_time.py --compare HEAD~1
+"""
+import argparse
+import io
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ("backend.server", "backend.mcp_server", "run_client")
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started, "langchain_openai" in sys.modules)
+"""
+
+
+def measure(root: str, module: str, repeat: int):
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-benchmark"), "PYTHONPATH": root}
+    samples, sdk_loaded = [], False
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(module=module)], cwd=root, env=env,
+                             capture_output=True, text=True, check=True).stdout.split()
+        samples.append(float(out[0]))
+        sdk_loaded = out[1] == "True"
+    return statistics.median(samples), sdk_loaded
+
+
+def extract(ref: str) -> str:
+    """Check out `ref` into a temporary directory with git archive."""
+    archive = subprocess.run(["git", "archive", ref], cwd=ROOT, capture_output=True, check=True).stdout
+    path = tempfile.mkdtemp(prefix="cerina-import-")
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(path)
+    return path
+
+
+def main(args):
+    trees = [("working tree", ROOT)]
+    if args.compare:
+        trees.insert(0, (args.compare, extract(args.compare)))
+
+    print(f"median of {args.repeat} fresh interpreters\n")
+    print(f"{'module':20}" + "".join(f"{label:>24}" for label, _ in trees))
+    for module in MODULES:
+        cells = []
+        for _, root in trees:
+            seconds, sdk_loaded = measure(root, module, args.repeat)
+            cells.append(f"{seconds * 1000:8.0f} ms{' (+openai SDK)' if sdk_loaded else '':>14}")
+        print(f"{module:20}" + "".join(f"{cell:>24}" for cell in cells))
+    if args.compare:
+        shutil.rmtree(trees[0][1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--compare", help="git revision to measure as well, e.g. HEAD~1")
+    main(parser.parse_args())
@@ -0,0 +1,83 @@
+"""
+Benchmark: incremental Safety/Critic re-reviews of revised drafts.
+
+Runs scenarios where the Critic's feedback names one section, so the
+Drafter revises just that section (revision_mode=sections), once with
+incremental_review=off (every review reads the whole draft) and once with
+incremental_review=on (re-reviews read the changed sections plus a
+summary of the rest). Reports Safety and Critic prompt tokens per run and
+checks that both settings route the same way and reach the same status.
+
+The fake protocol is padded to a realistic length (--padding words per
+section; 0 keeps the short built-in one).
+
+    python benchmarks/incremental_reviews.py --runs 3 --padding 150
+"""
+import argparse
+import asyncio
+import re
+import uuid
+
+from _common import fake_pipeline
+
+fake_pipeline()
+
+from langchain_core.messages import HumanMessage
+
+from backend.graph import build_graph, close_graph, run_metrics
+from backend.llm import FAKE_PROTOCOL, get_model
+
+SCENARIOS = ("critic_revise", "revise_twice", "max_loops")
+
+
+def padded_protocol(words: int) -> str:
+    """FAKE_PROTOCOL with a filler paragraph of about `words` words under every heading."""
+    filler = " ".join(["Practice this gently and notice what changes for you."] * max(1, words // 9))
+    return re.sub(r"^(#{2,3} .+\n)", lambda m: f"{m.group(1)}{filler}\n", FAKE_PROTOCOL, flags=re.MULTILINE)
+
+
+async def run_once(graph, scenario: str, incremental: str):
+    thread_id = str(uuid.uuid4())
+    config = {
+        "configurable": {"thread_id": thread_id, "revision_mode": "sections", "incremental_review": incremental},
+        "metadata": {"fake_scenario": scenario},
+    }
+    route = []
+    async for update in graph.astream({"messages": [HumanMessage(content="Help with sleep anxiety")]}, config,
+                                      stream_mode="updates"):
+        route.extend(update.keys())
+    state = (await graph.aget_state(config)).values
+    summary = run_metrics.thread_summary(thread_id)
+    tokens = {agent: summary.get(agent, {}).get("prompt_tokens", 0) for agent in ("Safety", "Critic")}
+    return route, state["status"], tokens
+
+
+async def main(args):
+    for role in ("filter", "drafter", "safety", "critic"):
+        model = get_model(role)
+        model.latency = 0.01
+        model.tokens_per_second = 0
+    if args.padding:
+        get_model("drafter").protocol = padded_protocol(args.padding)
+
+    graph = await build_graph()
+    print(f"{args.runs} runs per scenario, section-level revisions, ~{args.padding} filler words per section\n")
+    print(f"{'scenario':14} {'incremental':11} {'Safety prompt':>14} {'Critic prompt':>14}   final status")
+    for scenario in SCENARIOS:
+        outcomes = {}
+        for incremental in ("off", "on"):
+            runs = [await run_once(graph, scenario, incremental) for _ in range(args.runs)]
+            route, status, _ = runs[0]
+            safety = sum(tokens["Safety"] for _, _, tokens in runs) / args.runs
+            critic = sum(tokens["Critic"] for _, _, tokens in runs) / args.runs
+            outcomes[incremental] = (route, status)
+            print(f"{scenario:14} {incremental:11} {safety:14.0f} {critic:14.0f}   {status}")
+        print(f"{'':14} same route and status: {outcomes['off'] == outcomes['on']}")
+    await close_graph()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--padding", type=int, default=150, help="filler words per section of the fake protocol")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,77 @@
+"""
+Benchmark: the shared LLM call scheduler (backend/scheduler.py) under a rate limit.
+
+Starts a burst of batch runs (as from MCP or the CLI) and, just after, a
+few interactive runs (as from /start), all against a requests/min budget
+the burst exceeds. Two passes:
+
+- fifo:      every run in the same request class (arrival order only)
+- priority:  interactive runs tagged as such, so their calls jump the queue
+
+and reports per class the mean run time and the mean queue wait per LLM call.
+
+    python benchmarks/llm_scheduler.py --batch 20 --interactive 4 --rpm 600
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from _common import fake_pipeline
+
+fake_pipeline()
+
+from langchain_core.messages import HumanMessage
+
+from backend import scheduler
+from backend.graph import build_graph, close_graph
+from backend.llm import get_model
+from backend.scheduler import LLMScheduler
+
+
+async def run_once(graph, priority: str, delay: float):
+    await asyncio.sleep(delay)
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}, "metadata": {"priority": priority}}
+    started = time.perf_counter()
+    async for _ in graph.astream({"messages": [HumanMessage(content="Help with exam stress")]}, config):
+        pass
+    return priority, time.perf_counter() - started
+
+
+async def run_pass(graph, args, tag_interactive: bool):
+    scheduler._scheduler = LLMScheduler(max_concurrency=args.concurrency, requests_per_minute=args.rpm, tokens_per_minute=0)
+    jobs = [run_once(graph, "batch", 0) for _ in range(args.batch)]
+    # Arrive just after the burst, when the queue is already full
+    jobs += [run_once(graph, "interactive" if tag_interactive else "batch", 0.05) for _ in range(args.interactive)]
+    results = await asyncio.gather(*jobs)
+    times = {"batch": [t for _, t in results[:args.batch]], "interactive": [t for _, t in results[args.batch:]]}
+    return times, scheduler.get_scheduler().stats()
+
+
+async def main(args):
+    for model, latency in ((get_model("filter"), args.latency), (get_model("drafter"), args.latency),
+                           (get_model("safety"), args.latency), (get_model("critic"), args.latency)):
+        model.latency = latency
+        model.tokens_per_second = 0
+
+    graph = await build_graph()
+    print(f"{args.batch} batch + {args.interactive} interactive runs, {args.rpm} requests/min, "
+          f"{args.concurrency} concurrent calls, {args.latency * 1000:.0f} ms per call\n")
+    print(f"{'pass':9} {'interactive run':>16} {'batch run':>10} {'wait/call (int.)':>17} {'wait/call (batch)':>18}")
+    for name, tag in (("fifo", False), ("priority", True)):
+        times, stats = await run_pass(graph, args, tag)
+        wait = lambda c: stats["wait_seconds"][c] / stats["calls"][c] if stats["calls"][c] else 0.0
+        print(f"{name:9} {statistics.mean(times['interactive']):15.2f}s {statistics.mean(times['batch']):9.2f}s "
+              f"{wait('interactive'):16.2f}s {wait('batch'):17.2f}s")
+    await close_graph()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=20)
+    parser.add_argument("--interactive", type=int, default=4)
+    parser.add_argument("--rpm", type=int, default=600, help="requests per minute budget")
+    parser.add_argument("--concurrency", type=int, default=8, help="max LLM calls in flight")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per fake LLM call")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,122 @@
+"""
+Benchmark: local PII pre-screen (backend/pii.py).
+
+Generates a labelled corpus of CBT-style queries - clean ones, ones with
+definite PII (emails, phones, SSNs, Luhn-valid cards, dates of birth,
+addresses, full names) and ambiguous ones (bare dates, first names,
+unstructured numbers) - and reports:
+
+- detection throughput, overall and for messages that need the full scan
+- how many Filter PII checks the screen settles locally (definite PII - LLM
+  calls avoided; clean and ambiguous messages still get the LLM check)
+- agreement of the local verdicts with the labels
+
+    python benchmarks/pii_screen.py --messages 20000 --pii-rate 0.3
+"""
+import argparse
+import random
+import sys
+import time
+from collections import Counter
+
+import _common  # noqa: F401 - puts the repository on sys.path
+
+from backend.pii import luhn_valid, scan_pii
+
+QUERIES = [
+    "I can't sleep because my mind keeps racing at night",
+    "How do I stop catastrophizing before exams?",
+    "I've been feeling low for months and nothing helps",
+    "My panic attacks get worse on the train to work",
+    "Looking for CBT exercises for social anxiety at parties",
+    "I get angry at my kids and then feel guilty for hours",
+    "Since the breakup I keep checking my phone 40 times a day",
+    "I wake up at 3am every night and worry about money",
+]
+
+FIRST = ["Sarah", "James", "Priya", "Tom", "Aisha", "Lucas"]
+LAST = ["Johnson", "Patel", "Nguyen", "Smith", "Okafor", "Rossi"]
+STREETS = ["Baker Street", "Elm Avenue", "Oak Road", "Maple Lane", "Sunset Blvd"]
+
+
+def card(rng):
+    digits = [rng.randint(0, 9) for _ in range(15)]
+    for check in range(10):
+        number = "".join(map(str, digits)) + str(check)
+        if luhn_valid(number):
+            return " ".join(number[i:i + 4] for i in range(0, 16, 4))
+
+
+# label → snippet generator
+DEFINITE = {
+    "email": lambda rng: f"you can reach me at {rng.choice(FIRST).lower()}.{rng.randint(1, 99)}@example.com",
+    "phone": lambda rng: f"my number is ({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(1000, 9999)}",
+    "ssn": lambda rng: f"my SSN is {rng.randint(100, 599)}-{rng.randint(10, 99)}-{rng.randint(1000, 9999)}",
+    "card": lambda rng: f"my card {card(rng)} was declined and I panicked",
+    "dob": lambda rng: f"I was born on {rng.randint(1, 12)}/{rng.randint(1, 28)}/19{rng.randint(50, 99)}",
+    "address": lambda rng: f"I live at {rng.randint(1, 999)} {rng.choice(STREETS)}",
+    "name": lambda rng: f"my name is {rng.choice(FIRST)} {rng.choice(LAST)}",
+}
+AMBIGUOUS = {
+    "date": lambda rng: f"it started on {rng.randint(1, 12)}/{rng.randint(1, 28)}/2023",
+    "first_name": lambda rng: f"call me {rng.choice(FIRST)}",
+    "number": lambda rng: f"reference {rng.randint(1000000, 9999999)}",
+}
+
+
+def corpus(size: int, pii_rate: float, ambiguous_rate: float, seed: int):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(size):
+        query = rng.choice(QUERIES)
+        roll = rng.random()
+        if roll < pii_rate:
+            label = rng.choice(list(DEFINITE))
+            messages.append((f"{query}, {DEFINITE[label](rng)}.", "PII_FOUND"))
+        elif roll < pii_rate + ambiguous_rate:
+            label = rng.choice(list(AMBIGUOUS))
+            messages.append((f"{query}, {AMBIGUOUS[label](rng)}.", "AMBIGUOUS"))
+        else:
+            messages.append((query + ".", "CLEAN"))
+    return messages
+
+
+def main(args):
+    messages = corpus(args.messages, args.pii_rate, args.ambiguous_rate, args.seed)
+    texts = [text for text, _ in messages]
+
+    started = time.perf_counter()
+    results = [scan_pii(text) for text in texts]
+    elapsed = time.perf_counter() - started
+
+    # Clean messages without digits skip the full scan - time the rest on their own
+    scanned = [text for text, label in messages if label != "CLEAN"]
+    started = time.perf_counter()
+    for text in scanned:
+        scan_pii(text)
+    scanned_elapsed = time.perf_counter() - started
+
+    print(f"{args.messages} messages, {args.pii_rate:.0%} with PII, {args.ambiguous_rate:.0%} ambiguous\n")
+    print(f"throughput: {args.messages / elapsed:,.0f} msg/s ({elapsed / args.messages * 1e6:.1f} µs/msg), "
+          f"PII/ambiguous messages alone {len(scanned) / scanned_elapsed:,.0f} msg/s ({scanned_elapsed / len(scanned) * 1e6:.1f} µs/msg)")
+
+    verdicts = Counter(r["verdict"] for r in results)
+    local = verdicts["PII_FOUND"]
+    print(f"\nsettled locally: {local}/{args.messages} ({local / args.messages:.1%}) - "
+          f"{args.messages - local} LLM calls instead of {args.messages}")
+    print(f"LLM time avoided at {args.llm_latency * 1000:.0f} ms/call: {local * args.llm_latency:,.0f} s")
+
+    confusion = Counter((label, r["verdict"]) for (_, label), r in zip(messages, results))
+    print(f"\n{'label':10} {'PII_FOUND':>10} {'CLEAN':>8} {'AMBIGUOUS':>10}")
+    for label in ("PII_FOUND", "CLEAN", "AMBIGUOUS"):
+        print(f"{label:10} {confusion[label, 'PII_FOUND']:10} {confusion[label, 'CLEAN']:8} {confusion[label, 'AMBIGUOUS']:10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--pii-rate", type=float, default=0.3)
+    parser.add_argument("--ambiguous-rate", type=float, default=0.1)
+    parser.add_argument("--llm-latency", type=float, default=0.6, help="assumed seconds per LLM PII check")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
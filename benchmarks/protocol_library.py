@@ -0,0 +1,109 @@
+"""
+Benchmark: protocol library lookups at scale.
+
+Fills a temporary library folder with N synthetic protocols (topics x
+techniques), catalogued by the SQLite/FTS5 ProtocolLibrary, then times
+paginated listing, full-text search and fetch-by-id against finding the
+same protocols by scanning the folder (read every .md, match the words),
+which is what browsing CBT_Downloaded/ took before.
+
+    python benchmarks/protocol_library.py --protocols 20000 --queries 200
+"""
+import argparse
+import glob
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import _common  # noqa: F401 - puts the repository on sys.path
+
+from backend.llm import FAKE_PROTOCOL
+from backend.protocol_library import ProtocolLibrary
+
+TOPICS = ["sleep", "exam", "panic", "social", "grief", "anger", "work stress", "loneliness", "procrastination",
+          "health anxiety", "public speaking", "perfectionism", "driving", "flying", "conflict", "motivation"]
+TECHNIQUES = ["Cognitive Restructuring", "Behavioral Activation", "Exposure Hierarchy", "Worry Postponement",
+              "Problem Solving", "Thought Records", "Relaxation Training", "Activity Scheduling"]
+
+
+def synthetic_protocol(index: int) -> str:
+    topic = TOPICS[index % len(TOPICS)]
+    technique = TECHNIQUES[(index // len(TOPICS)) % len(TECHNIQUES)]
+    text = FAKE_PROTOCOL.format(revision=index)
+    text = text.replace("Managing Everyday Anxiety", f"Coping with {topic.title()} #{index}")
+    return text.replace("## Understanding the Issue", f"## CBT Technique: {technique}\n\n## Understanding the Issue", 1)
+
+
+def scan_search(directory: str, words: list, limit: int) -> list:
+    """The folder-scan way: read every protocol, keep those containing all the words."""
+    matches = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.md"))):
+        with open(path, encoding="utf-8") as f:
+            text = f.read().lower()
+        if all(word in text for word in words):
+            matches.append(os.path.basename(path))
+    return matches[:limit]
+
+
+def timed(fn, runs: int) -> list:
+    seconds = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - started)
+    return seconds
+
+
+def report(name: str, seconds: list):
+    ordered = sorted(seconds)
+    p99 = ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+    print(f"{name:34} p50 {statistics.median(seconds) * 1000:9.2f} ms   p99 {p99 * 1000:9.2f} ms")
+
+
+def main(args):
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        for index in range(args.protocols):
+            with open(os.path.join(directory, f"protocol_{index:06d}.md"), "w", encoding="utf-8") as f:
+                f.write(synthetic_protocol(index))
+        library = ProtocolLibrary(os.path.join(directory, "library.db"), directory)
+        print(f"{args.protocols} protocols written in {time.perf_counter() - started:.1f}s")
+        started = time.perf_counter()
+        added, _ = library.sync()
+        print(f"catalogued {added} in {time.perf_counter() - started:.1f}s "
+              f"({os.path.getsize(library.db_path) / 1e6:.1f} MB database)\n")
+
+        queries = [random.choice(TOPICS) + " " + random.choice(TECHNIQUES).split()[0].lower() for _ in range(args.queries)]
+        pages = [random.randrange(0, max(1, args.protocols // args.page_size)) for _ in range(args.queries)]
+        ids = [random.randrange(1, args.protocols + 1) for _ in range(args.queries)]
+
+        it = iter(queries)
+        report("search (FTS5, first page)", timed(lambda: library.search(next(it), args.page_size), args.queries))
+        it_pages = iter(pages)
+        report("list page (newest first)", timed(lambda: library.list(args.page_size, next(it_pages) * args.page_size),
+                                                  args.queries))
+        it_ids = iter(ids)
+        report("get by id (with text)", timed(lambda: library.get(next(it_ids)), args.queries))
+        scan_runs = max(1, min(args.queries, args.scan_runs))
+        it_scan = iter(queries)
+        report(f"folder scan search ({scan_runs} runs)",
+               timed(lambda: scan_search(directory, next(it_scan).split(), args.page_size), scan_runs))
+
+        # Same answers? The scan matches substrings, FTS whole words (stemmed) - compare totals for a plain query
+        query = "panic exposure"
+        print(f"\n'{query}': FTS5 {library.search(query, 1)['total']} matches, "
+              f"scan {len(scan_search(directory, query.split(), args.protocols))}")
+        library.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--protocols", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--scan-runs", type=int, default=5, help="folder scans to time (each reads every file)")
+    main(parser.parse_args())
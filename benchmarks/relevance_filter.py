@@ -0,0 +1,99 @@
+"""
+Benchmark: the Filter's local relevance classifier (backend/relevance.py).
+
+Scores a held-out set of queries (none of them are in the seed set) and
+reports training time, per-query latency, and for a range of confidence
+thresholds the hit rate (queries answered without the LLM) and the
+accuracy of the local answers.
+
+    python benchmarks/relevance_filter.py --thresholds 0.7,0.85,0.95
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import _common  # noqa: F401 - puts the repository on sys.path
+
+from backend.relevance import RelevanceClassifier, load_seed
+
+HELD_OUT = [
+    ("I freeze up every time my boss asks me a question", True),
+    ("Ways to stop panicking in crowded supermarkets", True),
+    ("I lie awake replaying embarrassing conversations", True),
+    ("My dog died last week and I can't stop crying", True),
+    ("How do I stop feeling like a failure", True),
+    ("Tips for coping with exam stress as a nursing student", True),
+    ("I'm constantly irritable with my partner lately", True),
+    ("I dread Mondays so much I feel sick", True),
+    ("Help me challenge the thought that nobody likes me", True),
+    ("I've stopped enjoying things I used to love", True),
+    ("CBT plan for fear of needles", True),
+    ("I get intrusive thoughts about harming my baby and I'm scared", True),
+    ("I'm anxious about my upcoming surgery", True),
+    ("Struggling to get out of bed most mornings", True),
+    ("I compare myself to my siblings and feel inadequate", True),
+    ("Coping with the stress of caring for my mother with dementia", True),
+    ("How to calm my racing heart before a presentation", True),
+    ("I can't concentrate because I'm so worried about money", True),
+    ("Feeling disconnected from everyone around me", True),
+    ("Strategies for managing my temper in traffic", True),
+    ("How do I configure a Python virtual environment", False),
+    ("Give me a vegan lasagna recipe", False),
+    ("Which planet is the largest in the solar system", False),
+    ("Write a limerick about a frog", False),
+    ("Best budget headphones in 2024", False),
+    ("How to replace a kitchen faucet", False),
+    ("Explain the difference between TCP and UDP", False),
+    ("Who is the current president of Brazil", False),
+    ("Earn $5000 a week from home, click now", False),
+    ("Convert this CSV file to JSON", False),
+    ("How long do I boil an egg", False),
+    ("Recommend a podcast about economics", False),
+    ("What's the distance from Earth to the Moon", False),
+    ("How do I center a div in CSS", False),
+    ("Plan a birthday party for a 6 year old", False),
+    ("Translate this paragraph into German", False),
+    ("Tips for winning at Monopoly", False),
+    ("How to remove a stripped screw", False),
+    ("Cheap hotel deals in Barcelona", False),
+    ("What does a mitochondria do", False),
+]
+
+
+def main(args):
+    started = time.perf_counter()
+    classifier = RelevanceClassifier().fit(load_seed())
+    train = time.perf_counter() - started
+
+    latencies, probabilities = [], []
+    for _ in range(args.repeat):
+        for text, _ in HELD_OUT:
+            started = time.perf_counter()
+            p = classifier.probability(text)
+            latencies.append(time.perf_counter() - started)
+        probabilities = [classifier.probability(text) for text, _ in HELD_OUT]
+
+    print(f"training on {len(load_seed())} seed queries: {train * 1000:.0f} ms")
+    print(f"per query: p50 {statistics.median(latencies) * 1e6:.0f} µs   max {max(latencies) * 1e6:.0f} µs\n")
+
+    print(f"{'threshold':>9} {'hit rate':>9} {'local accuracy':>15} {'to LLM':>7}")
+    for threshold in (float(t) for t in args.thresholds.split(",")):
+        local = [(p >= threshold, label) for p, (_, label) in zip(probabilities, HELD_OUT)
+                 if p >= threshold or p <= 1 - threshold]
+        correct = sum(predicted == label for predicted, label in local)
+        accuracy = f"{correct / len(local):.1%}" if local else "-"
+        print(f"{threshold:9.2f} {len(local) / len(HELD_OUT):9.1%} {accuracy:>15} {len(HELD_OUT) - len(local):7}")
+
+    if args.verbose:
+        print()
+        for p, (text, label) in sorted(zip(probabilities, HELD_OUT)):
+            print(f"{p:.3f} {'relevant  ' if label else 'irrelevant'} {text}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--thresholds", default="0.7,0.8,0.85,0.9,0.95")
+    parser.add_argument("--repeat", type=int, default=200, help="timing passes over the held-out set")
+    parser.add_argument("--verbose", action="store_true", help="print every held-out query with its score")
+    main(parser.parse_args())
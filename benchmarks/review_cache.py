@@ -0,0 +1,84 @@
+"""
+Benchmark: content-addressed Safety/Critic review cache (backend/review_cache.py).
+
+Runs the same scripted scenario through the graph several times on the
+fake model provider and reports, per pass, run time and how many Safety
+and Critic LLM calls were made:
+
+- off:   cache disabled (every draft is reviewed from scratch)
+- cold:  empty in-memory cache (first run fills it)
+- warm:  same cache again (byte-identical drafts are answered from it)
+- disk:  a fresh cache over the same SQLite file, as after a restart
+
+    python benchmarks/review_cache.py --runs 5 --review-latency 0.3
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+from _common import fake_pipeline
+
+fake_pipeline(review_cache=True)
+
+from langchain_core.messages import HumanMessage
+
+from backend import review_cache
+from backend.graph import build_graph, close_graph, run_metrics
+from backend.llm import get_model
+from backend.review_cache import ReviewCache
+
+
+async def run_pass(graph, scenario: str, runs: int):
+    started = time.perf_counter()
+    review_calls = 0
+    for _ in range(runs):
+        thread_id = str(uuid.uuid4())
+        config = {"configurable": {"thread_id": thread_id}, "metadata": {"fake_scenario": scenario}}
+        async for _ in graph.astream({"messages": [HumanMessage(content="Help with sleep anxiety")]}, config):
+            pass
+        summary = run_metrics.thread_summary(thread_id)
+        review_calls += sum(summary.get(agent, {}).get("llm_calls", 0) for agent in ("Safety", "Critic"))
+    return (time.perf_counter() - started) / runs, review_calls / runs
+
+
+async def main(args):
+    for model, latency in ((get_model("filter"), 0.01), (get_model("drafter"), args.draft_latency),
+                           (get_model("safety"), args.review_latency), (get_model("critic"), args.review_latency)):
+        model.latency = latency
+        model.tokens_per_second = 0
+
+    graph = await build_graph()
+    db_path = os.path.join(tempfile.mkdtemp(), "review_cache.db")
+    passes = [
+        ("off", ReviewCache(max_entries=0)),
+        ("cold", ReviewCache(db_path=db_path)),
+        ("warm", None),  # Keep the cold pass's cache
+        ("disk", ReviewCache(db_path=db_path)),
+    ]
+
+    print(f"scenario {args.scenario}, {args.runs} runs per pass, draft {args.draft_latency * 1000:.0f} ms, "
+          f"review {args.review_latency * 1000:.0f} ms per call\n")
+    print(f"{'pass':6} {'run time':>9} {'review calls/run':>17}   cache")
+    total = lambda counts: sum(counts.values())
+    for name, cache in passes:
+        if cache is not None:
+            review_cache.close_review_cache()
+            review_cache._review_cache = cache
+        before = review_cache.get_review_cache().stats()
+        elapsed, calls = await run_pass(graph, args.scenario, args.runs)
+        after = review_cache.get_review_cache().stats()
+        delta = {key: total(after[key]) - total(before[key]) for key in ("hits", "disk_hits", "misses")}
+        print(f"{name:6} {elapsed:8.2f}s {calls:17.1f}   hits {delta['hits']} (disk {delta['disk_hits']}), misses {delta['misses']}")
+    await close_graph()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scenario", default="revise_twice", help="scenario from backend/llm.py")
+    parser.add_argument("--draft-latency", type=float, default=0.3)
+    parser.add_argument("--review-latency", type=float, default=0.3)
+    asyncio.run(main(parser.parse_args()))
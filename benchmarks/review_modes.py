@@ -0,0 +1,116 @@
+"""
+Benchmark: sequential vs parallel vs speculative Safety/Critic review.
+
+Uses the fake model provider with fixed per-agent latencies and the
+"revise_twice" script (Safety asks for one revision, then the Critic asks
+for one), runs the same scenario through every review mode and reports
+wall-clock time per review iteration. It also checks that each mode ends
+in the same state as sequential review. For speculative review it reports
+how many Critic reviews were committed, cancelled or discarded, the
+Critic time overlapped with Safety and the tokens spent on thrown-away
+reviews. Finally it checks that /revise feedback on a draft waiting for
+approval sends it back to the Drafter in every mode (exit status 1 if not).
+
+    python benchmarks/review_modes.py --runs 5 --review-latency 0.3 --critic-latency 0.5
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+
+from _common import fake_pipeline
+
+fake_pipeline()
+
+from langchain_core.messages import HumanMessage
+
+from backend.graph import build_graph, close_graph, request_revision, speculation
+from backend.llm import get_model
+
+# Safety asks for one revision, then the Critic asks for one
+SCENARIO = "revise_twice"
+
+
+async def run_once(graph):
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}, "metadata": {"fake_scenario": SCENARIO}}
+    route = []
+    started = time.perf_counter()
+    async for update in graph.astream({"messages": [HumanMessage(content="Sleep anxiety")]}, config, stream_mode="updates"):
+        route.extend(update.keys())
+    elapsed = time.perf_counter() - started
+    state = (await graph.aget_state(config)).values
+    final = {k: v for k, v in state.items() if k not in ("messages", "next", "safety_review", "critic_review")}
+    return elapsed, route, final
+
+
+async def revise_check(graph) -> tuple:
+    """Run an approved draft to human review, send /revise feedback, resume; returns (next after feedback, revisions)."""
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}, "metadata": {"fake_scenario": "approve"}}
+    await graph.ainvoke({"messages": [HumanMessage(content="Sleep anxiety")]}, config)
+    before = (await graph.aget_state(config)).values.get("revision_count", 0)
+    await request_revision(graph, config, "Add an example for shift workers")
+    routed = (await graph.aget_state(config)).next
+    await graph.ainvoke(None, config)
+    return routed, (await graph.aget_state(config)).values.get("revision_count", 0) - before
+
+
+async def main(runs: int, draft_latency: float, review_latency: float, critic_latency: float):
+    for model, latency in ((get_model("filter"), 0.01), (get_model("drafter"), draft_latency),
+                           (get_model("safety"), review_latency), (get_model("critic"), critic_latency)):
+        model.latency = latency
+        model.tokens_per_second = 0
+
+    results, revisions = {}, {}
+    for mode in ("sequential", "parallel", "speculative"):
+        graph = await build_graph(mode)
+        outcomes = await asyncio.gather(*[run_once(graph) for _ in range(runs)])
+        results[mode] = outcomes
+        revisions[mode] = await revise_check(graph)
+
+    print(f"draft latency {draft_latency * 1000:.0f} ms, safety latency {review_latency * 1000:.0f} ms, "
+          f"critic latency {critic_latency * 1000:.0f} ms per call, {runs} runs\n")
+    for mode, outcomes in results.items():
+        elapsed, route, final = outcomes[0]
+        drafts = route.count("Drafter")
+        mean = sum(o[0] for o in outcomes) / len(outcomes)
+        review = (mean - 0.01 - drafts * draft_latency) / drafts
+        print(f"{mode:11} run {mean:.2f} s   drafts {drafts}   review per iteration {review * 1000:.0f} ms")
+        print(f"{'':11} route: {' → '.join(route)}")
+
+    seq_final = results["sequential"][0][2]
+    print()
+    for mode in ("parallel", "speculative"):
+        final = results[mode][0][2]
+        same = seq_final == final
+        print(f"{mode} ends in the same state as sequential: {same}")
+        if not same:
+            for key in sorted(set(seq_final) | set(final)):
+                if seq_final.get(key) != final.get(key):
+                    print(f"  {key}: sequential={seq_final.get(key)!r} {mode}={final.get(key)!r}")
+
+    stats = speculation.stats()
+    print(f"\nspeculative Critic reviews: {stats['committed']} committed, {stats['cancelled']} cancelled, "
+          f"{stats['discarded']} discarded")
+    print(f"latency saved {stats['saved_seconds'] / runs * 1000:.0f} ms per run, "
+          f"tokens wasted {stats['wasted_tokens'] / runs:.0f} per run")
+
+    print()
+    revised = True
+    for mode, (routed, count) in revisions.items():
+        ok = routed == ("Drafter",) and count == 1
+        revised = revised and ok
+        print(f"/revise in {mode} mode: next {routed}, {count} revision(s) - {'ok' if ok else 'FAILED'}")
+    await close_graph()
+    return revised
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--draft-latency", type=float, default=0.5)
+    parser.add_argument("--review-latency", type=float, default=0.3, help="safety seconds per call")
+    parser.add_argument("--critic-latency", type=float, help="critic seconds per call (default: --review-latency)")
+    args = parser.parse_args()
+    ok = asyncio.run(main(args.runs, args.draft_latency, args.review_latency, args.critic_latency or args.review_latency))
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,73 @@
+"""
+Benchmark: section-level vs full Drafter revisions (backend/sections.py).
+
+Runs scenarios whose reviewer feedback names a section ("Add a concrete
+example to Step 2.", "Progress Tracking needs a concrete schedule.")
+through the graph on the fake model provider, once with
+revision_mode=full and once with revision_mode=sections, and reports the
+Drafter's completion tokens and time spent on revisions, plus a check
+that both modes route the same way.
+
+    python benchmarks/section_revisions.py --runs 5 --tokens-per-second 100
+"""
+import argparse
+import asyncio
+import uuid
+
+from _common import fake_pipeline
+
+fake_pipeline()
+
+from langchain_core.messages import HumanMessage
+
+from backend.graph import build_graph, close_graph, run_metrics
+from backend.llm import get_model
+
+SCENARIOS = ("critic_revise", "revise_twice")
+
+
+async def run_once(graph, scenario: str, mode: str):
+    thread_id = str(uuid.uuid4())
+    config = {"configurable": {"thread_id": thread_id, "revision_mode": mode}, "metadata": {"fake_scenario": scenario}}
+    route = []
+    async for update in graph.astream({"messages": [HumanMessage(content="Help with sleep anxiety")]}, config,
+                                      stream_mode="updates"):
+        route.extend(update.keys())
+    state = (await graph.aget_state(config)).values
+    drafter = run_metrics.thread_summary(thread_id)["Drafter"]
+    return route, state["status"], drafter
+
+
+async def main(args):
+    for role in ("filter", "drafter", "safety", "critic"):
+        model = get_model(role)
+        model.latency = args.latency
+        model.tokens_per_second = args.tokens_per_second
+
+    graph = await build_graph()
+    # The first draft costs the same in both modes - measure it once to subtract
+    _, _, first = await run_once(graph, "approve", "full")
+
+    print(f"{args.runs} runs per scenario, {args.latency * 1000:.0f} ms to first token, "
+          f"{args.tokens_per_second:.0f} tokens/s\n")
+    print(f"{'scenario':14} {'mode':9} {'revisions':>9} {'revision tokens':>16} {'revision time':>14}   final status")
+    for scenario in SCENARIOS:
+        routes = {}
+        for mode in ("full", "sections"):
+            outcomes = [await run_once(graph, scenario, mode) for _ in range(args.runs)]
+            route, status, drafter = outcomes[0]
+            revisions = drafter["visits"] - 1
+            tokens = sum(d["completion_tokens"] - first["completion_tokens"] for _, _, d in outcomes) / args.runs
+            seconds = sum(d["seconds"] - first["seconds"] for _, _, d in outcomes) / args.runs
+            routes[mode] = route
+            print(f"{scenario:14} {mode:9} {revisions:9} {tokens:16.0f} {seconds:13.2f}s   {status}")
+        print(f"{'':14} same route: {routes['full'] == routes['sections']}")
+    await close_graph()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds to first token per call")
+    parser.add_argument("--tokens-per-second", type=float, default=100, help="fake generation speed (words/s)")
+    asyncio.run(main(parser.parse_args()))
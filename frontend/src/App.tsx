@@ -54,7 +54,8 @@ function App() {
       const res = await fetch('http://127.0.0.1:8000/start', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ query })
+        // The previous query's run (if still going) is cancelled server-side
+        body: JSON.stringify({ query, replaces: threadId })
       });
       const data = await res.json();
       setThreadId(data.thread_id);
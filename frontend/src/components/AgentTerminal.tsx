@@ -2,7 +2,7 @@ import { useEffect, useState, useRef } from 'react';
 import { Terminal } from 'lucide-react';
 
 interface Log {
-    type: 'status' | 'agent_start' | 'agent_output' | 'agent_end' | 'control' | 'error';
+    type: 'status' | 'agent_start' | 'agent_output' | 'agent_token' | 'agent_end' | 'control' | 'error';
     agent?: string;
     content: string;
     state?: any;
@@ -16,6 +16,7 @@ interface AgentTerminalProps {
 const AGENT_ICONS: Record<string, string> = {
     System: '🚀',
     Filter: '🔍',
+    Library: '📚',
     Drafter: '📝',
     Safety: '🛡️',
     Critic: '🎯',
@@ -26,6 +27,7 @@ const AGENT_ICONS: Record<string, string> = {
 const AGENT_COLORS: Record<string, string> = {
     System: 'text-blue-400',
     Filter: 'text-purple-400',
+    Library: 'text-teal-400',
     Drafter: 'text-green-400',
     Safety: 'text-yellow-400',
     Critic: 'text-orange-400',
@@ -43,14 +45,32 @@ export function AgentTerminal({ threadId, onStateUpdate }: AgentTerminalProps) {
         let reconnectAttempts = 0;
         const maxReconnects = 5;
         let eventSource: EventSource | null = null;
+        let lastEventId: string | null = null;
 
         const connectEventSource = () => {
-            eventSource = new EventSource(`http://127.0.0.1:8000/stream/${threadId}`);
+            // Live mode streams agent output token by token;
+            // on reconnect, ask the server to replay only the events we missed
+            const resume = lastEventId ? `&last_event_id=${lastEventId}` : '';
+            eventSource = new EventSource(`http://127.0.0.1:8000/stream/${threadId}?live=true${resume}`);
 
             eventSource.onmessage = (event) => {
+                if (event.lastEventId) {
+                    lastEventId = event.lastEventId;
+                }
                 try {
                     const data = JSON.parse(event.data);
-                    setLogs(prev => [...prev, data]);
+                    if (data.type === 'agent_token') {
+                        // Append live frames to the agent's running output block
+                        setLogs(prev => {
+                            const last = prev[prev.length - 1];
+                            if (last && last.type === 'agent_token' && last.agent === data.agent) {
+                                return [...prev.slice(0, -1), { ...last, content: last.content + data.content }];
+                            }
+                            return [...prev, data];
+                        });
+                    } else {
+                        setLogs(prev => [...prev, data]);
+                    }
 
                     if (data.type === 'control' && data.state) {
                         // Include the content field so App can detect "Interrupted"
@@ -118,7 +138,7 @@ export function AgentTerminal({ threadId, onStateUpdate }: AgentTerminalProps) {
             );
         }
 
-        if (log.type === 'agent_output') {
+        if (log.type === 'agent_output' || log.type === 'agent_token') {
             return (
                 <div key={index} className="ml-8 my-1 p-2 bg-gray-900 rounded text-sm text-gray-300 font-mono whitespace-pre-wrap">
                     {log.content}
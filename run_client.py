@@ -1,4 +1,6 @@
+import argparse
 import asyncio
+import json
 import uuid
 import os
 import sys
@@ -11,7 +13,9 @@ sys.path.append(os.path.dirname(__file__))
 # Load env
 load_dotenv(os.path.join(os.path.dirname(__file__), "backend", ".env"))
 
-from backend.graph import build_graph
+from backend.graph import get_graph, close_graph, run_metrics
+from backend.batch import parse_items, run_batch
+from backend.config import BATCH_CONCURRENCY
 
 async def create_protocol(query: str):
     print(f"--- Generating Protocol for: '{query}' ---")
@@ -20,7 +24,7 @@ async def create_protocol(query: str):
     input_data = {"messages": [HumanMessage(content=query)]}
     
     try:
-        graph = await build_graph()
+        graph = await get_graph()
         
         print("\n" + "="*60)
         print("🚀 CERINA OS V1.0 // BIDIRECTIONAL AGENT EXECUTION")
@@ -69,7 +73,7 @@ async def create_protocol(query: str):
         print(f"✅ Completed in {step_count} steps")
         
         # Get final state
-        state = graph.get_state(config)
+        state = await graph.aget_state(config)
         values = state.values
         
         status = values.get("status", "Unknown")
@@ -91,6 +95,13 @@ async def create_protocol(query: str):
         else:
             print("\nℹ️  No bidirectional loops triggered (agents approved on first pass)")
         
+        # Per-agent latency, tokens and cost
+        print("\n⏱️  AGENT METRICS:")
+        for agent, stats in run_metrics.thread_summary(config["configurable"]["thread_id"]).items():
+            ttft = f"{stats['avg_ttft_ms']:.0f} ms" if stats["avg_ttft_ms"] is not None else "-"
+            print(f"   • {agent:8} {stats['seconds']:6.2f} s  ttft {ttft:>7}  "
+                  f"tokens {stats['prompt_tokens']}/{stats['completion_tokens']}  ${stats['cost_usd']:.5f}")
+        
         print("\n" + "="*60)
         print(f"STATUS: {status}")
         print("="*60)
@@ -99,11 +110,55 @@ async def create_protocol(query: str):
         
     except Exception as e:
         print(f"Error: {e}")
+    finally:
+        await close_graph()
+
+async def create_protocols(path: str, output: str, concurrency: int, auto_approve: bool):
+    """Batch mode: every query in a JSONL file, `concurrency` at a time, results to `output` as JSONL."""
+    with open(path, encoding="utf-8") as f:
+        items = parse_items(f)
+    print(f"--- Generating {len(items)} protocols from '{path}' ({concurrency} at a time) ---\n")
+    
+    try:
+        with open(output, "w", encoding="utf-8") as out:
+            async for event in run_batch(items, concurrency, auto_approve):
+                if event["type"] == "progress":
+                    print(f"   [{event['id']}] {event['node']:14} {event['status'] or ''}")
+                elif event["type"] == "result":
+                    out.write(json.dumps(event) + "\n")
+                    out.flush()
+                    icon = "✅" if event["outcome"] in ("approved", "awaiting_approval") else "⚠️" if event["outcome"] == "needs_review" else "❌"
+                    detail = event.get("error") or event["status"]
+                    print(f"{icon} [{event['id']}] {event['outcome']} in {event['seconds']:.1f} s - {detail}")
+                else:
+                    latency = event["latency"]
+                    print("\n" + "="*60)
+                    print(f"📦 {event['items']} items in {event['seconds']:.1f} s: " +
+                          ", ".join(f"{outcome} {n}" for outcome, n in sorted(event["outcomes"].items())))
+                    if event["protocols_per_minute"] is not None:
+                        print(f"   Throughput: {event['protocols_per_minute']:.1f} protocols/min")
+                    if latency["mean"] is not None:
+                        print(f"   Latency per item: mean {latency['mean']:.1f} s, p50 {latency['p50']:.1f} s, "
+                              f"p95 {latency['p95']:.1f} s, max {latency['max']:.1f} s")
+                    print(f"   Tokens: {event['tokens']}  Cost: ${event['cost_usd']:.4f}")
+                    print(f"   Results: {output}")
+                    print("="*60)
+    finally:
+        await close_graph()
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        query = " ".join(sys.argv[1:])
-    else:
-        query = input("Enter your CBT topic (e.g., 'Sleep Anxiety'): ")
+    parser = argparse.ArgumentParser(description="Generate CBT protocols from the command line")
+    parser.add_argument("query", nargs="*", help="CBT topic, e.g. Sleep Anxiety (prompted for if left out)")
+    parser.add_argument("--batch", metavar="FILE", help="JSONL file of queries: {\"query\": ...} objects or JSON strings")
+    parser.add_argument("--output", help="batch results file (default: FILE with .results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="batch runs in flight at once")
+    parser.add_argument("--auto-approve", action="store_true",
+                        help="approve and save drafts that passed Safety and the Critic (others are left for /approve)")
+    args = parser.parse_args()
     
-    asyncio.run(create_protocol(query))
+    if args.batch:
+        output = args.output or os.path.splitext(args.batch)[0] + ".results.jsonl"
+        asyncio.run(create_protocols(args.batch, output, args.concurrency, args.auto_approve))
+    else:
+        query = " ".join(args.query) if args.query else input("Enter your CBT topic (e.g., 'Sleep Anxiety'): ")
+        asyncio.run(create_protocol(query))